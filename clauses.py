@@ -11,6 +11,15 @@ See literals.py for the definition of atoms and literals.
 A logical clause in our sense is a multi-set of literals, implicitly
 representing the universally quantified disjunction of these literals.
 
+Clauses are variable-normalized: The variables of a clause are the
+integers 0, 1, ..., n-1, numbered in order of their first occurance
+(they are printed as X0, X1, ...). Since variables are implicitly
+universally quantified, this does not change the meaning of the
+clause. It allows us to rename the variables of two clauses apart
+without copying either of them: We simply shift the variables of the
+second clause by the number of variables of the first one (see
+TriangularSubst in substitutions.py).
+
 The set of all clauses for a given signature is denoted as
 Clauses(P,F,V).
 
@@ -65,12 +74,27 @@ class Clause(Derivable):
     - The literal list.
     - The type ("plain" if none given)
     - The name (generated automatically if not given)
+    - The number of variables (var_count)
+    - A flag indicating if the clause is ground
     """
-    def __init__(self, literals, type="plain", name=None):
-        """
-        Initialize the clause.
-        """
-        self.literals   = [l for l in literals if not l.isPropFalse()]
+    def __init__(self, literals, type="plain", name=None, var_count=None):
+        """
+        Initialize the clause. The literals are normalized (i.e. new
+        literals with variables 0, ..., n-1 are created), unless the
+        caller guarantees that this is already the case by providing
+        the number of variables as var_count.
+        """
+        lits = [l for l in literals if not l.isPropFalse()]
+        if var_count != None:
+            self.literals  = lits
+            self.var_count = var_count
+        else:
+            renaming = {}
+            self.literals  = [l.normalizeVars(renaming) for l in lits]
+            self.var_count = len(renaming)
+        self.ground     = self.var_count == 0
+        self.key_counts = None
+        self.pred_abstr = None
         self.type       = type
         self.evaluation = None
         Derivable.__init__(self, name)
@@ -93,6 +117,12 @@ class Clause(Derivable):
         """
         return len(self.literals)
 
+    def isConjecture(self):
+        """
+        Return True if the clause is part of the negated conjecture.
+        """
+        return self.type == "negated_conjecture"
+
     def isEmpty(self):
         """
         Return true if the clause is empty.
@@ -185,11 +215,13 @@ class Clause(Derivable):
         predicate abstraction of p(x)|~q(Y)|q(a) would be
         ((False, q), (True, p), (True, q)) (assuming True > False and
         q > p). We will use this later to implement a simple
-        subsumption index.
+        subsumption index. The result is computed only once.
         """
-        res = [l.predicateAbstraction() for l in self.literals]
-        res.sort()
-        return tuple(res)
+        if self.pred_abstr == None:
+            res = [l.predicateAbstraction() for l in self.literals]
+            res.sort()
+            self.pred_abstr = tuple(res)
+        return self.pred_abstr
 
 
     def instantiate(self, subst):
@@ -202,9 +234,20 @@ class Clause(Derivable):
         res.setDerivation(self.derivation)
         return res
 
+    def shareTerms(self, bank):
+        """
+        Replace the atoms of all literals by their shared
+        representation in the term bank.
+        """
+        for l in self.literals:
+            l.shareTerms(bank)
+
     def freshVarCopy(self):
         """
-        Return a copy of self with fresh variables.
+        Return a copy of self with fresh variables. Since clauses are
+        normalized, the copy is a variant with the same variables
+        0, ..., n-1. Renaming apart for inferences is done with
+        variable offsets instead (see resolution.py).
         """
         vars  = self.collectVars()
         subst = substitutions.freshVarSubst(vars)
@@ -218,24 +261,46 @@ class Clause(Derivable):
         """
         self.evaluation = eval
 
+    def literalKeyCounts(self):
+        """
+        Return a dictionary mapping the keys of the literals of self
+        to their number of occurances. The result is computed only
+        once and must not be modified.
+        """
+        if self.key_counts == None:
+            self.key_counts = {}
+            for l in self.literals:
+                key = l.key()
+                self.key_counts[key] = self.key_counts.get(key, 0)+1
+        return self.key_counts
+
     def removeDupLits(self):
         """
         Remove duplicated literals from clause.
         """
-        res = []
+        res  = []
+        seen = set()
         for l in self.literals:
-            if not litInLitList(l,res):
+            key = l.key()
+            if not key in seen:
+                seen.add(key)
                 res.append(l)
-        self.literals = res
+        # Each removed literal is identical to an earlier one, so
+        # the clause stays normalized.
+        self.literals   = res
+        self.key_counts = None
+        self.pred_abstr = None
 
     def isTautology(self):
         """
         Check if a clause is a simple tautology, i.e. if it contains
         two literals with the same atom, but different signs.
         """
-        for i in range(len(self.literals)):
-            if oppositeInLitList(self.literals[i],
-                                 self.literals[i+1:]):
+        pos = set([l.atomKey() for l in self.literals if l.isPositive()])
+        if not pos:
+            return False
+        for l in self.literals:
+            if l.isNegative() and l.atomKey() in pos:
                 return True
         return False
 
@@ -320,9 +385,22 @@ cnf(dup,axiom,p(a)|q(a)|p(a)).
         self.assertEqual(cf.weight(2,1), c1.weight(2,1))
         self.assertEqual(cf.weight(1,1), c1.weight(1,1))
 
+        bank = TermBank()
+        cf.shareTerms(bank)
+        c1.shareTerms(bank)
+        self.assertEqual(cf.weight(2,1), c1.weight(2,1))
+        self.assertTrue(c1.getLiteral(0).atom is cf.getLiteral(0).atom)
+        self.assertEqual(repr(c1), repr(c2))
+
         cnew = Clause(c4.literals)
         self.assertTrue(cnew.getLiteral(0).isEqual(c4.getLiteral(0)))
 
+        self.assertEqual(c1.var_count, 1)
+        self.assertEqual(c4.var_count, 0)
+        self.assertTrue(not c1.ground)
+        self.assertTrue(c4.ground)
+        self.assertEqual(c1.collectVars(), set([0]))
+
         empty = Clause([])
         self.assertTrue(empty.isEmpty())
         self.assertTrue(not empty.isUnit())
@@ -34,12 +34,86 @@ Email: schulz@eprover.org
 """
 
 import unittest
+from time import perf_counter
+from heapq import heappush, heappop, heapify
+from collections import deque
+try:
+    import numpy
+except ImportError: # pragma: nocover
+    numpy = None
 from lexer import Lexer
 from signature import Signature
 from literals import parseLiteral
 from clauses import Clause, parseClause
-from heuristics import PickGiven2
-from indexing import ResolutionIndex, SubsumptionIndex
+from resolution import resolutionUnifiers
+from heuristics import PickGiven2, EvalStructure, SymbolCountEvaluation
+from indexing import ResolutionIndex, DiscTreeResolutionIndex,\
+     FeatureVectorIndex, indexMemory
+
+
+class RetrievalCounter(object):
+    """
+    Statistics for one kind of candidate retrieval: The number of
+    queries, of candidates returned, and of candidates that passed
+    the actual test (unification or subsumption), as well as the time
+    spent in retrieval and in testing the candidates.
+    """
+    def __init__(self):
+        self.queries        = 0
+        self.candidates     = 0
+        self.successes      = 0
+        self.retrieval_time = 0.0
+        self.check_time     = 0.0
+
+    def record(self, candidates, successes, retrieval_time, check_time):
+        """
+        Record the result of a single query.
+        """
+        self.queries        += 1
+        self.candidates     += candidates
+        self.successes      += successes
+        self.retrieval_time += retrieval_time
+        self.check_time     += check_time
+
+    def successRate(self):
+        """
+        Return the fraction of candidates that passed the test (1.0
+        if there were no candidates).
+        """
+        if self.candidates:
+            return self.successes/self.candidates
+        return 1.0
+
+    def asDict(self):
+        """
+        Return the counters as a dictionary.
+        """
+        return {"queries"        : self.queries,
+                "candidates"     : self.candidates,
+                "successes"      : self.successes,
+                "retrieval_time" : self.retrieval_time,
+                "check_time"     : self.check_time}
+
+
+class IndexStatistics(object):
+    """
+    Statistics on the effectiveness of the candidate retrieval of a
+    clause set, for resolution partners (tested by unification) and
+    for subsuming and subsumed clauses (tested by subsumption).
+    """
+    def __init__(self):
+        self.resolution = RetrievalCounter()
+        self.subsuming  = RetrievalCounter()
+        self.subsumed   = RetrievalCounter()
+
+    def asDict(self):
+        """
+        Return the statistics as a dictionary.
+        """
+        return {"resolution" : self.resolution.asDict(),
+                "subsuming"  : self.subsuming.asDict(),
+                "subsumed"   : self.subsumed.asDict()}
+
 
 class ClauseSet(object):
     """
@@ -51,6 +125,7 @@ class ClauseSet(object):
         Initialize the clause.
         """
         self.clauses = list(clauses)
+        self.stats   = IndexStatistics()
 
     def __repr__(self):
         """
@@ -70,6 +145,12 @@ class ClauseSet(object):
         """
         self.clauses.append(clause)
 
+    def addClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the clause set.
+        """
+        self.clauses.extend(clauses)
+
     def extractClause(self, clause):
         """
         Remove a clause to the clause set and return it.
@@ -111,6 +192,23 @@ class ClauseSet(object):
                c.getLiteral(i).isInferenceLit()]
         return res
 
+    def getResolutionUnifiers(self, clause, lit, unif_cache=None):
+        """
+        Return a list of tuples (clause2, lit2, sigma) for all
+        literals in the set that can be resolved with clause|lit,
+        where sigma is the unifier (see resolutionUnifiers()). The
+        number of candidates and of unifiers is recorded in the
+        statistics.
+        """
+        start = perf_counter()
+        partners = self.getResolutionLiterals(clause.getLiteral(lit))
+        retrieved = perf_counter()
+        res = resolutionUnifiers(clause, lit, partners, unif_cache)
+        self.stats.resolution.record(len(partners), len(res),
+                                     retrieved-start,
+                                     perf_counter()-retrieved)
+        return res
+
     def getSubsumingCandidates(self, queryclause):
         """
         Return a subset (as a list) of the set containing at least all
@@ -126,7 +224,14 @@ class ClauseSet(object):
         ClauseSet, we just return all clauses in the set.
         """
         return self.clauses
-        
+
+    def memoryUsage(self):
+        """
+        Return a pair (objects, bytes) estimating the size of the
+        data structures used for retrieval. For a plain ClauseSet,
+        this is just the clause list.
+        """
+        return indexMemory(self.clauses)
 
     def parse(self, lexer):
         """
@@ -149,14 +254,89 @@ class HeuristicClauseSet(ClauseSet):
     All clauses inserted into the set are evaluated
     according to all criteria. The clause set support extraction of
     the "best" clause according to any of the configured heuristics.
+
+    For each evaluation function, the set keeps a priority queue (a
+    binary heap) of pairs (evaluation, sequence number), where the
+    sequence number records the order of insertion. Ties are thus
+    broken in favour of older clauses. The clauses themselves are
+    stored in a dictionary indexed by sequence number (self.live), and
+    a second dictionary (self.seqs) maps each clause to the list of
+    its sequence numbers (a clause may be in the set more than
+    once). A clause extracted via one queue is only removed from these
+    dictionaries, and its entries in the other queues are discarded
+    when they reach the top (lazy deletion). Both insertion and
+    extraction are O(log n), and extracting a given clause is O(1).
+
+    The set does not use the clause list of ClauseSet. All methods of
+    ClauseSet that modify the set are overridden, and self.clauses is
+    a read-only view of self.live.
     """
     def __init__(self, eval_functions):
         """
         Initialize the clause.
         """
-        self.clauses  = []
+        self.live     = {}
+        self.seqs     = {}
+        self.next_seq = 0
+        self.queues   = [[] for f in eval_functions.eval_funs]
+        self.queue_entries = 0
+        """
+        The number of entries in all queues, including those of
+        clauses no longer in the set.
+        """
+        self.stats    = IndexStatistics()
         self.eval_functions = eval_functions
+        self.eval_count    = 0
+        """
+        The number of calls to evaluation functions.
+        """
+        self.eval_deferred = 0
+        """
+        The number of evaluations of clauses in the set that have not
+        been computed (yet).
+        """
+
+    @property
+    def clauses(self):
+        """
+        The clauses in the set, in order of insertion (as a view of
+        self.live, not a copy).
+        """
+        return self.live.values()
 
+    def __len__(self):
+        """
+        Return number of clauses in set.
+        """
+        return len(self.live)
+
+    def newSeq(self, clause):
+        """
+        Enter clause into the set under a new sequence number and
+        return that.
+        """
+        seq = self.next_seq
+        self.next_seq = seq+1
+        self.live[seq] = clause
+        try:
+            self.seqs[clause].append(seq)
+        except KeyError:
+            self.seqs[clause] = [seq]
+        return seq
+
+    def removeSeq(self, seq):
+        """
+        Remove the clause with sequence number seq from the set and
+        return it, or return None if it is no longer in the set.
+        """
+        clause = self.live.pop(seq, None)
+        if clause != None:
+            seqs = self.seqs[clause]
+            if len(seqs) == 1:
+                del self.seqs[clause]
+            else:
+                seqs.remove(seq)
+        return clause
 
     def addClause(self, clause):
         """
@@ -166,23 +346,583 @@ class HeuristicClauseSet(ClauseSet):
         """
         evals = self.eval_functions.evaluate(clause)
         clause.addEval(evals)
-        ClauseSet.addClause(self, clause)
+        self.eval_count += len(evals)
+        seq = self.newSeq(clause)
+        for queue, value in zip(self.queues, evals):
+            heappush(queue, (value, seq))
+        self.queue_entries += len(self.queues)
+
+    def addClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the clause set,
+        evaluating them first. If the new clauses outnumber those
+        already in a queue, the queue is rebuilt with heapify()
+        instead of pushing them one by one.
+        """
+        evaluate = self.eval_functions.evaluate
+        entries = []
+        for clause in clauses:
+            evals = evaluate(clause)
+            clause.addEval(evals)
+            self.eval_count += len(evals)
+            entries.append((self.newSeq(clause), evals))
+        for i, queue in enumerate(self.queues):
+            new = [(evals[i], seq) for (seq, evals) in entries]
+            if len(new) > len(queue):
+                queue.extend(new)
+                heapify(queue)
+            else:
+                for entry in new:
+                    heappush(queue, entry)
+        self.queue_entries += len(self.queues)*len(entries)
+
+    def extractClause(self, clause):
+        """
+        Remove a clause from the clause set and return it. Its queue
+        entries are discarded lazily.
+        """
+        try:
+            seq = self.seqs[clause][0]
+        except KeyError:
+            raise ValueError("Clause not in set")
+        return self.removeSeq(seq)
+
+    def extractFirst(self):
+        """
+        Extract and return the oldest clause.
+        """
+        for seq in self.live:
+            return self.removeSeq(seq)
+        return None
+
+    def compactQueues(self):
+        """
+        Remove the entries of clauses that are no longer in the set
+        from all queues, if these make up most of the queues.
+        """
+        if self.queue_entries > 2*len(self.queues)*len(self.live)+64:
+            for i, queue in enumerate(self.queues):
+                queue = [entry for entry in queue if entry[1] in self.live]
+                heapify(queue)
+                self.queues[i] = queue
+            self.queue_entries = len(self.queues)*len(self.live)
 
     def extractBestByEval(self, heuristic_index):
         """
         Extract and return the clause with the lowest weight according
         to the selected heuristic. If the set is empty, return None.
         """
-        if self.clauses:
-            best = 0
-            besteval = self.clauses[0].evaluation[heuristic_index]
-            for i in range(1, len(self.clauses)):
-                if self.clauses[i].evaluation[heuristic_index] < besteval:
-                    besteval = self.clauses[i].evaluation[heuristic_index]
-                    best     = i
-            return self.clauses.pop(best)
+        queue = self.queues[heuristic_index]
+        while queue:
+            value, seq = heappop(queue)
+            self.queue_entries -= 1
+            clause = self.removeSeq(seq)
+            if clause != None:
+                self.compactQueues()
+                return clause
+        return None
+
+    def extractBest(self):
+        """
+        Extract and return the next "best" clause according to the
+        evaluation scheme.
+        """
+        return self.extractBestByEval(self.eval_functions.nextEval())
+
+
+
+class BucketQueue(object):
+    """
+    A priority queue of sequence numbers for small non-negative integer
+    priorities. Entries are stored in an array of FIFO queues
+    (buckets) indexed by priority, and a pointer tracks the smallest
+    priority that may still have entries. Insertion is O(1), and
+    extraction is amortized O(1) plus the size of the priority range.
+
+    The array never holds more than limit buckets. Entries with larger
+    priorities go to a binary heap of (priority, seq) pairs instead,
+    which is only consulted once all buckets are empty. Since sequence
+    numbers increase with insertion, the heap breaks ties in the same
+    way as the buckets.
+
+    If the queue is monotonic, priorities are known to increase with
+    each insertion, so a single bucket preserves their order.
+    """
+    def __init__(self, monotonic=False, limit=1024):
+        """
+        Initialize an empty queue.
+        """
+        self.monotonic = monotonic
+        self.limit     = limit
+        self.buckets   = [deque()]
+        self.overflow  = []
+        self.minimum   = 0
+        self.size      = 0
+
+    def __len__(self):
+        """
+        Return the number of entries, including stale ones.
+        """
+        return self.size
+
+    def push(self, value, seq):
+        """
+        Insert seq with priority value.
+        """
+        self.size += 1
+        if self.monotonic:
+            value = 0
+        elif value >= self.limit:
+            heappush(self.overflow, (value, seq))
+            return
+        while len(self.buckets) <= value:
+            self.buckets.append(deque())
+        self.buckets[value].append(seq)
+        if value < self.minimum:
+            self.minimum = value
+
+    def pop(self, live):
+        """
+        Remove entries in order of priority (and, within a bucket, of
+        insertion) until one is found that is still a key of live,
+        and return it. Return None if the queue runs empty.
+        """
+        buckets = self.buckets
+        while self.minimum < len(buckets):
+            bucket = buckets[self.minimum]
+            while bucket:
+                self.size -= 1
+                seq = bucket.popleft()
+                if seq in live:
+                    return seq
+            self.minimum += 1
+        overflow = self.overflow
+        while overflow:
+            self.size -= 1
+            value, seq = heappop(overflow)
+            if seq in live:
+                return seq
+        return None
+
+    def compact(self, live):
+        """
+        Discard all entries that are not keys of live.
+        """
+        self.size = 0
+        for i, bucket in enumerate(self.buckets):
+            if bucket:
+                bucket = deque([seq for seq in bucket if seq in live])
+                self.buckets[i] = bucket
+                self.size += len(bucket)
+        self.overflow = [entry for entry in self.overflow
+                         if entry[1] in live]
+        heapify(self.overflow)
+        self.size += len(self.overflow)
+
+
+class BucketClauseSet(HeuristicClauseSet):
+    """
+    A variant of HeuristicClauseSet for evaluation schemes in which
+    every evaluation function produces non-negative integers (like
+    symbol counting) or monotonically increasing values (like
+    FIFO). Each priority queue is a BucketQueue instead of a binary
+    heap. As each bucket is processed in order of insertion, ties are
+    broken in favour of older clauses, and clauses are selected in
+    exactly the same order as by HeuristicClauseSet.
+    """
+    def __init__(self, eval_functions):
+        """
+        Initialize the clause set.
+        """
+        if not BucketClauseSet.supports(eval_functions):
+            raise ValueError("BucketClauseSet requires integer or"
+                             " monotonic evaluation functions")
+        HeuristicClauseSet.__init__(self, eval_functions)
+        self.queues = [BucketQueue(f.monotonic)
+                       for f in eval_functions.eval_funs]
+
+    @staticmethod
+    def supports(eval_functions):
+        """
+        Return True if all evaluation functions of eval_functions
+        produce values that can be stored in a BucketQueue.
+        """
+        for f in eval_functions.eval_funs:
+            if not (f.integer or f.monotonic):
+                return False
+        return True
+
+    def addClause(self, clause):
+        """
+        Evaluate clause and add it to the set.
+        """
+        evals = self.eval_functions.evaluate(clause)
+        clause.addEval(evals)
+        self.eval_count += len(evals)
+        seq = self.newSeq(clause)
+        for queue, value in zip(self.queues, evals):
+            queue.push(value, seq)
+        self.queue_entries += len(self.queues)
+
+    def addClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the clause set.
+        """
+        for clause in clauses:
+            self.addClause(clause)
+
+    def compactQueues(self):
+        """
+        Remove the entries of clauses that are no longer in the set
+        from all queues, if these make up most of the queues.
+        """
+        if self.queue_entries > 2*len(self.queues)*len(self.live)+64:
+            for queue in self.queues:
+                queue.compact(self.live)
+            self.queue_entries = len(self.queues)*len(self.live)
+
+    def extractBestByEval(self, heuristic_index):
+        """
+        Extract and return the clause with the lowest weight according
+        to the selected heuristic. If the set is empty, return None.
+        """
+        queue = self.queues[heuristic_index]
+        size  = len(queue)
+        seq   = queue.pop(self.live)
+        self.queue_entries -= size-len(queue)
+        if seq == None:
+            return None
+        clause = self.removeSeq(seq)
+        self.compactQueues()
+        return clause
+
+
+class LazyHeuristicClauseSet(HeuristicClauseSet):
+    """
+    A variant of HeuristicClauseSet that defers expensive clause
+    evaluations. Evaluation functions that provide a cheap lower bound
+    (see ClauseEvaluationFunction.lowerBound()) are not called on
+    insertion. Instead, the clause enters the corresponding queue with
+    the bound as its key. When such an entry reaches the top of the
+    queue, it and up to batch_size-1 other deferred entries directly
+    below it are evaluated in one go and reinserted with their actual
+    evaluation. An exact entry on top of a queue is never worse than
+    any bound below it, and ties between equal keys are still broken
+    by age, so clauses are selected in the same order as by
+    HeuristicClauseSet. All missing evaluations of a clause are
+    computed when it is extracted.
+    """
+    def __init__(self, eval_functions, batch_size=16):
+        """
+        Initialize the clause set.
+        """
+        HeuristicClauseSet.__init__(self, eval_functions)
+        self.batch_size = batch_size
+        self.evals      = {}
+
+    def addClause(self, clause):
+        """
+        Add a clause to the clause set, evaluating it only according
+        to the evaluation functions without a lower bound.
+        """
+        evals = []
+        seq = self.newSeq(clause)
+        self.queue_entries += len(self.queues)
+        for f, queue in zip(self.eval_functions.eval_funs, self.queues):
+            bound = f.lowerBound(clause)
+            if bound == None:
+                value = f(clause)
+                self.eval_count += 1
+                evals.append(value)
+                heappush(queue, (value, seq))
+            else:
+                self.eval_deferred += 1
+                evals.append(None)
+                heappush(queue, (bound, seq))
+        if None in evals:
+            self.evals[seq] = evals
         else:
+            clause.addEval(evals)
+
+    def addClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the clause set.
+        """
+        for clause in clauses:
+            self.addClause(clause)
+
+    def completeEval(self, seq, clause):
+        """
+        Compute all deferred evaluations of the clause with sequence
+        number seq, and attach the evaluation to it.
+        """
+        evals = self.evals.pop(seq, None)
+        if evals != None:
+            for i, f in enumerate(self.eval_functions.eval_funs):
+                if evals[i] == None:
+                    evals[i] = f(clause)
+                    self.eval_count += 1
+                    self.eval_deferred -= 1
+            clause.addEval(evals)
+        return clause
+
+    def extractClause(self, clause):
+        """
+        Remove a clause from the clause set and return it.
+        """
+        try:
+            seq = self.seqs[clause][0]
+        except KeyError:
+            raise ValueError("Clause not in set")
+        return self.completeEval(seq, self.removeSeq(seq))
+
+    def extractFirst(self):
+        """
+        Extract and return the oldest clause.
+        """
+        for seq in self.live:
+            return self.completeEval(seq, self.removeSeq(seq))
+        return None
+
+    def isDeferred(self, seq, heuristic_index):
+        """
+        Return True if the evaluation of the clause with sequence
+        number seq according to the given heuristic has been deferred.
+        """
+        evals = self.evals.get(seq)
+        return evals != None and evals[heuristic_index] == None
+
+    def evaluateTop(self, heuristic_index):
+        """
+        Evaluate the deferred entries at the top of the selected queue
+        and reinsert them with their actual evaluations. Entries of
+        clauses no longer in the set are discarded.
+        """
+        queue = self.queues[heuristic_index]
+        f = self.eval_functions.eval_funs[heuristic_index]
+        batch = []
+        while queue and len(batch) < self.batch_size:
+            seq = queue[0][1]
+            if not seq in self.live:
+                heappop(queue)
+                self.queue_entries -= 1
+            elif self.isDeferred(seq, heuristic_index):
+                heappop(queue)
+                batch.append(seq)
+            else:
+                break
+        for seq in batch:
+            evals = self.evals[seq]
+            value = f(self.live[seq])
+            self.eval_count += 1
+            self.eval_deferred -= 1
+            evals[heuristic_index] = value
+            if not None in evals:
+                del self.evals[seq]
+                self.live[seq].addEval(evals)
+            heappush(queue, (value, seq))
+
+    def extractBestByEval(self, heuristic_index):
+        """
+        Extract and return the clause with the lowest weight according
+        to the selected heuristic. If the set is empty, return None.
+        """
+        queue = self.queues[heuristic_index]
+        while queue:
+            seq = queue[0][1]
+            if self.isDeferred(seq, heuristic_index):
+                self.evaluateTop(heuristic_index)
+                continue
+            heappop(queue)
+            self.queue_entries -= 1
+            clause = self.removeSeq(seq)
+            if clause != None:
+                self.completeEval(seq, clause)
+                self.compactQueues()
+                return clause
+        return None
+
+
+def newPassiveSet(eval_functions):
+    """
+    Return a new set of unprocessed clauses for the given evaluation
+    scheme, using a BucketClauseSet if the scheme allows it, and a
+    HeuristicClauseSet otherwise.
+    """
+    if BucketClauseSet.supports(eval_functions):
+        return BucketClauseSet(eval_functions)
+    return HeuristicClauseSet(eval_functions)
+
+
+class ColumnarHeuristicClauseSet(ClauseSet):
+    """
+    An alternative to HeuristicClauseSet that stores the evaluations
+    of all clauses in a NumPy matrix, with one row (slot) per clause
+    and one column per evaluation function. Extracted clauses are
+    marked in a validity mask, and the matrix is compacted when most
+    slots are invalid. The best clause is selected by a vectorized
+    argmin over a column. Since slots are assigned (and compacted) in
+    order of insertion, ties are broken in favour of older clauses,
+    exactly as in HeuristicClauseSet. A dictionary (self.positions)
+    maps each clause to the list of its slots, so that individual
+    clauses can be extracted without searching the matrix.
+
+    This class requires NumPy, and is only available if it is
+    installed.
+    """
+    available = numpy != None
+
+    def __init__(self, eval_functions, capacity=1024):
+        """
+        Initialize the clause set with room for capacity clauses.
+        """
+        if not ColumnarHeuristicClauseSet.available:
+            raise ImportError("ColumnarHeuristicClauseSet requires NumPy")
+        self.eval_functions = eval_functions
+        self.stats  = IndexStatistics()
+        columns     = len(eval_functions.eval_funs)
+        self.evals  = numpy.empty((capacity, columns))
+        self.valid  = numpy.zeros(capacity, dtype=bool)
+        self.slots  = [None]*capacity
+        self.positions = {}
+        self.used   = 0
+        self.count  = 0
+        self.eval_count    = 0
+        self.eval_deferred = 0
+
+    @property
+    def clauses(self):
+        """
+        The list of clauses in the set, in order of insertion.
+        """
+        return [c for c in self.slots[:self.used] if c != None]
+
+    def __len__(self):
+        """
+        Return number of clauses in set.
+        """
+        return self.count
+
+    def reserve(self, size):
+        """
+        Make sure that there are at least size free slots, growing the
+        matrix geometrically if necessary.
+        """
+        capacity = len(self.slots)
+        needed = self.used+size
+        if needed > capacity:
+            capacity = max(2*capacity, needed)
+            evals = numpy.empty((capacity, self.evals.shape[1]))
+            evals[:self.used] = self.evals[:self.used]
+            valid = numpy.zeros(capacity, dtype=bool)
+            valid[:self.used] = self.valid[:self.used]
+            self.evals = evals
+            self.valid = valid
+            self.slots.extend([None]*(capacity-len(self.slots)))
+
+    def addClause(self, clause):
+        """
+        Evaluate clause and add it to the set.
+        """
+        self.addClauses([clause])
+
+    def addClauses(self, clauses):
+        """
+        Evaluate all clauses from the list clauses and add them to the
+        set, storing their evaluations in one block of the matrix.
+        """
+        if not clauses:
+            return
+        evaluate = self.eval_functions.evaluate
+        rows = []
+        for clause in clauses:
+            evals = evaluate(clause)
+            clause.addEval(evals)
+            self.eval_count += len(evals)
+            rows.append(evals)
+        self.reserve(len(clauses))
+        start = self.used
+        end   = start+len(clauses)
+        self.evals[start:end] = rows
+        self.valid[start:end] = True
+        self.slots[start:end] = clauses
+        positions = self.positions
+        for slot, clause in enumerate(clauses, start):
+            try:
+                positions[clause].append(slot)
+            except KeyError:
+                positions[clause] = [slot]
+        self.used  = end
+        self.count += len(clauses)
+
+    def removeSlot(self, slot):
+        """
+        Remove and return the clause in slot, compacting the matrix if
+        less than half of the used slots are still valid.
+        """
+        clause = self.slots[slot]
+        self.slots[slot] = None
+        slots = self.positions[clause]
+        if len(slots) == 1:
+            del self.positions[clause]
+        else:
+            slots.remove(slot)
+        self.valid[slot] = False
+        self.count -= 1
+        if self.used > 2*self.count+64:
+            self.compact()
+        return clause
+
+    def compact(self):
+        """
+        Move all valid slots to the front of the matrix, preserving
+        their order.
+        """
+        keep = numpy.flatnonzero(self.valid[:self.used])
+        size = len(keep)
+        self.evals[:size] = self.evals[keep]
+        self.valid[:self.used] = False
+        self.valid[:size] = True
+        self.slots[:self.used] = [self.slots[i] for i in keep]+\
+                                 [None]*(self.used-size)
+        self.used = size
+        self.positions = {}
+        for slot in range(size):
+            clause = self.slots[slot]
+            try:
+                self.positions[clause].append(slot)
+            except KeyError:
+                self.positions[clause] = [slot]
+
+    def extractClause(self, clause):
+        """
+        Remove a clause from the clause set and return it.
+        """
+        try:
+            slot = self.positions[clause][0]
+        except KeyError:
+            raise ValueError("Clause not in set")
+        return self.removeSlot(slot)
+
+    def extractFirst(self):
+        """
+        Extract and return the oldest clause.
+        """
+        if not self.count:
             return None
+        return self.removeSlot(int(numpy.argmax(self.valid[:self.used])))
+
+    def extractBestByEval(self, heuristic_index):
+        """
+        Extract and return the clause with the lowest weight according
+        to the selected heuristic. If the set is empty, return None.
+        """
+        if not self.count:
+            return None
+        column = numpy.where(self.valid[:self.used],
+                             self.evals[:self.used, heuristic_index],
+                             numpy.inf)
+        return self.removeSlot(int(numpy.argmin(column)))
 
     def extractBest(self):
         """
@@ -192,19 +932,54 @@ class HeuristicClauseSet(ClauseSet):
         return self.extractBestByEval(self.eval_functions.nextEval())
 
 
+PassiveSets = {
+    "auto"     : newPassiveSet,
+    "heap"     : HeuristicClauseSet,
+    "bucket"   : BucketClauseSet,
+    "lazy"     : LazyHeuristicClauseSet,
+    "columnar" : ColumnarHeuristicClauseSet
+    }
+"""
+Table associating name and implementation of the set of unprocessed
+clauses, so that we can select it by name. "auto" selects "bucket" if
+the evaluation scheme allows it, and "heap" otherwise.
+"""
+
+
+def supportedPassiveSets(eval_functions):
+    """
+    Return the names of the implementations in PassiveSets that can be
+    used with the evaluation scheme eval_functions.
+    """
+    res = []
+    for name, impl in PassiveSets.items():
+        if impl == BucketClauseSet and \
+           not BucketClauseSet.supports(eval_functions):
+            continue
+        if impl == ColumnarHeuristicClauseSet and \
+           not ColumnarHeuristicClauseSet.available:
+            continue
+        res.append(name)
+    return res
+
 
 class IndexedClauseSet(ClauseSet):
     """
     This is a normal clause set, augmented by indices that speeds up
     the finding of resolution and subsumption partners.
     """
-    def __init__(self, clauses = []):
+    def __init__(self, clauses = [], res_index = DiscTreeResolutionIndex,
+                 sub_index = FeatureVectorIndex):
         """
-        Create the two indices and call the superclass initializer. 
+        Create the two indices and call the superclass
+        initializer. res_index and sub_index are the classes
+        implementing the resolution index and the subsumption index
+        (see ResolutionIndexes and SubsumptionIndexes in indexing.py).
         """
-        self.res_index = ResolutionIndex()
-        self.sub_index = SubsumptionIndex()
-        ClauseSet.__init__(self, clauses)
+        self.res_index = res_index()
+        self.sub_index = sub_index()
+        ClauseSet.__init__(self)
+        self.addClauses(clauses)
 
     def addClause(self, clause):
         """
@@ -215,6 +990,15 @@ class IndexedClauseSet(ClauseSet):
         self.sub_index.insertClause(clause)
         ClauseSet.addClause(self, clause)
 
+    def addClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the indices (in bulk),
+        then to the actual set.
+        """
+        self.res_index.insertClauses(clauses)
+        self.sub_index.insertClauses(clauses)
+        ClauseSet.addClauses(self, clauses)
+
     def extractClause(self, clause):
         """
         Remove the clause from the indices, then use the  superclass
@@ -230,6 +1014,20 @@ class IndexedClauseSet(ClauseSet):
         """
         return self.res_index.getResolutionLiterals(lit)
 
+    def getResolutionUnifiers(self, clause, lit, unif_cache=None):
+        """
+        If the resolution index is perfect, take the unifiers directly
+        from the index. Otherwise, unify with the candidates as usual.
+        """
+        if self.res_index.perfect:
+            start = perf_counter()
+            res = self.res_index.getResolutionUnifiers(clause, lit)
+            self.stats.resolution.record(len(res), len(res),
+                                         perf_counter()-start, 0.0)
+            return res
+        return ClauseSet.getResolutionUnifiers(self, clause, lit,
+                                               unif_cache)
+
     def getSubsumingCandidates(self, queryclause):
         """
         Overwrite the original function with one based on indexing. 
@@ -242,6 +1040,13 @@ class IndexedClauseSet(ClauseSet):
         """
         return self.sub_index.getSubsumedCandidates(queryclause)
 
+    def memoryUsage(self):
+        """
+        Return a pair (objects, bytes) estimating the size of the
+        clause list and the two indices.
+        """
+        return indexMemory([self.clauses, self.res_index, self.sub_index])
+
 
 class TestClauseSets(unittest.TestCase):
     """
@@ -392,6 +1197,210 @@ cnf(prove_neither_charles_nor_butler_did_it,negated_conjecture,
         self.assertEqual(c, None)
 
 
+    def testHeuristicQueueOrder(self):
+        """
+        Test that the priority queues select the same clauses as a
+        linear scan for the first clause with the best evaluation,
+        also when extraction and insertion are interleaved.
+        """
+        lexer = Lexer(self.spec)
+        parsed = ClauseSet()
+        parsed.parse(lexer)
+        cls = parsed.clauses
+
+        clauses = HeuristicClauseSet(PickGiven2)
+        reference = []
+        clauses.addClauses(cls[:6])
+        reference.extend(cls[:6])
+        rest = cls[6:]
+        while clauses:
+            i = PickGiven2.nextEval()
+            best = reference[0]
+            for c in reference:
+                if c.evaluation[i] < best.evaluation[i]:
+                    best = c
+            reference.remove(best)
+            self.assertEqual(clauses.extractBestByEval(i), best)
+            if rest:
+                clauses.addClause(rest[0])
+                reference.append(rest.pop(0))
+            self.assertEqual(list(clauses.clauses), reference)
+        self.assertEqual(clauses.extractBest(), None)
+
+        clauses.addClauses(cls)
+        c = cls[3]
+        self.assertEqual(clauses.extractClause(c), c)
+        self.assertEqual(len(clauses), len(cls)-1)
+        self.assertTrue(not c in clauses.clauses)
+        self.assertRaises(ValueError, clauses.extractClause, c)
+        # A clause may be in the set more than once.
+        clauses.addClause(cls[1])
+        self.assertEqual(clauses.extractClause(cls[1]), cls[1])
+        self.assertTrue(cls[1] in clauses.clauses)
+        self.assertEqual(clauses.extractFirst(), cls[0])
+
+    def testBucketClauseSet(self):
+        """
+        Test that the bucket-based clause set selects the same clauses
+        as the heap-based one, and that it is only chosen for integer
+        evaluations.
+        """
+        lexer = Lexer(self.spec)
+        parsed = ClauseSet()
+        parsed.parse(lexer)
+        cls = parsed.clauses
+
+        heap = HeuristicClauseSet(PickGiven2)
+        buckets = newPassiveSet(PickGiven2)
+        self.assertTrue(isinstance(buckets, BucketClauseSet))
+        heap.addClauses(cls[:5])
+        buckets.addClauses(cls[:5])
+        self.assertEqual(buckets.extractClause(cls[2]), cls[2])
+        heap.extractClause(cls[2])
+        for i in [0, 0, 1, 0, 1]:
+            self.assertEqual(buckets.extractBestByEval(i),
+                             heap.extractBestByEval(i))
+        for j in range(10):
+            heap.addClauses(cls)
+            buckets.addClauses(cls)
+        for i in [0, 1, 1, 0]*100:
+            self.assertEqual(buckets.extractBestByEval(i),
+                             heap.extractBestByEval(i))
+            self.assertEqual(list(buckets.clauses), list(heap.clauses))
+            for cset in [heap, buckets]:
+                self.assertEqual(cset.queue_entries,
+                                 sum([len(q) for q in cset.queues]))
+        self.assertEqual(buckets.extractBest(), None)
+        # Stale entries have been discarded along the way.
+        self.assertTrue(sum([len(q) for q in buckets.queues]) <= 64)
+
+        weighted = EvalStructure([(SymbolCountEvaluation(1.5,1),1)])
+        self.assertFalse(BucketClauseSet.supports(weighted))
+        self.assertTrue(isinstance(newPassiveSet(weighted),
+                                   HeuristicClauseSet))
+        self.assertFalse(isinstance(newPassiveSet(weighted),
+                                    BucketClauseSet))
+        self.assertRaises(ValueError, BucketClauseSet, weighted)
+        self.assertFalse("bucket" in supportedPassiveSets(weighted))
+        self.assertTrue("bucket" in supportedPassiveSets(PickGiven2))
+        self.assertEqual("columnar" in supportedPassiveSets(PickGiven2),
+                         numpy != None)
+
+        # Large weights do not allocate a bucket for every value.
+        heavy = EvalStructure([(SymbolCountEvaluation(1000,1),1)])
+        heap = HeuristicClauseSet(heavy)
+        buckets = newPassiveSet(heavy)
+        self.assertTrue(isinstance(buckets, BucketClauseSet))
+        heap.addClauses(cls)
+        buckets.addClauses(cls)
+        self.assertTrue(len(buckets.queues[0].buckets) <= 1024)
+        for i in range(len(cls)):
+            self.assertEqual(buckets.extractBest(), heap.extractBest())
+
+    def testBucketQueue(self):
+        """
+        Test that priorities beyond the limit of a bucket queue are
+        kept in order in its overflow heap.
+        """
+        queue = BucketQueue(limit=4)
+        live = {}
+        for seq, value in enumerate([7, 2, 9, 0, 7, 3, 4, 2]):
+            queue.push(value, seq)
+            live[seq] = True
+        self.assertEqual(len(queue.buckets), 4)
+        self.assertEqual(len(queue), 8)
+        del live[4]
+        queue.compact(live)
+        self.assertEqual(len(queue), 7)
+        res = []
+        seq = queue.pop(live)
+        while seq != None:
+            res.append(seq)
+            seq = queue.pop(live)
+        self.assertEqual(res, [3, 1, 7, 5, 6, 0, 2])
+        self.assertEqual(len(queue), 0)
+
+    def testLazyClauseSet(self):
+        """
+        Test that the lazy clause set selects the same clauses as the
+        heap-based one, while deferring evaluations.
+        """
+        lexer = Lexer(self.spec)
+        parsed = ClauseSet()
+        parsed.parse(lexer)
+        cls = parsed.clauses
+
+        heap = HeuristicClauseSet(PickGiven2)
+        lazy = LazyHeuristicClauseSet(PickGiven2, batch_size=3)
+        heap.addClauses(cls)
+        lazy.addClauses(cls)
+        self.assertEqual(lazy.eval_count, len(cls))
+        self.assertEqual(lazy.eval_deferred, len(cls))
+        c = lazy.extractClause(cls[4])
+        self.assertEqual(c.evaluation, heap.extractClause(cls[4]).evaluation)
+        for i in [0, 0, 1, 0]:
+            self.assertEqual(lazy.extractBestByEval(i),
+                             heap.extractBestByEval(i))
+        self.assertTrue(lazy.eval_deferred > 0)
+        self.assertEqual(lazy.eval_count+lazy.eval_deferred, heap.eval_count)
+        for j in range(5):
+            heap.addClauses(cls)
+            lazy.addClauses(cls)
+        for i in [0, 1, 1, 0]*25:
+            c = lazy.extractBestByEval(i)
+            self.assertEqual(c, heap.extractBestByEval(i))
+            if c != None:
+                self.assertEqual(len(c.evaluation), 2)
+            self.assertEqual(lazy.queue_entries,
+                             sum([len(q) for q in lazy.queues]))
+        self.assertEqual(lazy.eval_deferred, 0)
+
+    @unittest.skipUnless(numpy, "NumPy is not available")
+    def testColumnarClauseSet(self):
+        """
+        Test that the columnar clause set selects the same clauses as
+        the heap-based one, including growing and compaction.
+        """
+        lexer = Lexer(self.spec)
+        parsed = ClauseSet()
+        parsed.parse(lexer)
+        cls = parsed.clauses
+
+        heap = HeuristicClauseSet(PickGiven2)
+        columnar = ColumnarHeuristicClauseSet(PickGiven2, capacity=4)
+        for c in cls[:5]:
+            heap.addClause(c)
+            columnar.addClause(c)
+        heap.addClauses(cls[5:])
+        columnar.addClauses(cls[5:])
+        self.assertEqual(columnar.clauses, list(heap.clauses))
+        self.assertEqual(columnar.extractClause(cls[2]), cls[2])
+        heap.extractClause(cls[2])
+        self.assertRaises(ValueError, columnar.extractClause, cls[2])
+        # A clause may be in the set more than once.
+        columnar.addClause(cls[3])
+        heap.addClause(cls[3])
+        self.assertEqual(columnar.extractClause(cls[3]), cls[3])
+        heap.extractClause(cls[3])
+        self.assertEqual(columnar.extractFirst(), heap.extractFirst())
+        for i in [0, 0, 1, 0, 1, 1, 0, 0, 1, 0, 1, 0]:
+            self.assertEqual(columnar.extractBestByEval(i),
+                             heap.extractBestByEval(i))
+            self.assertEqual(len(columnar), len(heap))
+        self.assertEqual(columnar.extractBest(), None)
+
+        many = ColumnarHeuristicClauseSet(PickGiven2, capacity=2)
+        for j in range(20):
+            many.addClauses(cls)
+        while many.extractBestByEval(0) != None:
+            self.assertEqual(many.clauses, [c for c in many.slots
+                                            if c != None])
+            self.assertEqual(sum([len(p) for p in many.positions.values()]),
+                             len(many))
+        self.assertEqual(len(many), 0)
+        # The matrix has been compacted along the way.
+        self.assertTrue(many.used <= 64)
+
     def testIndexedClauseSetChanges(self):
         """
         Test that clause set initialization and parsing work.
@@ -409,6 +1418,28 @@ cnf(prove_neither_charles_nor_butler_did_it,negated_conjecture,
         print(sig)
 
 
+    def testBulkAdd(self):
+        """
+        Test that clauses added in bulk are evaluated and indexed.
+        """
+        lexer = Lexer(self.spec)
+        clauses = ClauseSet()
+        clauses.parse(lexer)
+
+        hclauses = HeuristicClauseSet(PickGiven2)
+        hclauses.addClauses(clauses.clauses)
+        self.assertEqual(len(hclauses), len(clauses))
+        for c in hclauses.clauses:
+            self.assertEqual(len(c.evaluation), 2)
+
+        iclauses = IndexedClauseSet(clauses.clauses)
+        self.assertEqual(len(iclauses), len(clauses))
+        lexer = Lexer("hates(X,agatha)")
+        lit = parseLiteral(lexer)
+        self.assertTrue(len(iclauses.getResolutionLiterals(lit)) > 0)
+        for c in clauses.clauses:
+            self.assertTrue(iclauses.sub_index.isIndexed(c))
+
     def testResPositions(self):
         """
         Test the the function returning all possible literal positions
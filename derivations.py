@@ -64,6 +64,7 @@ class Derivable(object):
         self.setName(name)
         self.derivation = derivation
         self.refCount = 0
+        self.goal_derived = None
 
     def __repr__(self):
         return self.name
@@ -91,6 +92,27 @@ class Derivable(object):
         else:
             return []
 
+    def isConjecture(self):
+        """
+        Return True if the object is a conjecture or a negated
+        conjecture. Plain derivable objects are neither.
+        """
+        return False
+
+    def isGoalDerived(self):
+        """
+        Return True if the object is a (negated) conjecture, or if it
+        has been derived from one. The result is cached, so that for
+        newly derived objects only the direct parents are checked.
+        """
+        if self.goal_derived == None:
+            self.goal_derived = self.isConjecture()
+            for p in self.getParents():
+                if self.goal_derived:
+                    break
+                self.goal_derived = p.isGoalDerived()
+        return self.goal_derived
+
     def incRefCount(self):
         """
         Increase reference counter (counts virtual edges in the
@@ -241,6 +263,7 @@ class TestDerivations(unittest.TestCase):
         o3.setDerivation(flatDerivation("factor", [o1]))
         print(o3.derivation)
         self.assertEqual(len(o3.getParents()), 1)
+        self.assertFalse(o3.isGoalDerived())
 
     def testProofExtraction(self):
         """
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# ----------------------------------
+#
+# Module flatterms.py
+
+"""
+A flat (serialized) representation of first-order terms.
+
+The standard term representation (see terms.py) uses nested
+lists. This is convenient, but traversing nested lists requires either
+recursion or explicit stacks, and selecting the arguments of a term
+with termArgs() creates a new list every time.
+
+A flatterm represents a term by the sequence of symbols encountered
+in a preorder (left-to-right, depth-first) traversal. As an example,
+the term f(g(X,a),b) is represented by the sequence
+
+   position: 0  1  2  3  4
+   symbol  : f  g  X  a  b
+
+For each position, we also store the arity of the symbol (with -1 for
+variables), and the position directly after the end of the subterm
+starting there (the "skip" or "end" offset):
+
+   arity   : 2  2 -1  0  0
+   end     : 5  4  3  4  5
+
+With this, two terms can be traversed in parallel with simple integer
+indices. If one term has a variable at position i, and the other term
+has a compound subterm starting at position j, the subterm can be
+skipped in one step by continuing at end[j]. Finally, we keep a
+pointer to the original (nested) subterm at each position, so that
+variables can be bound to proper terms without copying.
+
+Copyright 2026 the PyRes contributors
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program ; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+MA  02111-1307 USA
+"""
+
+import unittest
+from terms import *
+
+
+class FlatTerm(object):
+    """
+    A flatterm, i.e. a term serialized into parallel arrays in
+    preorder:
+    symbols[i]  is the function symbol or variable at position i.
+    arities[i]  is the arity of the symbol at position i, or -1 if it
+                is a variable.
+    ends[i]     is the position directly after the subterm starting
+                at position i.
+    subterms[i] is the (nested) term starting at position i.
+    term_key    is a hashable key for the term (see key()), computed
+                on first use.
+    """
+    def __init__(self, term):
+        """
+        Serialize term into a new flatterm.
+        """
+        self.symbols  = []
+        self.arities  = []
+        self.ends     = []
+        self.subterms = []
+        self.term_key = None
+        self.addTerm(term)
+
+    def __repr__(self):
+        """
+        Return a string representation of the flatterm.
+        """
+        return "<"+" ".join([str(s) for s in self.symbols])+">"
+
+    def __len__(self):
+        """
+        Return the number of positions (i.e. symbol occurances) of
+        the flatterm.
+        """
+        return len(self.symbols)
+
+    def addTerm(self, term):
+        """
+        Append the serialization of term (starting at the current
+        end of the arrays).
+        """
+        pos = len(self.symbols)
+        self.subterms.append(term)
+        self.ends.append(None)
+        if termIsVar(term):
+            self.symbols.append(term)
+            self.arities.append(-1)
+        else:
+            self.symbols.append(termFunc(term))
+            self.arities.append(len(term)-1)
+            for s in termArgs(term):
+                self.addTerm(s)
+        self.ends[pos] = len(self.symbols)
+
+    def isVar(self, pos):
+        """
+        Return True if the position pos holds a variable.
+        """
+        return self.arities[pos] < 0
+
+    def getTerm(self, pos=0):
+        """
+        Return the (nested) term starting at pos.
+        """
+        return self.subterms[pos]
+
+    def key(self):
+        """
+        Return a hashable key for the term. Shared terms are
+        represented by themselves (they hash by identity), other terms
+        by nested tuples (see termKey()). The key is computed only
+        once.
+        """
+        if self.term_key == None:
+            term = self.subterms[0]
+            if type(term) is BankTerm:
+                self.term_key = term
+            else:
+                self.term_key = termKey(term)
+        return self.term_key
+
+    def subtermEqual(self, pos, other, opos):
+        """
+        Return True if the subterm starting at pos is equal to the
+        subterm starting at position opos of the flatterm other. This
+        only compares the two slices of the symbol and arity arrays.
+        """
+        end  = self.ends[pos]
+        oend = other.ends[opos]
+        return end-pos == oend-opos and \
+            self.symbols[pos:end] == other.symbols[opos:oend] and \
+            self.arities[pos:end] == other.arities[opos:oend]
+
+
+class TestFlatTerms(unittest.TestCase):
+    """
+    Test flatterm functions.
+    """
+    def setUp(self):
+        self.t1 = string2Term("f(g(X,a),b)")
+        self.t2 = string2Term("X")
+        self.t3 = string2Term("g(X,a)")
+
+    def testFlatten(self):
+        """
+        Test the serialization of terms.
+        """
+        ft = FlatTerm(self.t1)
+        self.assertEqual(len(ft), 5)
+        self.assertEqual(ft.symbols, ["f", "g", "X", "a", "b"])
+        self.assertEqual(ft.arities, [2, 2, -1, 0, 0])
+        self.assertEqual(ft.ends, [5, 4, 3, 4, 5])
+        self.assertTrue(ft.isVar(2))
+        self.assertTrue(not ft.isVar(3))
+        self.assertTrue(termEqual(ft.getTerm(), self.t1))
+        self.assertTrue(termEqual(ft.getTerm(1), self.t3))
+        self.assertEqual(ft.key(), termKey(self.t1))
+        self.assertTrue(ft.key() is ft.key())
+
+        ft = FlatTerm(self.t2)
+        self.assertEqual(ft.ends, [1])
+        self.assertTrue(ft.isVar(0))
+
+    def testSubtermEqual(self):
+        """
+        Test the comparison of subterms of flatterms.
+        """
+        ft1 = FlatTerm(self.t1)
+        ft2 = FlatTerm(self.t3)
+        ft3 = FlatTerm(string2Term("g(g(X,a),b)"))
+        self.assertTrue(ft1.subtermEqual(1, ft2, 0))
+        self.assertTrue(ft1.subtermEqual(1, ft3, 1))
+        self.assertTrue(not ft1.subtermEqual(0, ft3, 0))
+        self.assertTrue(not ft1.subtermEqual(1, ft2, 1))
+        self.assertTrue(ft1.subtermEqual(2, ft2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
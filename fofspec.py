@@ -39,7 +39,7 @@ import os
 import os.path
 
 from lexer import Lexer, Token
-from signature import Signature
+from signature import Signature, resetSymbolTable
 from clauses import Clause, parseClause
 from clausesets import ClauseSet
 from formulas import WFormula, parseWFormula, negateConjecture
@@ -85,8 +85,10 @@ class FOFSpec(object):
 
     def __init__(self):
         """
-        Initialize the specification.
+        Initialize the specification. This starts a new global symbol
+        table for the problem.
         """
+        resetSymbolTable()
         self.clauses  = []
         self.formulas = []
         self.isFof    = False
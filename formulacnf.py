@@ -72,6 +72,7 @@ import unittest
 from lexer import Token,Lexer
 from derivations import Derivable,Derivation,flatDerivation,enableDerivationOutput,toggleDerivationOutput
 from terms import *
+from signature import internSymbol
 from substitutions import Substitution, freshVar
 from literals import Literal
 from clauses import Clause
@@ -103,7 +104,7 @@ class SkolemSymbols(object):
         """
         Return a new skolem term for the given (list of) variables.
         """
-        symbol = self.newSkolemSymbol()
+        symbol = internSymbol(self.newSkolemSymbol(), len(varlist))
         res = [symbol]
         res.extend(varlist)
         return res
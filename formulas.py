@@ -455,6 +455,13 @@ class WFormula(Derivable):
                                    repr(self.formula),self.strDerivation())
         return res
 
+    def isConjecture(self):
+        """
+        Return True if the formula is a conjecture or a negated
+        conjecture.
+        """
+        return self.type in ["conjecture", "negated_conjecture"]
+
     def collectSig(self, sig = None):
         """
         Collect formula signature.
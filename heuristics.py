@@ -43,7 +43,10 @@ Email: schulz@eprover.org
 """
 
 import unittest
-from lexer import Lexer
+import copy
+from time import perf_counter
+from lexer import Token, Lexer, UnexpectedTokenError, UnexpectedIdentError
+from terms import termIsVar, termFunc, termArgs
 import clauses
 
 
@@ -54,7 +57,21 @@ class ClauseEvaluationFunction(object):
     clause evaluation function. However, some heuristics may need
     to be able to store information, either from initialization, or
     from previous calls.
+
+    Two class attributes describe the values produced by the
+    function, so that clause sets can pick a specialized
+    representation:
+    integer   is True if all evaluations are small non-negative
+              integers.
+    monotonic is True if each evaluation is larger than all previous
+              ones, i.e. the evaluation order is the order of calls.
+    A third one, timed, is set on the copies of the function used in
+    a proof search (see EvalStructure.copy()). Only these count their
+    calls in eval_calls and the time spent in them in eval_time.
     """
+    integer   = False
+    monotonic = False
+    timed     = False
 
     def __init__(self): # pragma: nocover
         """
@@ -71,9 +88,17 @@ class ClauseEvaluationFunction(object):
 
     def __call__(self, clause):
         """
-        Provide this as a callable function.
+        Provide this as a callable function. If the function is timed,
+        the number of calls and the time spent in them are recorded in
+        eval_calls and eval_time.
         """
-        return self.hEval(clause)
+        if not self.timed:
+            return self.hEval(clause)
+        start = perf_counter()
+        res = self.hEval(clause)
+        self.eval_time  = self.eval_time+perf_counter()-start
+        self.eval_calls = self.eval_calls+1
+        return res
 
     def hEval(self, clause): # pragma: nocover
         """
@@ -81,12 +106,31 @@ class ClauseEvaluationFunction(object):
         """
         assert False and "Virtual base class is not callable"
 
+    def initialize(self, clauses):
+        """
+        Prepare the function for a proof search starting with the list
+        of initial clauses. By default, there is nothing to do.
+        """
+        pass
+
+    def lowerBound(self, clause):
+        """
+        Return a cheap lower bound for the evaluation of clause, or
+        None if the function has to be evaluated right away. If a
+        bound is available, a clause set may defer the actual
+        evaluation until the clause is a candidate for selection.
+        """
+        return None
+
 
 class FIFOEvaluation(ClauseEvaluationFunction):
     """
     Class implementing first-in-first-out evaluation - i.e. clause
     evalutations increase over time (and independent of the clause).
     """
+    integer   = True
+    monotonic = True
+
     def __init__(self):
         """
         Initialize object.
@@ -112,7 +156,9 @@ class SymbolCountEvaluation(ClauseEvaluationFunction):
         """
         self.fweight = fweight
         self.vweight = vweight
-        self.name    = "SymbolCountEval(%f,%f)"%(fweight,vweight)
+        self.name    = "SymbolCountEval(%g,%g)"%(fweight,vweight)
+        self.integer = isinstance(fweight, int) and fweight >= 0 and \
+                       isinstance(vweight, int) and vweight >= 0
 
     def hEval(self, clause):
         """
@@ -120,6 +166,117 @@ class SymbolCountEvaluation(ClauseEvaluationFunction):
         """
         return clause.weight(self.fweight, self.vweight)
 
+    def lowerBound(self, clause):
+        """
+        Return the weight of the clause with all terms below the
+        arguments of the atoms counted with the smaller of the two
+        weights. This only looks at the top two levels of each atom.
+        """
+        fweight = self.fweight
+        vweight = self.vweight
+        if fweight < 0 or vweight < 0:
+            return None
+        minweight = min(fweight, vweight)
+        res = 0
+        for l in clause.literals:
+            res = res + fweight
+            for t in termArgs(l.atom):
+                if termIsVar(t):
+                    res = res + vweight
+                else:
+                    res = res + fweight + (len(t)-1)*minweight
+        return res
+
+
+class GoalDistEvaluation(ClauseEvaluationFunction):
+    """
+    Goal-directed symbol counting. Each occurrence of a function or
+    predicate symbol counts fweight plus dweight times the distance
+    of the symbol from the conjecture, each variable counts
+    vweight. The weight of clauses that are not derived from the
+    conjecture is then multiplied by gfactor.
+
+    The symbols of the negated conjecture have distance 0. A symbol
+    occurring in an initial clause together with a symbol of distance
+    d has distance at most d+1. Symbols not connected to the
+    conjecture in this way are one step further away than the most
+    distant connected symbol. Equality does not connect symbols,
+    since it occurs nearly everywhere, and always has distance 0.
+    The distances are computed once by initialize(), on the copy of
+    the function used in the proof search (see EvalStructure.copy()).
+    Without a conjecture, all symbols have distance 0.
+    """
+    def __init__(self, fweight=2, vweight=1, dweight=1, gfactor=2):
+        """
+        Initialize heuristic.
+        """
+        self.fweight  = fweight
+        self.vweight  = vweight
+        self.dweight  = dweight
+        self.gfactor  = gfactor
+        self.distance = {}
+        self.maxdist  = 0
+        self.name     = "GoalDistEval(%g,%g,%g,%g)"%\
+                        (fweight, vweight, dweight, gfactor)
+        self.integer  = True
+        for w in [fweight, vweight, dweight, gfactor]:
+            if not isinstance(w, int) or w < 0:
+                self.integer = False
+
+    def initialize(self, clauses):
+        """
+        Compute the distances of all symbols in clauses from the
+        symbols of the clauses derived from the conjecture.
+        """
+        self.distance = {}
+        frontier = set()
+        rest = []
+        for c in clauses:
+            symbols = set()
+            for l in c.literals:
+                l.collectFuns(symbols)
+            symbols.discard("=")
+            if c.isGoalDerived():
+                frontier.update(symbols)
+            else:
+                rest.append(symbols)
+        dist = 0
+        while frontier:
+            for f in frontier:
+                self.distance[f] = dist
+            dist = dist+1
+            connected = [symbols for symbols in rest if symbols & frontier]
+            rest = [symbols for symbols in rest if not symbols & frontier]
+            frontier = set()
+            for symbols in connected:
+                frontier.update(symbols)
+            frontier.difference_update(self.distance)
+        self.maxdist = dist
+        self.distance["="] = 0
+
+    def termWeight(self, t):
+        """
+        Return the goal distance weight of the term t.
+        """
+        if termIsVar(t):
+            return self.vweight
+        res = self.fweight+\
+              self.dweight*self.distance.get(termFunc(t), self.maxdist)
+        for s in termArgs(t):
+            res = res + self.termWeight(s)
+        return res
+
+    def hEval(self, clause):
+        """
+        Actual evaluation function.
+        """
+        res = 0
+        for l in clause.literals:
+            res = res + self.termWeight(l.atom)
+        if not clause.isGoalDerived():
+            res = res*self.gfactor
+        return res
+
 
 class EvalStructure(object):
     """
@@ -154,9 +311,36 @@ class EvalStructure(object):
         assert len(eval_descriptor)
         self.eval_funs = [pair[0] for pair in eval_descriptor]
         self.eval_vec  = [pair[1] for pair in eval_descriptor]
+        assert max(self.eval_vec) > 0
         self.current = 0
         self.current_count = self.eval_vec[0]
 
+    def copy(self):
+        """
+        Return a copy of the evaluation scheme for a new proof search,
+        starting at the beginning of the round-robin schedule. The
+        evaluation functions are copied as well, so that their state
+        (e.g. the goal distances of GoalDistEvaluation) belongs to the
+        search, and the copies are timed (see
+        ClauseEvaluationFunction).
+        """
+        descriptor = []
+        for f, count in zip(self.eval_funs, self.eval_vec):
+            f = copy.copy(f)
+            f.timed      = True
+            f.eval_calls = 0
+            f.eval_time  = 0.0
+            descriptor.append((f, count))
+        return EvalStructure(descriptor)
+
+    def initialize(self, clauses):
+        """
+        Initialize all evaluation functions for a proof search on the
+        list of initial clauses.
+        """
+        for f in self.eval_funs:
+            f.initialize(clauses)
+
     def evaluate(self, clause):
         """
         Return a composite evaluation of a clause.
@@ -214,16 +398,125 @@ See above, but now with a pick-given ration of 2 for easier testing.
 """
 
 
+GoalDirected    = EvalStructure([(GoalDistEvaluation(2,1,1,2),5),
+                                 (FIFOEvaluation(),1)])
+"""
+As PickGiven5, but the smallest clauses are selected according to
+their goal distance weight, so that clauses related to the
+conjecture are preferred.
+"""
+
+
 GivenClauseHeuristics = {
-    "FIFO"       : FIFOEval,
-    "SymbolCount": SymbolCountEval,
-    "PickGiven5" : PickGiven5,
-    "PickGiven2" : PickGiven2}
+    "FIFO"        : FIFOEval,
+    "SymbolCount" : SymbolCountEval,
+    "PickGiven5"  : PickGiven5,
+    "PickGiven2"  : PickGiven2,
+    "GoalDirected": GoalDirected}
 """
 Table associating name and evaluation function, so that we can select
 the function by name.
 """
 
+EvaluationFunctions = {
+    "FIFO"       : FIFOEvaluation,
+    "SymbolCount": SymbolCountEvaluation,
+    "GoalDist"   : GoalDistEvaluation}
+"""
+Table associating names and classes of clause evaluation functions,
+so that they can be used in heuristic specifications (see
+parseHeuristic()).
+"""
+
+def registerEvaluationFunction(name, evalclass):
+    """
+    Make the ClauseEvaluationFunction subclass evalclass available
+    under name in heuristic specifications.
+    """
+    EvaluationFunctions[name] = evalclass
+
+
+def parseNumber(lexer):
+    """
+    Parse a non-negative integer or decimal number and return its
+    value.
+    """
+    res = lexer.AcceptTok(Token.IdentLower).literal
+    if not res.isdigit():
+        raise UnexpectedTokenError(repr(res)+" is not a number")
+    if lexer.TestTok(Token.FullStop):
+        lexer.AcceptTok(Token.FullStop)
+        frac = lexer.AcceptTok(Token.IdentLower).literal
+        if not frac.isdigit():
+            raise UnexpectedTokenError(repr(frac)+" is not a number")
+        return float(res+"."+frac)
+    return int(res)
+
+
+def parseEvalFunction(lexer):
+    """
+    Parse a weighted evaluation function of the form
+    [<count>*]<name>[(<number>,...)] and return a pair of the function
+    and its count (1 if none is given).
+    """
+    count = 1
+    if lexer.LookLit().isdigit():
+        count = parseNumber(lexer)
+        if not isinstance(count, int):
+            raise UnexpectedTokenError(repr(count)+" is not an integer")
+        lexer.AcceptTok(Token.Mult)
+    lexer.CheckLit(list(EvaluationFunctions.keys()))
+    evalclass = EvaluationFunctions[lexer.Next().literal]
+    args = []
+    if lexer.TestTok(Token.OpenPar):
+        lexer.AcceptTok(Token.OpenPar)
+        args.append(parseNumber(lexer))
+        while lexer.TestTok(Token.Comma):
+            lexer.AcceptTok(Token.Comma)
+            args.append(parseNumber(lexer))
+        lexer.AcceptTok(Token.ClosePar)
+    return (evalclass(*args), count)
+
+
+def parseEvalStructure(lexer):
+    """
+    Parse a heuristic specification, i.e. a comma-separated list of
+    weighted evaluation functions, optionally enclosed in
+    parentheses, and return it as an EvalStructure. At least one of
+    the functions must have a positive count.
+    """
+    parens = lexer.TestTok(Token.OpenPar)
+    if parens:
+        lexer.AcceptTok(Token.OpenPar)
+    descriptor = [parseEvalFunction(lexer)]
+    while lexer.TestTok(Token.Comma):
+        lexer.AcceptTok(Token.Comma)
+        descriptor.append(parseEvalFunction(lexer))
+    if parens:
+        lexer.AcceptTok(Token.ClosePar)
+    if not [count for (f, count) in descriptor if count > 0]:
+        raise UnexpectedTokenError("no evaluation function with a "
+                                   "positive count")
+    return EvalStructure(descriptor)
+
+
+def parseHeuristic(spec):
+    """
+    Return the EvalStructure described by the string spec. This is
+    either the name of one of the predefined GivenClauseHeuristics,
+    or a specification like "(5*SymbolCount(2,1),1*FIFO)", where each
+    function is given by its name in EvaluationFunctions and the
+    arguments of its constructor, and the counts determine how many
+    clauses are picked according to it in turn.
+    """
+    if spec in GivenClauseHeuristics:
+        return GivenClauseHeuristics[spec]
+    lexer = Lexer(spec)
+    res = parseEvalStructure(lexer)
+    lexer.CheckTok(Token.EOFToken)
+    return res
+
+
 class TestHeuristics(unittest.TestCase):
     """
     Test heuristic evaluation functions.
@@ -298,6 +591,51 @@ cnf(c8,axiom,(c=d|h(i(a))!=h(i(e)))).
         self.assertEqual(e6, self.c6.weight(2,1))
         self.assertEqual(e7, self.c7.weight(2,1))
         self.assertEqual(e8, self.c8.weight(2,1))
+        self.assertTrue(eval.integer)
+        self.assertFalse(eval.monotonic)
+        self.assertFalse(SymbolCountEvaluation(1.5,1).integer)
+        for c in [self.c1, self.c4, self.c5, self.c8]:
+            self.assertTrue(eval.lowerBound(c) <= eval(c))
+        self.assertEqual(FIFOEvaluation().lowerBound(self.c1), None)
+
+    def testGoalDist(self):
+        """
+        Test goal-directed evaluation.
+        """
+        lexer = Lexer("""
+cnf(g,negated_conjecture,~p(a)).
+cnf(a1,axiom,p(X)|~q(X)).
+cnf(a2,axiom,q(b)|~r(f(c))).
+cnf(a3,axiom,s(d)|X=d).
+""")
+        g  = clauses.parseClause(lexer)
+        a1 = clauses.parseClause(lexer)
+        a2 = clauses.parseClause(lexer)
+        a3 = clauses.parseClause(lexer)
+        eval = GoalDistEvaluation(2,1,1,2)
+        eval.initialize([g, a1, a2, a3])
+        self.assertEqual(eval.distance["p"], 0)
+        self.assertEqual(eval.distance["q"], 1)
+        self.assertEqual(eval.distance["f"], 2)
+        self.assertEqual(eval.maxdist, 3)
+        self.assertTrue(g.isGoalDerived())
+        self.assertFalse(a1.isGoalDerived())
+        self.assertEqual(eval(g), 4)
+        self.assertEqual(eval(a1), 2*(2+1+3+1))
+        self.assertEqual(eval(a3), 2*(5+5+2+1+5))
+
+        from resolution import resolution
+        res = resolution(g, 0, a1, 0)
+        self.assertTrue(res.isGoalDerived())
+        self.assertEqual(eval(res), 3+2)
+        self.assertTrue(eval.integer)
+
+        # Each search initializes its own copy of the shared
+        # heuristic.
+        search = GoalDirected.copy()
+        search.initialize([g, a1, a2, a3])
+        self.assertEqual(search.eval_funs[0].distance["q"], 1)
+        self.assertTrue(not "q" in GoalDirected.eval_funs[0].distance)
 
     def testEvalStructure(self):
         """
@@ -315,5 +653,51 @@ cnf(c8,axiom,(c=d|h(i(a))!=h(i(e)))).
         self.assertEqual(eval_funs.nextEval(),0)
         self.assertEqual(eval_funs.nextEval(),1)
 
+    def testParseHeuristic(self):
+        """
+        Test parsing of heuristic specifications.
+        """
+        self.assertEqual(parseHeuristic("PickGiven5"), PickGiven5)
+        h = parseHeuristic("(5*SymbolCount(2,1), 1*FIFO, SymbolCount(1.5,1))")
+        self.assertEqual(h.eval_vec, [5,1,1])
+        self.assertEqual(h.eval_funs[0].fweight, 2)
+        self.assertTrue(isinstance(h.eval_funs[1], FIFOEvaluation))
+        self.assertEqual(h.eval_funs[2].fweight, 1.5)
+        self.assertEqual(h.evaluate(self.c1)[0], self.c1.weight(2,1))
+        h = parseHeuristic("2*FIFO")
+        self.assertEqual(h.eval_vec, [2])
+        self.assertRaises(UnexpectedIdentError, parseHeuristic,
+                          "(5*Unknown)")
+        self.assertRaises(UnexpectedTokenError, parseHeuristic,
+                          "(5*FIFO")
+        self.assertRaises(UnexpectedTokenError, parseHeuristic,
+                          "FIFO FIFO")
+        self.assertRaises(UnexpectedTokenError, parseHeuristic,
+                          "(0*FIFO)")
+        self.assertRaises(UnexpectedTokenError, parseHeuristic,
+                          "(0*FIFO,0*SymbolCount)")
+        self.assertRaises(UnexpectedTokenError, parseHeuristic,
+                          "1.5*FIFO")
+        h = parseHeuristic("(0*FIFO,2*SymbolCount)")
+        self.assertEqual([h.nextEval() for i in range(3)], [1, 1, 1])
+
+        class LitCountEvaluation(ClauseEvaluationFunction):
+            def __init__(self):
+                self.name = "LitCountEval"
+            def hEval(self, clause):
+                return len(clause)
+        registerEvaluationFunction("LitCount", LitCountEvaluation)
+        h = parseHeuristic("(3*LitCount,1*FIFO)")
+        self.assertEqual(h.evaluate(self.c5)[0], 4)
+        # Only the copies used for a proof search are timed.
+        self.assertTrue(not h.eval_funs[0].timed)
+        timed = h.copy()
+        self.assertEqual(timed.evaluate(self.c5)[0], 4)
+        self.assertEqual(timed.eval_funs[0].eval_calls, 1)
+        self.assertTrue(timed.eval_funs[0].eval_time >= 0.0)
+        self.assertEqual(timed.eval_vec, h.eval_vec)
+        del EvaluationFunctions["LitCount"]
+
+
 if __name__ == '__main__':
     unittest.main()
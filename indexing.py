@@ -39,9 +39,65 @@ resolution partners. Given an inference literal l (in one clause), the
 index returns a set of pairs (c, i), where c is a clause and i is the
 position of a potential inference literal, so that l and c[i] have
 diffent polarity and the underlying atoms are potentially
-unifiable. The indexing technique used is called "top symbol hashing",
-and it assumes two terms (or atoms) are potentially unifiable if they
-share the same top symbol.
+unifiable. The simplest indexing technique used is called "top symbol
+hashing", and it assumes two terms (or atoms) are potentially
+unifiable if they share the same top symbol.
+
+The default resolution index is a discrimination tree (top symbol
+hashing, the previous default, is still available as "topsymbol" in
+ResolutionIndexes). Each indexed atom is represented by its preorder
+sequence of symbols (see flatterms.py), where all variables are
+replaced by a single placeholder "*". As an example, p(f(X),a) is
+stored under the path p f * a. The paths of all indexed atoms are merged into a tree
+(a trie), and the indexed literal occurances are stored at the leaves.
+To find the potential unification partners of a query atom, the tree
+is traversed in parallel with the query. A placeholder in the tree
+matches any query subterm, and a query variable matches any indexed
+subterm (which is skipped in the tree using the arities of the
+symbols). The index is non-perfect, since it ignores variable
+identities (e.g. p(X,X) is returned for p(a,b)), but it considers the
+complete term structure, not just the top symbol.
+
+Finally, a substitution tree is a perfect index: It returns exactly
+the unifiable literals, together with the unifiers. Indexed atoms are
+represented as substitutions of the root variable *1 (here: -1), and
+common parts of these substitutions are shared in inner nodes. As an
+example, p(f(a),b) and p(f(X),c) are stored as
+
+   *1 <- p(f(*2),*3)
+         |-- *2 <- a, *3 <- b
+         `-- *2 <- X, *3 <- c
+
+The index variables *i are represented by negative integers. Indexed
+atoms are normalized (their variables are numbered 0, 1, ... in order
+of occurance), and each leaf entry records the mapping back to the
+variables of its clause. Retrieval unifies the bindings along each
+path with the query, backtracks over the tree, and constructs the
+unifiers for all entries of the leaves that are reached.
+
+A much lighter alternative are fingerprint indexes. The fingerprint of
+a term samples the term at a small number of fixed positions (here
+the top symbol, the first three arguments, and the first two
+arguments of the first two arguments). Each sample is either a
+function symbol, or one of three special values: A (there is a
+variable at this position), B (the position is below a variable, so
+it could be created by instantiation), or N (the position does not
+exist and can not be created by instantiation). Two terms can only be
+unifiable if all their samples are compatible, i.e. if they are equal,
+or one is B, or one is A and the other is not N. Fingerprints are
+stored in a trie, so maintaining the index is cheap, and for most
+samples of a query only a few branches of the trie have to be
+followed. Fingerprint indexes are also used to find complementary
+unit clauses, which immediately yield the empty clause.
+
+For subsumption, we use clause indexes. The simple SubsumptionIndex
+stores the predicate abstractions of clauses in a trie. A feature
+vector index maps each clause to a vector of numeric features
+(e.g. the number of positive literals, or the number of occurances of
+symbols in negative literals), where every feature value of a clause
+is at most that of all clauses it subsumes. The vectors are stored in
+a trie, and retrieval of subsuming (subsumed) candidates only follows
+branches with smaller or equal (larger or equal) feature values.
 
 
 Copyright 2019 Stephan Schulz, schulz@eprover.org
@@ -72,8 +128,12 @@ Email: schulz@eprover.org
 """
 
 import unittest
+import sys
+from bisect import bisect_left, bisect_right
 from lexer import Token,Lexer
-from terms import termFunc
+from terms import termFunc, termIsVar, termArgs, termNormalizeVars
+from substitutions import TriangularSubst
+from unification import mguTriangularTermList
 from literals import Literal
 import clauses
 
@@ -86,6 +146,8 @@ class ResolutionIndex(object):
     polarity of the query literal and the same top symbol (i.e. we
     implement a simple version of top symbol hashing).
     """
+    perfect = False
+
     def __init__(self):
         """
         We use separate dicts for mapping predicate symbols to
@@ -128,6 +190,32 @@ class ResolutionIndex(object):
                 else:
                     self.insertData(self.neg_idx, termFunc(lit.atom), (clause, i))
 
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index. The
+        literal occurances are first grouped by sign and top symbol,
+        so that each set in the index is looked up and extended only
+        once.
+        """
+        groups = {}
+        for clause in clauses:
+            for i in range(len(clause)):
+                lit = clause.getLiteral(i)
+                if lit.isInferenceLit():
+                    key = (lit.isPositive(), termFunc(lit.atom))
+                    try:
+                        groups[key].append((clause, i))
+                    except KeyError:
+                        groups[key] = [(clause, i)]
+        for (positive, topsymbol), payloads in groups.items():
+            if positive:
+                idx = self.pos_idx
+            else:
+                idx = self.neg_idx
+            if not topsymbol in idx:
+                idx[topsymbol] = set()
+            idx[topsymbol].update(payloads)
+
     def removeClause(self, clause):
         """
         Remove all inference literals of the clause from the index.
@@ -156,6 +244,785 @@ class ResolutionIndex(object):
         except KeyError:
             return list()
 
+class DiscTreeNode(object):
+    """
+    A node in a discrimination tree. children maps keys to successor
+    nodes. A key is a pair (symbol, arity) for a function or predicate
+    symbol, or None for the variable placeholder. Leaves store the
+    indexed items in entries. We use a dictionary with dummy values
+    as an insertion-ordered set, so that retrieval is
+    deterministic.
+    """
+    def __init__(self):
+        self.children = {}
+        self.entries  = {}
+
+
+def discTreePath(atom):
+    """
+    Return the list of discrimination tree keys for atom (i.e. the
+    preorder symbol sequence with variables replaced by None).
+    """
+    res = []
+    stack = [atom]
+    while stack:
+        t = stack.pop()
+        if termIsVar(t):
+            res.append(None)
+        else:
+            res.append((termFunc(t), len(t)-1))
+            stack.extend(reversed(termArgs(t)))
+    return res
+
+
+class DiscTreeResolutionIndex(object):
+    """
+    A resolution index based on discrimination trees, with one tree
+    for positive and one for negative literals. It offers the same
+    interface as ResolutionIndex.
+    """
+    perfect = False
+
+    def __init__(self):
+        """
+        Create the two empty trees.
+        """
+        self.pos_idx = DiscTreeNode()
+        self.neg_idx = DiscTreeNode()
+
+    def insertData(self, idx, atom, payload):
+        """
+        Insert the payload (a tuple (clause, pos)) into the tree idx
+        under the path of atom.
+        """
+        node = idx
+        for key in discTreePath(atom):
+            try:
+                node = node.children[key]
+            except KeyError:
+                new = DiscTreeNode()
+                node.children[key] = new
+                node = new
+        node.entries[payload] = None
+
+    def removeData(self, idx, atom, payload):
+        """
+        Remove the payload stored under the path of atom from
+        idx. Nodes that become empty are removed from the tree.
+        """
+        trace = []
+        node = idx
+        for key in discTreePath(atom):
+            trace.append((node, key))
+            node = node.children[key]
+        del node.entries[payload]
+        while trace and not node.entries and not node.children:
+            node, key = trace.pop()
+            del node.children[key]
+
+    def insertClause(self, clause):
+        """
+        Insert all inference literals of clause into the appropriate
+        tree (positive or negative, depending on the sign of the
+        literal).
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.insertData(self.pos_idx, lit.atom, (clause, i))
+                else:
+                    self.insertData(self.neg_idx, lit.atom, (clause, i))
+
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index.
+        """
+        for clause in clauses:
+            self.insertClause(clause)
+
+    def removeClause(self, clause):
+        """
+        Remove all inference literals of the clause from the index.
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.removeData(self.pos_idx, lit.atom, (clause, i))
+                else:
+                    self.removeData(self.neg_idx, lit.atom, (clause, i))
+
+    def getResolutionLiterals(self, lit):
+        """
+        Return a list of resolution candidates for lit. Every
+        candidate is a pair (clause, pos), where pos is the position
+        of a literal with the opposite sign whose atom is compatible
+        with the atom of lit up to variables.
+        """
+        if lit.isPositive():
+            idx = self.neg_idx
+        else:
+            idx = self.pos_idx
+        ft = lit.flatAtom()
+        syms = ft.symbols
+        ars  = ft.arities
+        ends = ft.ends
+        end  = len(syms)
+        res = []
+        # Each state is a node and the position in the query reached
+        # with it.
+        stack = [(idx, 0)]
+        while stack:
+            node, i = stack.pop()
+            if i == end:
+                res.extend(node.entries)
+                continue
+            ar = ars[i]
+            if ar < 0:
+                # The query has a variable, which is compatible with
+                # every indexed subterm.
+                for skipped in discTreeSkip(node, 1):
+                    stack.append((skipped, i+1))
+            else:
+                try:
+                    stack.append((node.children[(syms[i], ar)], i+1))
+                except KeyError:
+                    pass
+                try:
+                    stack.append((node.children[None], ends[i]))
+                except KeyError:
+                    pass
+        return res
+
+
+def discTreeSkip(node, count):
+    """
+    Return the list of all nodes reached from node by skipping count
+    complete (indexed) terms.
+    """
+    res = []
+    stack = [(node, count)]
+    while stack:
+        node, count = stack.pop()
+        if count == 0:
+            res.append(node)
+            continue
+        for key, child in node.children.items():
+            if key == None:
+                stack.append((child, count-1))
+            else:
+                stack.append((child, count-1+key[1]))
+    return res
+
+
+class SubstTreeNode(object):
+    """
+    A node in a substitution tree. bindings is a list of pairs (ivar,
+    term) of index variables and the terms they are bound to at this
+    node. Leaves have no children, and store the indexed items in
+    entries, a list of pairs (payload, back), where back maps the
+    normalized variables of the indexed atom to the variables of its
+    clause.
+    """
+    def __init__(self, bindings):
+        self.bindings = bindings
+        self.children = []
+        self.entries  = []
+
+
+def isIndexVar(t):
+    """
+    Return True if t is an index variable of a substitution tree.
+    """
+    return termIsVar(t) and t < 0
+
+
+def substTreeMatch(s, t, bindings):
+    """
+    Match the tree term s onto the (normalized) atom part t. Index
+    variables in s can be bound, the normalized variables of atoms
+    have to be identical. New bindings are appended to the list
+    bindings. Return True on success, False otherwise.
+    """
+    if termIsVar(s):
+        if s < 0:
+            bindings.append((s, t))
+            return True
+        return s == t
+    if termIsVar(t) or s[0] != t[0] or len(s) != len(t):
+        return False
+    for i in range(1, len(s)):
+        if not substTreeMatch(s[i], t[i], bindings):
+            return False
+    return True
+
+
+def substTreeCompatible(s, t):
+    """
+    Return True if the tree term s and the atom part t have a common
+    generalization that is not just a variable.
+    """
+    if termIsVar(s):
+        return s < 0 or s == t
+    if termIsVar(t):
+        return False
+    return s[0] == t[0] and len(s) == len(t)
+
+
+class SubstTreeResolutionIndex(object):
+    """
+    A perfect resolution index based on substitution trees, with one
+    tree for positive and one for negative literals. In addition to
+    the interface of ResolutionIndex, it offers
+    getResolutionUnifiers(), which returns the unifiers along with the
+    literal occurances. Empty branches are removed, but inner nodes
+    with only one remaining child are not merged.
+    """
+    perfect = True
+
+    def __init__(self):
+        """
+        Create the two empty trees.
+        """
+        self.pos_idx   = SubstTreeNode([])
+        self.neg_idx   = SubstTreeNode([])
+        self.next_ivar = -2
+        self.max_vars  = 0
+
+    def newIndexVar(self):
+        """
+        Return a fresh index variable.
+        """
+        res = self.next_ivar
+        self.next_ivar = res-1
+        return res
+
+    def generalize(self, s, t, old, new):
+        """
+        Return the most specific common generalization of the tree
+        term s and the atom part t. Mismatches are replaced by fresh
+        index variables. The bindings of these variables that recover
+        s and t are appended to old and new, respectively. Index
+        variables already occuring in s are kept, and their bindings
+        for t are appended to new.
+        """
+        if isIndexVar(s):
+            new.append((s, t))
+            return s
+        if termIsVar(s) or termIsVar(t):
+            if s == t:
+                return s
+        elif s[0] == t[0] and len(s) == len(t):
+            return [s[0]]+[self.generalize(s[i], t[i], old, new)
+                           for i in range(1, len(s))]
+        var = self.newIndexVar()
+        old.append((var, s))
+        new.append((var, t))
+        return var
+
+    def matchNode(self, node, open):
+        """
+        Try to match the bindings of node onto the open index
+        variable bindings of an atom (a dictionary). Return the
+        dictionary of bindings still open below node on success,
+        None otherwise.
+        """
+        res = dict(open)
+        new = []
+        for var, s in node.bindings:
+            if not substTreeMatch(s, res.pop(var), new):
+                return None
+        res.update(new)
+        return res
+
+    def insertData(self, idx, atom, payload):
+        """
+        Insert the payload (a tuple (clause, pos)) into the tree idx
+        for the given atom.
+        """
+        renaming = {}
+        natom = termNormalizeVars(atom, renaming)
+        back = [None]*len(renaming)
+        for var, norm in renaming.items():
+            back[norm] = var
+        self.max_vars = max(self.max_vars, len(back))
+
+        open = {-1: natom}
+        node = idx
+        while open:
+            for child in node.children:
+                rest = self.matchNode(child, open)
+                if rest != None:
+                    node = child
+                    open = rest
+                    break
+            else:
+                for i, child in enumerate(node.children):
+                    if any([substTreeCompatible(s, open[var])
+                            for var, s in child.bindings]):
+                        node.children[i] = self.splitNode(child, open,
+                                                          payload, back)
+                        return
+                leaf = SubstTreeNode(list(open.items()))
+                leaf.entries.append((payload, back))
+                node.children.append(leaf)
+                return
+        node.entries.append((payload, back))
+
+    def splitNode(self, node, open, payload, back):
+        """
+        Split node into a new inner node with the common
+        generalization of its bindings and the open bindings of a new
+        atom, with the (modified) node and a new leaf for the payload
+        as children. Return the new inner node.
+        """
+        inner = []
+        rest  = []
+        leaf  = []
+        for var, s in node.bindings:
+            t = open.pop(var)
+            if substTreeCompatible(s, t):
+                old = []
+                g = self.generalize(s, t, old, leaf)
+                inner.append((var, g))
+                rest.extend(old)
+            else:
+                rest.append((var, s))
+                leaf.append((var, t))
+        leaf.extend(open.items())
+        node.bindings = rest
+        res = SubstTreeNode(inner)
+        new = SubstTreeNode(leaf)
+        new.entries.append((payload, back))
+        res.children = [node, new]
+        return res
+
+    def findPath(self, node, open, payload):
+        """
+        Return the path (list of nodes) from node to the leaf storing
+        payload for the atom with the given open bindings, or
+        None. The tree is searched depth-first with an explicit stack
+        of child iterators, so that deep trees do not exhaust the
+        recursion limit.
+        """
+        path  = []
+        stack = [iter([(node, open)])]
+        while stack:
+            try:
+                node, open = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            path.append(node)
+            if not open:
+                for p, back in node.entries:
+                    if p == payload:
+                        return path
+                path.pop()
+                continue
+            stack.append((child, rest) for child in node.children
+                         for rest in [self.matchNode(child, open)]
+                         if rest != None)
+        return None
+
+    def removeData(self, idx, atom, payload):
+        """
+        Remove the payload stored for atom from idx. Nodes that become
+        empty are removed from the tree. Raise KeyError if the payload
+        is not stored for atom (like the other indexes).
+        """
+        path = self.findPath(idx, {-1: termNormalizeVars(atom, {})},
+                             payload)
+        if path == None:
+            raise KeyError(payload)
+        leaf = path.pop()
+        leaf.entries = [e for e in leaf.entries if e[0] != payload]
+        node = leaf
+        while path and not node.entries and not node.children:
+            parent = path.pop()
+            parent.children.remove(node)
+            node = parent
+
+    def insertClause(self, clause):
+        """
+        Insert all inference literals of clause into the appropriate
+        tree (positive or negative, depending on the sign of the
+        literal).
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.insertData(self.pos_idx, lit.atom, (clause, i))
+                else:
+                    self.insertData(self.neg_idx, lit.atom, (clause, i))
+
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index.
+        """
+        for clause in clauses:
+            self.insertClause(clause)
+
+    def removeClause(self, clause):
+        """
+        Remove all inference literals of the clause from the index.
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.removeData(self.pos_idx, lit.atom, (clause, i))
+                else:
+                    self.removeData(self.neg_idx, lit.atom, (clause, i))
+
+    def traverse(self, lit, visit):
+        """
+        Find all leaves of the tree of the opposite sign of lit with
+        atoms unifiable with the atom of lit. For each such leaf, call
+        visit(leaf, subst, offset), where subst is the unifier (in
+        terms of the normalized atom variables of the leaf and the
+        variables of lit shifted by offset).
+        """
+        if lit.isPositive():
+            idx = self.neg_idx
+        else:
+            idx = self.pos_idx
+        offset = self.max_vars
+        subst = TriangularSubst()
+        subst.addBinding((-1, lit.atom), offset)
+        bindings = subst.subst
+        stack = [iter(idx.children)]
+        states = []
+        while stack:
+            try:
+                node = next(stack[-1])
+            except StopIteration:
+                stack.pop()
+                if states:
+                    # Backtrack the bindings of the parent node.
+                    state = states.pop()
+                    while len(bindings) > state:
+                        bindings.popitem()
+                continue
+            state = len(bindings)
+            if mguTriangularTermList([var for var, s in node.bindings],
+                                     [s for var, s in node.bindings],
+                                     subst) == None:
+                while len(bindings) > state:
+                    bindings.popitem()
+                continue
+            if node.children:
+                stack.append(iter(node.children))
+                states.append(state)
+            else:
+                visit(node, subst, offset)
+                while len(bindings) > state:
+                    bindings.popitem()
+
+    def getResolutionLiterals(self, lit):
+        """
+        Return the list of pairs (clause, pos) of literals of the
+        opposite sign that are unifiable with lit.
+        """
+        res = []
+        self.traverse(lit, lambda leaf, subst, offset:
+                      res.extend([p for p, back in leaf.entries]))
+        return res
+
+    def getResolutionUnifiers(self, clause, lit):
+        """
+        Return a list of tuples (clause2, lit2, sigma) for all
+        literals clause2|lit2 that can be resolved with clause|lit,
+        where sigma is the unifier in the form expected by
+        resolution() (i.e. with the variables of clause2 shifted by
+        the number of variables in clause).
+        """
+        n = clause.var_count
+        res = []
+        def visit(leaf, subst, offset):
+            for (payload, back) in leaf.entries:
+                renaming = dict([(v+offset, v) for v in range(n)])
+                for norm, var in enumerate(back):
+                    renaming[norm] = var+n
+                sigma = TriangularSubst()
+                for v in range(n):
+                    value = subst.apply(v+offset, 0, renaming)
+                    if value != v:
+                        sigma.addBinding((v, value))
+                for norm, var in enumerate(back):
+                    value = subst.apply(norm, 0, renaming)
+                    if value != var+n:
+                        sigma.addBinding((var+n, value))
+                res.append((payload[0], payload[1], sigma))
+        self.traverse(clause.getLiteral(lit), visit)
+        return res
+
+
+FPVar      = 0
+"""
+Fingerprint sample for a variable at the sampled position.
+"""
+FPBelowVar = 1
+"""
+Fingerprint sample for a position below a variable.
+"""
+FPNoPos    = 2
+"""
+Fingerprint sample for a position that does not exist in a term.
+"""
+
+FingerprintPositions = [(), (1,), (2,), (3,), (1,1), (1,2), (2,1), (2,2)]
+"""
+The positions sampled for fingerprints, as sequences of argument
+indices (counting from 1).
+"""
+
+
+def fingerprintSample(term, pos):
+    """
+    Return the sample of term at the position pos (a function symbol
+    or one of FPVar, FPBelowVar, FPNoPos).
+    """
+    for i in pos:
+        if termIsVar(term):
+            return FPBelowVar
+        if i >= len(term):
+            return FPNoPos
+        term = term[i]
+    if termIsVar(term):
+        return FPVar
+    return term[0]
+
+
+def fingerprint(term, positions=FingerprintPositions):
+    """
+    Return the fingerprint of term, i.e. the list of its samples at
+    the given positions.
+    """
+    return [fingerprintSample(term, pos) for pos in positions]
+
+
+def fingerprintUnifCompatible(s1, s2):
+    """
+    Return True if two terms with the samples s1 and s2 at the same
+    position may be unifiable.
+    """
+    if s1 == s2 or s1 == FPBelowVar or s2 == FPBelowVar:
+        return True
+    if s1 == FPVar:
+        return s2 != FPNoPos
+    if s2 == FPVar:
+        return s1 != FPNoPos
+    return False
+
+
+class FingerprintIndex(object):
+    """
+    A term index mapping terms to payloads via their
+    fingerprints. The fingerprints are stored in a trie of nested
+    dictionaries, with one level per sampled position. The leaves are
+    dictionaries (used as ordered sets) of the payloads.
+    """
+    def __init__(self, positions=FingerprintPositions):
+        """
+        Create an empty index.
+        """
+        self.positions = positions
+        self.root = {}
+
+    def insert(self, term, payload):
+        """
+        Insert payload for term into the index.
+        """
+        node = self.root
+        for sample in fingerprint(term, self.positions):
+            try:
+                node = node[sample]
+            except KeyError:
+                new = {}
+                node[sample] = new
+                node = new
+        node[payload] = None
+
+    def remove(self, term, payload):
+        """
+        Remove the payload stored for term. Branches that become
+        empty are removed from the trie.
+        """
+        trace = []
+        node = self.root
+        for sample in fingerprint(term, self.positions):
+            trace.append((node, sample))
+            node = node[sample]
+        del node[payload]
+        while trace and not node:
+            node, sample = trace.pop()
+            del node[sample]
+
+    def getUnifiable(self, term):
+        """
+        Return the list of payloads of all terms with fingerprints
+        compatible with that of term, i.e. of all terms that are
+        potentially unifiable with term.
+        """
+        res = []
+        query = fingerprint(term, self.positions)
+        depth = len(query)
+        stack = [(self.root, 0)]
+        while stack:
+            node, level = stack.pop()
+            if level == depth:
+                res.extend(node)
+                continue
+            sample = query[level]
+            level = level+1
+            if sample == FPBelowVar:
+                stack.extend([(child, level) for child in node.values()])
+            elif sample == FPVar:
+                stack.extend([(child, level) for key, child in node.items()
+                              if key != FPNoPos])
+            else:
+                if sample == FPNoPos:
+                    keys = [FPNoPos, FPBelowVar]
+                else:
+                    keys = [sample, FPVar, FPBelowVar]
+                for key in keys:
+                    child = node.get(key)
+                    if child != None:
+                        stack.append((child, level))
+        return res
+
+
+class FingerprintResolutionIndex(object):
+    """
+    A resolution index based on fingerprint indexing, with one
+    FingerprintIndex for positive and one for negative literals. It
+    offers the same interface as ResolutionIndex.
+    """
+    perfect = False
+
+    def __init__(self):
+        """
+        Create the two empty indices.
+        """
+        self.pos_idx = FingerprintIndex()
+        self.neg_idx = FingerprintIndex()
+
+    def insertClause(self, clause):
+        """
+        Insert all inference literals of clause into the appropriate
+        index (positive or negative, depending on the sign of the
+        literal).
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.pos_idx.insert(lit.atom, (clause, i))
+                else:
+                    self.neg_idx.insert(lit.atom, (clause, i))
+
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index.
+        """
+        for clause in clauses:
+            self.insertClause(clause)
+
+    def removeClause(self, clause):
+        """
+        Remove all inference literals of the clause from the index.
+        """
+        for i in range(len(clause)):
+            lit = clause.getLiteral(i)
+            if lit.isInferenceLit():
+                if lit.isPositive():
+                    self.pos_idx.remove(lit.atom, (clause, i))
+                else:
+                    self.neg_idx.remove(lit.atom, (clause, i))
+
+    def getResolutionLiterals(self, lit):
+        """
+        Return a list of resolution candidates for lit. Every
+        candidate is a pair (clause, pos), where pos is the position
+        of a literal with the opposite sign and a compatible
+        fingerprint.
+        """
+        if lit.isPositive():
+            return self.neg_idx.getUnifiable(lit.atom)
+        else:
+            return self.pos_idx.getUnifiable(lit.atom)
+
+
+class UnitIndex(object):
+    """
+    An index of unit clauses, used to find pairs of unit clauses with
+    complementary unifiable literals (which immediately yield the
+    empty clause). It uses one FingerprintIndex for positive and one
+    for negative units.
+    """
+    def __init__(self):
+        """
+        Create the two empty indices.
+        """
+        self.pos_idx = FingerprintIndex()
+        self.neg_idx = FingerprintIndex()
+
+    def insertClause(self, clause):
+        """
+        Insert the unit clause into the index.
+        """
+        lit = clause.getLiteral(0)
+        if lit.isPositive():
+            self.pos_idx.insert(lit.atom, clause)
+        else:
+            self.neg_idx.insert(lit.atom, clause)
+
+    def removeClause(self, clause):
+        """
+        Remove the unit clause from the index.
+        """
+        lit = clause.getLiteral(0)
+        if lit.isPositive():
+            self.pos_idx.remove(lit.atom, clause)
+        else:
+            self.neg_idx.remove(lit.atom, clause)
+
+    def findConflict(self, clause):
+        """
+        Try to resolve the unit clause with an indexed unit clause
+        with a complementary literal. Return the resulting empty
+        clause, or None if there is no such unit.
+        """
+        lit = clause.getLiteral(0)
+        if lit.isPositive():
+            cands = self.neg_idx.getUnifiable(lit.atom)
+        else:
+            cands = self.pos_idx.getUnifiable(lit.atom)
+        from resolution import resolution
+        for partner in cands:
+            res = resolution(clause, 0, partner, 0)
+            if res != None:
+                return res
+        return None
+
+
+ResolutionIndexes = {
+    "topsymbol"   : ResolutionIndex,
+    "disctree"    : DiscTreeResolutionIndex,
+    "substtree"   : SubstTreeResolutionIndex,
+    "fingerprint" : FingerprintResolutionIndex
+    }
+"""
+Table associating name and resolution index class, so that we can
+select the indexing technique by name.
+"""
+
+
 def predAbstractionIsSubSequence(candidate, superseq):
     """
     Check if candidate is a subsequence of superseq. That is a
@@ -174,6 +1041,20 @@ def predAbstractionIsSubSequence(candidate, superseq):
     return True
 
 
+class PredAbstrTrieNode(object):
+    """
+    A node in the trie of predicate abstractions. keys is the sorted
+    list of literal abstractions labeling the edges to the children
+    (in the same order), and clauses is a dictionary (used as an
+    ordered set) of the clauses whose predicate abstraction ends at
+    this node.
+    """
+    def __init__(self):
+        self.keys     = []
+        self.children = []
+        self.clauses  = {}
+
+
 class SubsumptionIndex(object):
     """
     This class implements a simple index to speed up subsumption. This
@@ -182,98 +1063,382 @@ class SubsumptionIndex(object):
     that a clause C can only subsume a clause c if C's predicate
     abstraction is a subset of c's predicate abstraction, we can
     exclude whole sets of clauses at once.
+
+    The (sorted) predicate abstractions are stored in a trie, so that
+    common prefixes are shared, and the subsequence test against all
+    stored abstractions becomes a single walk of the trie. The edges
+    leaving a node are kept sorted, so they can be found (and new ones
+    inserted) by bisection.
     """
     def __init__(self):
         """
-        We store predicate abstractions (with associated clauses) in a
-        dictionary for for fast access by abstraction. We also store
-        them in an array sorted by length, so that we only need to
-        consider stored clauses that are short enough to have a chance
-        to subsume.
+        Create an empty trie.
         """
-        self.pred_abstr_set = {}
-        self.pred_abstr_arr = []
+        self.root = PredAbstrTrieNode()
+
+    def findNode(self, pa, trace=None):
+        """
+        Return the node for the predicate abstraction pa, or None if
+        it is not in the trie. If trace is given, the pairs (node,
+        position) of the path are appended to it.
+        """
+        node = self.root
+        for la in pa:
+            keys = node.keys
+            i = bisect_left(keys, la)
+            if i == len(keys) or keys[i] != la:
+                return None
+            if trace != None:
+                trace.append((node, i))
+            node = node.children[i]
+        return node
 
     def insertClause(self, clause):
         """
         Insert a clause into the index. If the predicate abstraction
         already is stored, just add the clause to the associated set
-        of clauses. Otherwise, create a new entry for the pa and add
-        the clause.
+        of clauses. Otherwise, create the missing part of the path
+        for the pa and add the clause.
         """
-        pa = clause.predicateAbstraction()
+        node = self.root
+        for la in clause.predicateAbstraction():
+            keys = node.keys
+            i = bisect_left(keys, la)
+            if i == len(keys) or keys[i] != la:
+                keys.insert(i, la)
+                node.children.insert(i, PredAbstrTrieNode())
+            node = node.children[i]
+        node.clauses[clause] = None
 
-        try:
-            entry =  self.pred_abstr_set[pa]
-        except KeyError:
-            entry = set()
-            self.pred_abstr_set[pa] = entry
-            l = len(pa)
-            i = 0
-            for (len_pa, spa, clauses) in self.pred_abstr_arr:
-                if len_pa >= l:
-                    break
-                i = i+1
-            self.pred_abstr_arr.insert(i, (l, pa, entry))
-
-        entry.add(clause)
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index. The
+        clauses are sorted by predicate abstraction, so that
+        consecutive abstractions share their common prefix, and the
+        path for that prefix is reused instead of searched again. In
+        an empty trie, all new edges are appended at the end of the
+        (sorted) edge lists.
+        """
+        entries = [(c.predicateAbstraction(), c) for c in clauses]
+        entries.sort(key=lambda entry: entry[0])
+        prev = ()
+        path = [self.root]
+        for pa, clause in entries:
+            common = 0
+            limit = min(len(pa), len(prev))
+            while common < limit and pa[common] == prev[common]:
+                common = common+1
+            del path[common+1:]
+            node = path[-1]
+            for la in pa[common:]:
+                keys = node.keys
+                i = bisect_left(keys, la)
+                if i == len(keys) or keys[i] != la:
+                    keys.insert(i, la)
+                    node.children.insert(i, PredAbstrTrieNode())
+                node = node.children[i]
+                path.append(node)
+            node.clauses[clause] = None
+            prev = pa
 
     def removeClause(self, clause):
         """
-        Remove a clause. This is easy, since we never remove the entry
-        for the predicate abstraction, only the clause from its
-        set. In general, successful backward subsumption is rare, so
-        deletion of a processed clause will be rare, too.
+        Remove a clause. Nodes that become empty are removed from the
+        trie.
         """
-        pa = clause.predicateAbstraction()
-        entry = self.pred_abstr_set[pa]
-        entry.remove(clause)
+        trace = []
+        node = self.findNode(clause.predicateAbstraction(), trace)
+        del node.clauses[clause]
+        while trace and not node.clauses and not node.children:
+            node, i = trace.pop()
+            del node.keys[i]
+            del node.children[i]
 
     def isIndexed(self, clause):
         """
         Return True if a clause is in the index. At the moment, this
         is only used for unit tests.
         """
-        pa = clause.predicateAbstraction()
-
-        try:
-            entry =  self.pred_abstr_set[pa]
-            return clause in entry
-        except KeyError:
-            return False
+        node = self.findNode(clause.predicateAbstraction())
+        return node != None and clause in node.clauses
 
     def getSubsumingCandidates(self, queryclause):
         """
         Return a list of all clauses that can potentially subsume the
-        query. This goes through the relevant part of the list of
-        predicate abstractions and collects the clauses stored with
-        predicate abstractions compatible with subsumption.
+        query. This walks the trie and collects the clauses stored
+        with predicate abstractions that are subsequences of that of
+        the query. Since all abstractions are sorted, an edge can only
+        be followed if its label occurs in the rest of the query
+        abstraction, and we continue after its first occurance.
         """
         pa = queryclause.predicateAbstraction()
         pa_len = len(pa)
         res = list()
-        for (cpa_len, cpa, clauses) in self.pred_abstr_arr:
-            if cpa_len > pa_len:
-                break
-            if predAbstractionIsSubSequence(cpa, pa):
-                res.extend(clauses)
+        stack = [(self.root, 0)]
+        while stack:
+            node, pos = stack.pop()
+            res.extend(node.clauses)
+            keys = node.keys
+            if not keys:
+                continue
+            prev = None
+            for i in range(pos, pa_len):
+                la = pa[i]
+                if la == prev:
+                    continue
+                prev = la
+                j = bisect_left(keys, la)
+                if j < len(keys) and keys[j] == la:
+                    stack.append((node.children[j], i+1))
         return res
 
     def getSubsumedCandidates(self, queryclause):
         """
         Return a list of all clauses that can potentially be subsumed
-        by query. See previous function
+        by query. This walks the trie and collects the clauses stored
+        with predicate abstractions that have the query abstraction as
+        a subsequence. Edges with labels larger than the next element
+        of the query abstraction can be skipped, since that element
+        can not occur further down.
         """
         pa = queryclause.predicateAbstraction()
         pa_len = len(pa)
         res = list()
-        for (cpa_len, cpa, clauses) in self.pred_abstr_arr:
-            if cpa_len < pa_len:
+        stack = [(self.root, 0)]
+        while stack:
+            node, pos = stack.pop()
+            if pos == pa_len:
+                res.extend(node.clauses)
+                stack.extend([(child, pos) for child in node.children])
+                continue
+            la = pa[pos]
+            keys = node.keys
+            for i in range(bisect_right(keys, la)):
+                if keys[i] == la:
+                    stack.append((node.children[i], pos+1))
+                else:
+                    stack.append((node.children[i], pos))
+        return res
+
+
+def fvCollect(term, base, buckets, counts):
+    """
+    Count the function symbol occurances in term in counts (at index
+    base plus the bucket of the symbol) and return the depth of term
+    (where variables and constants have depth 1).
+    """
+    if termIsVar(term):
+        return 1
+    counts[base+buckets(termFunc(term))] += 1
+    depth = 0
+    for arg in termArgs(term):
+        depth = max(depth, fvCollect(arg, base, buckets, counts))
+    return depth+1
+
+
+FVFeatures = ["lits", "preds", "funcs", "depth"]
+"""
+The features supported by the FeatureVectorIndex. Symbols are mapped
+to a fixed number of buckets, and all symbol-specific features are
+computed per sign of the literal and per bucket:
+
+lits:  The number of positive and negative literals.
+preds: The number of literals with a predicate symbol in the bucket.
+funcs: The number of occurances of function symbols in the bucket.
+depth: The maximal depth of literals with a predicate symbol in the
+       bucket.
+"""
+
+
+class FeatureVectorIndex(object):
+    """
+    A subsumption index based on feature vectors. It offers the same
+    interface as SubsumptionIndex. The feature vectors of all indexed
+    clauses are stored in a trie of nested dictionaries, with one
+    level per feature. The leaves are dictionaries (used as ordered
+    sets) of the clauses.
+    """
+    def __init__(self, features=FVFeatures, buckets=4):
+        """
+        Create an empty index using the given features (a list of
+        names from FVFeatures) and number of symbol buckets.
+        """
+        for f in features:
+            if not f in FVFeatures:
+                raise ValueError("Unknown feature "+f)
+        self.features = features
+        self.buckets  = buckets
+        self.symbols  = {}
+        self.root     = {}
+        self.vectors  = {}
+
+    def bucket(self, symbol):
+        """
+        Return the bucket of symbol. Symbols are distributed over the
+        buckets in order of their first occurance.
+        """
+        try:
+            return self.symbols[symbol]
+        except KeyError:
+            res = len(self.symbols) % self.buckets
+            self.symbols[symbol] = res
+            return res
+
+    def featureVector(self, clause):
+        """
+        Return the feature vector of clause.
+        """
+        try:
+            return self.vectors[clause]
+        except KeyError:
+            pass
+        b = self.buckets
+        lits  = [0, 0]
+        preds = [0]*(2*b)
+        funcs = [0]*(2*b)
+        depth = [0]*(2*b)
+        for l in clause.literals:
+            if l.isNegative():
+                sign = 1
+            else:
+                sign = 0
+            lits[sign] += 1
+            p = sign*b+self.bucket(termFunc(l.atom))
+            preds[p] += 1
+            d = 0
+            for arg in termArgs(l.atom):
+                d = max(d, fvCollect(arg, sign*b, self.bucket, funcs))
+            depth[p] = max(depth[p], d+1)
+        blocks = {"lits": lits, "preds": preds, "funcs": funcs,
+                  "depth": depth}
+        res = []
+        for f in self.features:
+            res.extend(blocks[f])
+        return tuple(res)
+
+    def insertClause(self, clause):
+        """
+        Insert a clause into the index.
+        """
+        vector = self.featureVector(clause)
+        node = self.root
+        for value in vector:
+            try:
+                node = node[value]
+            except KeyError:
+                new = {}
+                node[value] = new
+                node = new
+        node[clause] = None
+        self.vectors[clause] = vector
+
+    def insertClauses(self, clauses):
+        """
+        Insert all clauses from the list clauses into the index.
+        """
+        for clause in clauses:
+            self.insertClause(clause)
+
+    def removeClause(self, clause):
+        """
+        Remove a clause from the index. Branches that become empty are
+        removed from the trie.
+        """
+        vector = self.vectors.pop(clause)
+        trace = []
+        node = self.root
+        for value in vector:
+            trace.append((node, value))
+            node = node[value]
+        del node[clause]
+        while trace and not node:
+            node, value = trace.pop()
+            del node[value]
+
+    def isIndexed(self, clause):
+        """
+        Return True if a clause is in the index.
+        """
+        return clause in self.vectors
+
+    def getCandidates(self, queryclause, subsuming):
+        """
+        Return the list of all clauses whose feature vectors are
+        smaller or equal (if subsuming is True) or larger or equal
+        (otherwise) than that of the query in all features.
+        """
+        query = self.featureVector(queryclause)
+        depth = len(query)
+        res = []
+        stack = [(self.root, 0)]
+        while stack:
+            node, level = stack.pop()
+            if level == depth:
+                res.extend(node)
                 continue
-            if predAbstractionIsSubSequence(pa, cpa):
-                res.extend(clauses)
+            value = query[level]
+            level = level+1
+            if subsuming:
+                stack.extend([(child, level) for key, child in node.items()
+                              if key <= value])
+            else:
+                stack.extend([(child, level) for key, child in node.items()
+                              if key >= value])
         return res
 
+    def getSubsumingCandidates(self, queryclause):
+        """
+        Return a list of all clauses that can potentially subsume the
+        query.
+        """
+        return self.getCandidates(queryclause, True)
+
+    def getSubsumedCandidates(self, queryclause):
+        """
+        Return a list of all clauses that can potentially be subsumed
+        by query.
+        """
+        return self.getCandidates(queryclause, False)
+
+
+SubsumptionIndexes = {
+    "predabstr" : SubsumptionIndex,
+    "fvindex"   : FeatureVectorIndex
+    }
+"""
+Table associating name and subsumption index class, so that we can
+select the indexing technique by name.
+"""
+
+
+def indexMemory(index):
+    """
+    Return a pair (objects, bytes) with the number of Python objects
+    and an estimate of the memory used by the index data structure
+    (or any other container). Clauses and literals referenced from the
+    index are not counted, since they belong to the clause set.
+    """
+    seen = set()
+    objects = 0
+    size = 0
+    stack = [index]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or \
+           isinstance(obj, (clauses.Clause, Literal)):
+            continue
+        seen.add(id(obj))
+        objects = objects+1
+        size = size+sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+    return (objects, size)
+
 
 class TestIndexing(unittest.TestCase):
     """
@@ -380,6 +1545,240 @@ cnf(c9,axiom, p(X,Y)).
         print(cands)
         self.assertEqual(cands, [])
 
+    def testDiscTreeInsertRemove(self):
+        """
+        Test inserting and removal of clauses into the discrimination
+        tree index.
+        """
+        index = DiscTreeResolutionIndex()
+        self.assertEqual(discTreePath(self.c1.getLiteral(0).atom),
+                         [("p",2), ("a",0), None])
+        index.insertClause(self.c1)
+        index.insertClause(self.c2)
+        index.insertClause(self.c3)
+        self.assertEqual(len(index.pos_idx.children), 2)
+        self.assertEqual(len(index.neg_idx.children), 2)
+        index.removeClause(self.c3)
+        self.assertEqual(len(index.pos_idx.children), 1)
+        self.assertEqual(len(index.neg_idx.children), 1)
+        index.removeClause(self.c1)
+        index.removeClause(self.c2)
+        self.assertEqual(index.pos_idx.children, {})
+        self.assertEqual(index.neg_idx.children, {})
+
+    def testDiscTreeRetrieval(self):
+        """
+        Test that the discrimination tree returns all unifiable
+        literals, and fewer candidates than top symbol hashing.
+        """
+        from resolution import resolution
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c9]
+        index = DiscTreeResolutionIndex()
+        tsindex = ResolutionIndex()
+        for c in cls:
+            index.insertClause(c)
+            tsindex.insertClause(c)
+
+        for query in [self.c6, self.c7, self.c8, self.c1, self.c3, self.c5]:
+            for i in range(len(query)):
+                lit = query.getLiteral(i)
+                cands = index.getResolutionLiterals(lit)
+                tscands = tsindex.getResolutionLiterals(lit)
+                self.assertEqual(len(cands), len(set(cands)))
+                self.assertTrue(set(cands) <= set(tscands))
+                for (c, j) in tscands:
+                    if resolution(query, i, c, j):
+                        self.assertTrue((c, j) in cands)
+
+        cands = index.getResolutionLiterals(self.c6.getLiteral(0))
+        # ~p(a,X) can not be resolved with p(f(Y),a) from c2.
+        self.assertEqual(len(cands), 8)
+        self.assertTrue(not (self.c2, 1) in cands)
+
+    def testSubstTree(self):
+        """
+        Test that the substitution tree returns exactly the unifiable
+        literals, with unifiers that produce the correct resolvents,
+        also after removing clauses.
+        """
+        from resolution import resolution
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c9]
+        index = SubstTreeResolutionIndex()
+        for c in cls:
+            index.insertClause(c)
+
+        def check(indexed):
+            for query in [self.c6, self.c7, self.c8, self.c1, self.c3,
+                          self.c5]:
+                for i in range(len(query)):
+                    lit = query.getLiteral(i)
+                    expected = [(c, j) for c in indexed
+                                for j in range(len(c))
+                                if resolution(query, i, c, j) != None]
+                    cands = index.getResolutionLiterals(lit)
+                    self.assertEqual(set(cands), set(expected))
+                    self.assertEqual(len(cands), len(expected))
+                    unifiers = index.getResolutionUnifiers(query, i)
+                    self.assertEqual(len(unifiers), len(expected))
+                    for (c, j, sigma) in unifiers:
+                        r1 = resolution(query, i, c, j, sigma)
+                        r2 = resolution(query, i, c, j)
+                        self.assertEqual(repr(r1.literals),
+                                         repr(r2.literals))
+        check(cls)
+
+        index.removeClause(self.c9)
+        index.removeClause(self.c1)
+        check([self.c2, self.c3, self.c4, self.c5])
+        self.assertRaises(KeyError, index.removeClause, self.c1)
+        check([self.c2, self.c3, self.c4, self.c5])
+
+        for c in [self.c2, self.c3, self.c4, self.c5]:
+            index.removeClause(c)
+        self.assertEqual(index.pos_idx.children, [])
+        self.assertEqual(index.neg_idx.children, [])
+
+    def testFingerprints(self):
+        """
+        Test fingerprint sampling and compatibility.
+        """
+        t1 = self.c2.getLiteral(1).atom
+        t2 = self.c9.getLiteral(0).atom
+        t3 = self.c6.getLiteral(0).atom
+        self.assertEqual(fingerprint(t1),
+                         ["p", "f", "a", FPNoPos, FPVar, FPNoPos,
+                          FPNoPos, FPNoPos])
+        self.assertEqual(fingerprint(t2),
+                         ["p", FPVar, FPVar, FPNoPos, FPBelowVar,
+                          FPBelowVar, FPBelowVar, FPBelowVar])
+        self.assertTrue(fingerprintUnifCompatible("f", FPVar))
+        self.assertTrue(fingerprintUnifCompatible(FPNoPos, FPBelowVar))
+        self.assertTrue(not fingerprintUnifCompatible(FPVar, FPNoPos))
+        self.assertTrue(not fingerprintUnifCompatible("f", FPNoPos))
+        self.assertTrue(not fingerprintUnifCompatible("f", "a"))
+
+        index = FingerprintIndex()
+        index.insert(t1, 1)
+        index.insert(t2, 2)
+        self.assertEqual(set(index.getUnifiable(t3)), set([2]))
+        self.assertEqual(set(index.getUnifiable(t2)), set([1, 2]))
+        index.remove(t2, 2)
+        self.assertEqual(index.getUnifiable(t3), [])
+        index.remove(t1, 1)
+        self.assertEqual(index.root, {})
+
+    def testFingerprintRetrieval(self):
+        """
+        Test that the fingerprint index returns all unifiable
+        literals, and no more candidates than top symbol hashing.
+        """
+        from resolution import resolution
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c9]
+        index = FingerprintResolutionIndex()
+        tsindex = ResolutionIndex()
+        for c in cls:
+            index.insertClause(c)
+            tsindex.insertClause(c)
+
+        for query in [self.c6, self.c7, self.c8, self.c1, self.c3, self.c5]:
+            for i in range(len(query)):
+                lit = query.getLiteral(i)
+                cands = index.getResolutionLiterals(lit)
+                tscands = tsindex.getResolutionLiterals(lit)
+                self.assertEqual(len(cands), len(set(cands)))
+                self.assertTrue(set(cands) <= set(tscands))
+                for (c, j) in tscands:
+                    if resolution(query, i, c, j) != None:
+                        self.assertTrue((c, j) in cands)
+
+        cands = index.getResolutionLiterals(self.c6.getLiteral(0))
+        self.assertTrue(not (self.c2, 1) in cands)
+
+    def testUnitIndex(self):
+        """
+        Test the detection of conflicting unit clauses.
+        """
+        lex = Lexer("""
+cnf(u1,axiom,p(f(X),a)).
+cnf(u2,axiom,~p(f(b),b)).
+cnf(u3,axiom,~p(Y,Y)).
+""")
+        u1 = clauses.parseClause(lex)
+        u2 = clauses.parseClause(lex)
+        u3 = clauses.parseClause(lex)
+        index = UnitIndex()
+        index.insertClause(u1)
+        index.insertClause(self.c6)
+        self.assertEqual(index.findConflict(u2), None)
+        self.assertEqual(index.findConflict(u3), None)
+        self.assertEqual(index.findConflict(self.c7), None)
+        empty = index.findConflict(self.c9)
+        self.assertTrue(empty.isEmpty())
+        self.assertEqual(empty.getParents(), [self.c9, self.c6])
+        index.insertClause(u2)
+        self.assertTrue(index.findConflict(self.c9).isEmpty())
+        index.removeClause(self.c6)
+        index.removeClause(u2)
+        self.assertEqual(index.findConflict(self.c9), None)
+
+    def testBulkInsertion(self):
+        """
+        Test that inserting clauses in bulk gives the same retrieval
+        results as inserting them one by one.
+        """
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c6,
+               self.c7, self.c8, self.c9]
+        for indextype in ResolutionIndexes.values():
+            single = indextype()
+            for c in cls:
+                single.insertClause(c)
+            bulk = indextype()
+            bulk.insertClauses(cls)
+            for query in cls:
+                for i in range(len(query)):
+                    lit = query.getLiteral(i)
+                    self.assertEqual(
+                        set(bulk.getResolutionLiterals(lit)),
+                        set(single.getResolutionLiterals(lit)))
+            # Removal works on bulk-inserted clauses as well.
+            bulk.removeClause(self.c5)
+            single.removeClause(self.c5)
+            for query in cls:
+                for i in range(len(query)):
+                    lit = query.getLiteral(i)
+                    self.assertEqual(
+                        set(bulk.getResolutionLiterals(lit)),
+                        set(single.getResolutionLiterals(lit)))
+                    self.assertTrue(not self.c5 in
+                                    [c for (c, j) in
+                                     bulk.getResolutionLiterals(lit)])
+        for indextype in SubsumptionIndexes.values():
+            single = indextype()
+            for c in cls:
+                single.insertClause(c)
+            bulk = indextype()
+            bulk.insertClauses(cls[:4])
+            bulk.insertClauses(cls[4:])
+            for query in cls:
+                self.assertTrue(bulk.isIndexed(query))
+                self.assertEqual(set(bulk.getSubsumingCandidates(query)),
+                                 set(single.getSubsumingCandidates(query)))
+                self.assertEqual(set(bulk.getSubsumedCandidates(query)),
+                                 set(single.getSubsumedCandidates(query)))
+
+    def testIndexMemory(self):
+        """
+        Test the memory estimate for indices.
+        """
+        index = FeatureVectorIndex()
+        (objects, size) = indexMemory(index)
+        index.insertClauses([self.c1, self.c2, self.c3])
+        (objects2, size2) = indexMemory(index)
+        self.assertTrue(objects2 > objects)
+        self.assertTrue(size2 > size)
+        # Clauses are not counted.
+        self.assertEqual(indexMemory([self.c1, self.c2])[0], 1)
+
     def testPredAbstraction(self):
         p1 = []
         p2 = [(True, "p")]
@@ -419,7 +1818,7 @@ cnf(c9,axiom, p(X,Y)).
         index.insertClause(self.c4)
         index.insertClause(self.c5)
         index.insertClause(self.c6)
-        print(index.pred_abstr_arr)
+        print(index.root.keys)
         self.assertTrue(index.isIndexed(self.c1))
         self.assertTrue(index.isIndexed(self.c2))
         self.assertTrue(index.isIndexed(self.c3))
@@ -430,7 +1829,7 @@ cnf(c9,axiom, p(X,Y)).
         index.removeClause(self.c1)
         index.removeClause(self.c5)
         index.removeClause(self.c3)
-        print(index.pred_abstr_arr)
+        print(index.root.keys)
         self.assertFalse(index.isIndexed(self.c1))
         self.assertTrue(index.isIndexed(self.c2))
         self.assertFalse(index.isIndexed(self.c3))
@@ -442,7 +1841,7 @@ cnf(c9,axiom, p(X,Y)).
         index.insertClause(self.c1)
         index.insertClause(self.c5)
         index.insertClause(self.c9)
-        print(index.pred_abstr_arr)
+        print(index.root.keys)
         self.assertTrue(index.isIndexed(self.c1))
         self.assertTrue(index.isIndexed(self.c2))
         self.assertTrue(index.isIndexed(self.c3))
@@ -470,6 +1869,71 @@ cnf(c9,axiom, p(X,Y)).
         print(cands)
         self.assertEqual(len(cands), 1)
 
+    def testSubsumptionIndexTrie(self):
+        """
+        Test that the trie walks agree with the subsequence test on
+        predicate abstractions, and that empty branches are removed.
+        """
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c6,
+               self.c7, self.c8, self.c9]
+        index = SubsumptionIndex()
+        for c in cls:
+            index.insertClause(c)
+        for query in cls:
+            qpa = query.predicateAbstraction()
+            subsuming = index.getSubsumingCandidates(query)
+            subsumed  = index.getSubsumedCandidates(query)
+            self.assertEqual(len(subsuming), len(set(subsuming)))
+            self.assertEqual(len(subsumed), len(set(subsumed)))
+            self.assertEqual(set(subsuming), set([c for c in cls if
+                predAbstractionIsSubSequence(c.predicateAbstraction(),
+                                             qpa)]))
+            self.assertEqual(set(subsumed), set([c for c in cls if
+                predAbstractionIsSubSequence(qpa,
+                                             c.predicateAbstraction())]))
+        for c in cls:
+            index.removeClause(c)
+        self.assertEqual(index.root.keys, [])
+        self.assertEqual(index.root.children, [])
+
+    def testFeatureVectorIndex(self):
+        """
+        Test that the feature vector index returns all subsuming and
+        subsumed clauses, for different feature sets.
+        """
+        from subsumption import subsumes
+
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c6,
+               self.c7, self.c8, self.c9]
+        for features in [FVFeatures, ["lits"], ["preds", "depth"]]:
+            index = FeatureVectorIndex(features)
+            for c in cls:
+                index.insertClause(c)
+            index.removeClause(self.c4)
+            self.assertTrue(not index.isIndexed(self.c4))
+            self.assertTrue(index.isIndexed(self.c9))
+            indexed = [c for c in cls if c != self.c4]
+            for query in cls:
+                subsuming = index.getSubsumingCandidates(query)
+                subsumed  = index.getSubsumedCandidates(query)
+                self.assertEqual(len(subsuming), len(set(subsuming)))
+                for c in indexed:
+                    if subsumes(c, query):
+                        self.assertTrue(c in subsuming)
+                    if subsumes(query, c):
+                        self.assertTrue(c in subsumed)
+            for c in indexed:
+                index.removeClause(c)
+            self.assertEqual(index.root, {})
+
+        index = FeatureVectorIndex()
+        for c in cls:
+            index.insertClause(c)
+        # Only p(X,Y) (and the clause itself) can subsume c1.
+        self.assertEqual(set(index.getSubsumingCandidates(self.c1)),
+                         set([self.c1, self.c9]))
+        self.assertRaises(ValueError, FeatureVectorIndex, ["size"])
+
 
 if __name__ == '__main__':
     unittest.main()
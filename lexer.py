@@ -105,6 +105,7 @@ class Token(object):
     OpenSquare     = Ident("[")
     CloseSquare    = Ident("]")
     Comma          = Ident(",")
+    Mult           = Ident("*")
     Colon          = Ident(":")
     EqualSign      = Ident("=")
     NotEqualSign   = Ident("!=")
@@ -157,6 +158,7 @@ class Lexer(object):
         (re.compile("\["),                    Token.OpenSquare),
         (re.compile("\]"),                    Token.CloseSquare),
         (re.compile(","),                     Token.Comma),
+        (re.compile("[*]"),                   Token.Mult),
         (re.compile(":"),                     Token.Colon),
         (re.compile("~\|"),                   Token.Nor),
         (re.compile("~&"),                    Token.Nand),
@@ -74,7 +74,8 @@ from lexer import Token,Lexer
 from signature import Signature
 from terms import *
 from substitutions import BTSubst
-from matching import match
+from matching import match, flatMatch
+from flatterms import FlatTerm
 
 
 
@@ -143,6 +144,8 @@ class Literal(object):
         else:
             self.negative = negative
             self.atom = atom
+        self.flat_atom = None
+        self.atom_key  = None
         self.setInferenceLit(True)
 
     def __repr__(self):
@@ -277,12 +280,78 @@ class Literal(object):
         return sig
 
 
+    def copyWithAtom(self, atom):
+        """
+        Return a new literal with the sign of self and the given
+        atom. If the atom is unchanged (i.e. it is self.atom), its
+        flatterm is shared as well.
+        """
+        res = Literal(atom, self.negative)
+        if atom is self.atom:
+            res.flat_atom = self.flat_atom
+            res.atom_key  = self.atom_key
+        return res
+
     def instantiate(self, subst):
         """
         Return a copy of self, instantiated with the given
         subtitution.
         """
-        return Literal(subst(self.atom), self.negative)
+        return self.copyWithAtom(subst(self.atom))
+
+    def instantiateNormalized(self, subst, offset, renaming):
+        """
+        Return a copy of self, instantiated with the triangular
+        substitution subst, with the variables of self shifted by
+        offset. The variables of the result are renamed to integers
+        according to the (shared) dictionary renaming (see
+        TriangularSubst.apply()).
+        """
+        return self.copyWithAtom(subst.apply(self.atom, offset, renaming))
+
+    def normalizeVars(self, renaming):
+        """
+        Return a copy of self with variables renamed to integers
+        according to the (shared) dictionary renaming (see
+        termNormalizeVars()). The inference literal flag is
+        preserved.
+        """
+        res = self.copyWithAtom(termNormalizeVars(self.atom, renaming))
+        res.setInferenceLit(self.isInferenceLit())
+        return res
+
+    def shareTerms(self, bank):
+        """
+        Replace the atom of the literal by its shared representation
+        in the term bank.
+        """
+        self.atom = bank.insert(self.atom)
+        self.flat_atom = None
+
+    def atomKey(self):
+        """
+        Return a hashable key for the atom of the literal (see
+        termKey()). The key is computed only once.
+        """
+        if self.atom_key == None:
+            self.atom_key = termKey(self.atom)
+        return self.atom_key
+
+    def key(self):
+        """
+        Return a hashable key for the literal. Two literals are equal
+        (see isEqual()) if and only if their keys are equal.
+        """
+        return (self.negative, self.atomKey())
+
+    def flatAtom(self):
+        """
+        Return the atom of the literal as a flatterm. The flatterm is
+        computed on first use and cached.
+        """
+        if self.flat_atom == None:
+            self.flat_atom = FlatTerm(self.atom)
+        return self.flat_atom
 
     def negate(self):
         """
@@ -310,7 +379,7 @@ class Literal(object):
         if self.isNegative()!=other.isNegative():
             return False
         else:
-            res =  match(self.atom, other.atom, subst)
+            res =  flatMatch(self.flatAtom(), other.flatAtom(), subst)
             return res
 
     def predicateAbstraction(self):
@@ -535,6 +604,12 @@ class TestLiterals(unittest.TestCase):
         self.assertEqual(self.a4.weight(2,1),6)
         self.assertEqual(self.a5.weight(2,1),9)
 
+        bank = TermBank()
+        self.a2.shareTerms(bank)
+        self.a5.shareTerms(bank)
+        self.assertEqual(self.a2.weight(2,1),9)
+        self.assertEqual(self.a5.weight(2,1),9)
+
     def testMatch(self):
         """
         Test literal matching.
@@ -578,6 +653,13 @@ class TestLiterals(unittest.TestCase):
         self.assertTrue(oppositeInLitList(self.a7, l2))
         self.assertTrue(not oppositeInLitList(self.a7, l4))
 
+        for l in l2:
+            for m in l2:
+                self.assertEqual(l.key() == m.key(), l.isEqual(m))
+                self.assertEqual(l.atomKey() == m.atomKey() and
+                                 l.isNegative() != m.isNegative(),
+                                 l.isOpposite(m))
+
     def testSig(self):
         """
         Test signature collection.
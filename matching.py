@@ -45,6 +45,20 @@ state. This will become useful later, when we try to find a common
 match for a small set of terms (or literals) onto any subset of a
 larger set.
 
+Finally, flatMatch() implements matching on flatterms (see
+flatterms.py). Since in matching each variable is bound at most once,
+and only the matcher is instantiated, both flatterms can be traversed
+in a single left-to-right pass, skipping over whole subterms of the
+target whenever the matcher has a variable. This needs neither
+recursion nor any work lists, and does not create any intermediate
+lists. Already bound variables are checked by comparing the slices
+of the two flatterms, not by a recursive term comparison. It is used
+for subsumption, where most of the matching attempts happen. For
+array substitutions (see ArrayBTSubst), flatMatch() accesses the
+binding array and the trail directly, so that one substitution can be
+reused for a whole subsumption sweep without allocating anything per
+matching attempt.
+
 
 Copyright 2010-2019 Stephan Schulz, schulz@eprover.org
 
@@ -74,6 +88,7 @@ Email: schulz@eprover.org
 
 from terms import *
 from substitutions import *
+from flatterms import FlatTerm
 
 
    
@@ -86,7 +101,7 @@ def match(matcher, target, subst):
     substitution allows us to use the function in places where we need
     to find a common match for several terms. 
     """
-    assert isinstance(subst, BTSubst)
+    assert isinstance(subst, (BTSubst, ArrayBTSubst))
     bt_state = subst.getState()
     result = True
 
@@ -121,7 +136,7 @@ def match_norec(t1, t2, subst):
     to find a common match for several terms. This is an alternative
     implementation using explicit work lists instead of recursion.
     """
-    assert isinstance(subst, BTSubst)
+    assert isinstance(subst, (BTSubst, ArrayBTSubst))
     bt_state = subst.getState()
     result = True
     mlist = [t1]
@@ -157,6 +172,105 @@ def match_norec(t1, t2, subst):
     return False
               
 
+def flatMatch(matcher, target, subst):
+    """
+    Match the flatterm matcher onto the flatterm target. If this
+    succeeds, return true and modify subst accordingly. Otherwise,
+    return false and leave subst unchanged. Variables are bound to the
+    (nested) subterms of target.
+    """
+    if type(subst) is ArrayBTSubst:
+        return flatMatchArray(matcher, target, subst)
+    assert isinstance(subst, BTSubst)
+    bt_state = subst.getState()
+    msyms = matcher.symbols
+    mars  = matcher.arities
+    tsyms = target.symbols
+    tars  = target.arities
+    tends = target.ends
+    origins = {}
+    i = 0
+    j = 0
+    mend = len(msyms)
+    while i < mend:
+        arity = mars[i]
+        if arity < 0:
+            var = msyms[i]
+            t   = target.subterms[j]
+            if subst.isBound(var):
+                if var in origins:
+                    if not target.subtermEqual(j, target, origins[var]):
+                        break
+                elif not termEqual(subst.value(var), t):
+                    # Bound before this call, no flat position known.
+                    break
+            else:
+                subst.addBinding((var, t))
+                origins[var] = j
+            j = tends[j]
+        elif arity != tars[j] or msyms[i] != tsyms[j]:
+            # This also catches the case of a variable in the target,
+            # which has arity -1.
+            break
+        else:
+            j = j+1
+        i = i+1
+    else:
+        return True
+    subst.backtrackToState(bt_state)
+    return False
+
+
+def flatMatchArray(matcher, target, subst):
+    """
+    Version of flatMatch() for ArrayBTSubst. The variables of matcher
+    must be covered by subst (see ArrayBTSubst.reserve()).
+    """
+    values  = subst.values
+    origins = subst.origins
+    trail   = subst.trail
+    bt_state = len(trail)
+    msyms = matcher.symbols
+    mars  = matcher.arities
+    tsyms = target.symbols
+    tars  = target.arities
+    tends = target.ends
+    tsubterms = target.subterms
+    i = 0
+    j = 0
+    mend = len(msyms)
+    while i < mend:
+        arity = mars[i]
+        if arity < 0:
+            var = msyms[i]
+            t   = tsubterms[j]
+            bound = values[var]
+            if bound is None:
+                values[var] = t
+                origins[var] = (target, j)
+                trail.append(var)
+            elif bound is not t:
+                origin = origins[var]
+                if origin is not None and \
+                   origin[0].subterms[origin[1]] is bound:
+                    if not origin[0].subtermEqual(origin[1], target, j):
+                        break
+                elif not termEqual(bound, t):
+                    # Bound by addBinding(), no flat position known.
+                    break
+            j = tends[j]
+        elif arity != tars[j] or msyms[i] != tsyms[j]:
+            break
+        else:
+            j = j+1
+        i = i+1
+    else:
+        return True
+    while len(trail) > bt_state:
+        values[trail.pop()] = None
+    return False
+
+
 class TestMatching(unittest.TestCase):
     """
     Test basic substitution functions.
@@ -248,6 +362,68 @@ class TestMatching(unittest.TestCase):
 
         self.match_test(match_norec, self.t6, self.t6, True)
 
+    def flatMatchWrapper(self, s, t, subst):
+        """
+        Call flatMatch() with the flatterm versions of s and t.
+        """
+        return flatMatch(FlatTerm(s), FlatTerm(t), subst)
+
+    def testFlatMatch(self):
+        """
+        Test Matching on flatterms.
+        """
+        print()
+        fmatch = self.flatMatchWrapper
+        self.match_test(fmatch, self.s1, self.t1, True)
+        self.match_test(fmatch, self.s2, self.t2, True)
+        self.match_test(fmatch, self.s3, self.t3, True)
+        self.match_test(fmatch, self.s4, self.t4, False)
+        self.match_test(fmatch, self.s5, self.t5, False)
+        self.match_test(fmatch, self.s6, self.t6, False)
+        self.match_test(fmatch, self.s7, self.t7, True)
+
+        self.match_test(fmatch, self.t1, self.s1, False)
+        self.match_test(fmatch, self.t2, self.s2, False)
+        self.match_test(fmatch, self.t3, self.s3, False)
+        self.match_test(fmatch, self.t4, self.s4, False)
+        self.match_test(fmatch, self.t5, self.s5, True)
+        self.match_test(fmatch, self.t6, self.s6, False)
+        self.match_test(fmatch, self.t7, self.s7, False)
+
+        self.match_test(fmatch, self.t6, self.t6, True)
+
+        sigma = BTSubst()
+        s = terms.string2Term("f(X,g(Y))")
+        self.assertTrue(not self.flatMatchWrapper(
+            s, terms.string2Term("f(a,g(b,c))"), sigma))
+        self.assertTrue(not sigma.isBound("X"))
+
+    def testFlatMatchArray(self):
+        """
+        Test matching on flatterms with a reusable array
+        substitution.
+        """
+        s = ["f", 0, ["g", 1, 0]]
+        sigma = ArrayBTSubst(2)
+        for t, success in [(terms.string2Term("f(a,g(b,a))"), True),
+                           (terms.string2Term("f(a,g(b,c))"), False),
+                           (terms.string2Term("f(X,g(h(Y),X))"), True),
+                           (terms.string2Term("f(a,h(b,a))"), False)]:
+            state = sigma.getState()
+            res = flatMatch(FlatTerm(s), FlatTerm(t), sigma)
+            self.assertEqual(res, success)
+            if res:
+                self.assertTrue(termEqual(sigma(s), t))
+            else:
+                self.assertEqual(sigma.getState(), state)
+            sigma.reset()
+            self.assertTrue(not sigma.isBound(0))
+            # The recursive matchers accept array substitutions, too.
+            res = match(s, t, sigma)
+            self.assertEqual(res, success)
+            self.assertEqual(match_norec(s, t, sigma), success)
+            sigma.reset()
+
 
 
 
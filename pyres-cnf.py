@@ -18,6 +18,10 @@ Options:
 --help
   Print this help.
 
+ -i
+--index
+  Use indexing to speed up some operations.
+
  -t
 --delete-tautologies
   Discard the given clause if it is a tautology.
@@ -30,9 +34,56 @@ Options:
 --backward-subsumption
   Discard processed clauses if they are subsumed by the given clause.
 
+ -T
+--term-sharing
+  Store all terms of the proof state in a shared term bank.
+
+ -U
+--unit-conflicts
+  Check each new unit clause against the existing unit clauses, and
+  stop as soon as two of them yield the empty clause.
+
+ -I <index>
+--res-index=<index>
+  Use the specified resolution index (topsymbol, fingerprint,
+  disctree (the default), or substtree, which also computes the
+  unifiers). Implies -i.
+
+--subsumption-index=<index>
+  Use the specified subsumption index (predabstr or fvindex, the
+  default). Implies -i.
+
+--unif-cache=<size>
+  Memoize the results of unification attempts between resolution
+  partners in a cache with at most <size> entries.
+
+--unif-cache-policy=<policy>
+  Use the specified eviction policy (lru or fifo) for the
+  unification cache.
+
+--passive-set=<impl>
+  Use the specified implementation of the set of unprocessed clauses
+  (heap, bucket, which requires integer evaluations, lazy, which
+  defers expensive evaluations until a clause is a candidate for
+  selection, or columnar, which requires NumPy). The default, auto,
+  uses bucket if possible and heap otherwise.
+
+--inference-records
+  Store resolvents in the set of unprocessed clauses as compact
+  inference records, and only compute them when they are selected.
+  Records with a parent removed by backward subsumption are dropped.
+
+--stats-json=<file>
+  Write the proof search statistics (including the retrieval
+  statistics of the indices) in JSON format to <file>.
+
  -H <heuristic>
 --given-clause-heuristic=<heuristic>
-  Use the specified heuristic for given-clause selection.
+  Use the specified heuristic for given-clause selection. This is
+  either the name of a predefined heuristic (e.g. PickGiven5, or
+  GoalDirected, which prefers clauses related to the conjecture), or
+  a list of weighted evaluation functions, like
+  "(5*SymbolCount(2,1),1*FIFO)" or "(5*GoalDist(2,1,1,2),1*FIFO)".
 
 Copyright 2011-2019 Stephan Schulz, schulz@eprover.org
 
@@ -63,36 +114,102 @@ Email: schulz@eprover.org
 
 import sys
 import getopt
+import json
 from version import version
-from lexer import Token,Lexer
+from lexer import Token,Lexer,ScannerError
 from derivations import enableDerivationOutput,disableDerivationOutput
 from clausesets import ClauseSet
-from heuristics import GivenClauseHeuristics
+from heuristics import GivenClauseHeuristics, EvaluationFunctions,\
+     parseHeuristic
 from saturation import SearchParams,ProofState
+from clausesets import PassiveSets, supportedPassiveSets,\
+     ColumnarHeuristicClauseSet
+from unification import UnificationCache
+from indexing import ResolutionIndexes, SubsumptionIndexes
 from litselection import LiteralSelectors
 
+indexed = False
+statsFile = None
 
 def processOptions(opts):
     """
     Process the options given
     """
+    global indexed, statsFile
+
     params = SearchParams()
     for opt, optarg in opts:
         if opt == "-h" or opt == "--help":
             print("pyres-cnf.py "+version)
             print(__doc__)
             sys.exit()
+        elif opt=="-i" or opt == "--index":
+            indexed = True
         elif opt=="-t" or opt == "--delete-tautologies":
             params.delete_tautologies = True
         elif opt=="-f" or opt == "--forward-subsumption":
             params.forward_subsumption = True
         elif opt=="-b" or opt == "--backward-subsumption":
             params.backward_subsumption = True
-        elif opt=="-H" or opt == "--given-clause-heuristic":
+        elif opt=="-T" or opt == "--term-sharing":
+            params.term_sharing = True
+        elif opt=="-U" or opt == "--unit-conflicts":
+            params.unit_conflicts = True
+        elif opt=="-I" or opt == "--res-index":
+            try:
+                params.res_index = ResolutionIndexes[optarg]
+            except KeyError:
+                print("Unknown resolution index", optarg)
+                print("Supported:", ResolutionIndexes.keys())
+                sys.exit(1)
+            indexed = True
+        elif opt == "--subsumption-index":
+            try:
+                params.sub_index = SubsumptionIndexes[optarg]
+            except KeyError:
+                print("Unknown subsumption index", optarg)
+                print("Supported:", SubsumptionIndexes.keys())
+                sys.exit(1)
+            indexed = True
+        elif opt == "--passive-set":
             try:
-                params.heuristics = GivenClauseHeuristics[optarg]
+                params.passive_set = PassiveSets[optarg]
             except KeyError:
+                print("Unknown passive set implementation", optarg)
+                print("Supported:", PassiveSets.keys())
+                sys.exit(1)
+            if params.passive_set == ColumnarHeuristicClauseSet and \
+               not ColumnarHeuristicClauseSet.available:
+                print("Passive set implementation", optarg, "requires NumPy")
+                print("Supported:", supportedPassiveSets(params.heuristics))
+                sys.exit(1)
+        elif opt == "--inference-records":
+            params.inference_records = True
+        elif opt == "--stats-json":
+            statsFile = optarg
+        elif opt == "--unif-cache":
+            try:
+                params.unif_cache_size = int(optarg)
+            except ValueError:
+                params.unif_cache_size = -1
+            if params.unif_cache_size < 0:
+                print("Invalid unification cache size", optarg)
+                print("Expected a non-negative integer")
+                sys.exit(1)
+        elif opt == "--unif-cache-policy":
+            if not optarg in UnificationCache.policies:
+                print("Unknown cache eviction policy", optarg)
+                print("Supported:", UnificationCache.policies)
+                sys.exit(1)
+            params.unif_cache_policy = optarg
+        elif opt=="-H" or opt == "--given-clause-heuristic":
+            try:
+                params.heuristics = parseHeuristic(optarg)
+            except (ScannerError, TypeError) as err:
                 print("Unknown clause evaluation function", optarg)
+                print(err)
+                print("Supported:", GivenClauseHeuristics.keys(),
+                      "or a specification using", EvaluationFunctions.keys())
                 sys.exit(1)
         elif opt=="-n" or opt == "--neg-lit-selection":
             try:
@@ -100,16 +217,32 @@ def processOptions(opts):
             except KeyError:
                 print("Unknown literal selection function", optarg)
                 sys.exit(1)
+    supported = supportedPassiveSets(params.heuristics)
+    if not params.passive_set in [PassiveSets[name] for name in supported]:
+        print("Unsupported passive set implementation for this heuristic")
+        print("Supported:", supported)
+        sys.exit(1)
+
     return params
 
 if __name__ == '__main__':
     try:
         opts, args = getopt.gnu_getopt(sys.argv[1:],
-                                       "htfbH:n:",
+                                       "hitfbH:n:TUI:",
                                        ["help",
+                                        "index",
                                         "delete-tautologies",
                                         "forward-subsumption",
-                                        "backward-subsumption"
+                                        "backward-subsumption",
+                                        "term-sharing",
+                                        "unit-conflicts",
+                                        "res-index=",
+                                        "subsumption-index=",
+                                        "unif-cache=",
+                                        "stats-json=",
+                                        "passive-set=",
+                                        "inference-records",
+                                        "unif-cache-policy=",
                                         "given-clause-heuristic=",
                                         "neg-lit-selection="])
     except getopt.GetoptError as err:
@@ -126,12 +259,16 @@ if __name__ == '__main__':
         lex = Lexer(input)
         problem.parse(lex)
 
-    state = ProofState(params, problem)
+    state = ProofState(params, problem, indexed=indexed)
     res = state.saturate()
 
 
 
     print(state.statisticsStr())
+    if statsFile:
+        fp = open(statsFile, "w")
+        json.dump(state.statisticsDict(), fp, indent=2)
+        fp.close()
     if res != None:
         print("# SZS status Unsatisfiable")
         proof = res.orderedDerivation()
@@ -44,9 +44,56 @@ Options:
 --backward-subsumption
   Discard processed clauses if they are subsumed by the given clause.
 
+ -T
+--term-sharing
+  Store all terms of the proof state in a shared term bank.
+
+ -U
+--unit-conflicts
+  Check each new unit clause against the existing unit clauses, and
+  stop as soon as two of them yield the empty clause.
+
+ -I <index>
+--res-index=<index>
+  Use the specified resolution index (topsymbol, fingerprint,
+  disctree (the default), or substtree, which also computes the
+  unifiers). Implies -i.
+
+--subsumption-index=<index>
+  Use the specified subsumption index (predabstr or fvindex, the
+  default). Implies -i.
+
+--unif-cache=<size>
+  Memoize the results of unification attempts between resolution
+  partners in a cache with at most <size> entries.
+
+--unif-cache-policy=<policy>
+  Use the specified eviction policy (lru or fifo) for the
+  unification cache.
+
+--passive-set=<impl>
+  Use the specified implementation of the set of unprocessed clauses
+  (heap, bucket, which requires integer evaluations, lazy, which
+  defers expensive evaluations until a clause is a candidate for
+  selection, or columnar, which requires NumPy). The default, auto,
+  uses bucket if possible and heap otherwise.
+
+--inference-records
+  Store resolvents in the set of unprocessed clauses as compact
+  inference records, and only compute them when they are selected.
+  Records with a parent removed by backward subsumption are dropped.
+
+--stats-json=<file>
+  Write the proof search statistics (including the retrieval
+  statistics of the indices) in JSON format to <file>.
+
  -H <heuristic>
 --given-clause-heuristic=<heuristic>
-  Use the specified heuristic for given-clause selection.
+  Use the specified heuristic for given-clause selection. This is
+  either the name of a predefined heuristic (e.g. PickGiven5, or
+  GoalDirected, which prefers clauses related to the conjecture), or
+  a list of weighted evaluation functions, like
+  "(5*SymbolCount(2,1),1*FIFO)" or "(5*GoalDist(2,1,1,2),1*FIFO)".
 
  -n
 --neg-lit-selection
@@ -91,16 +138,22 @@ Email: schulz@eprover.org
 import sys
 from resource import RLIMIT_STACK, setrlimit, getrlimit
 import getopt
+import json
 from signal import  signal, SIGXCPU
 from resource import getrusage, RUSAGE_SELF
 from version import version
-from lexer import Token,Lexer
+from lexer import Token,Lexer,ScannerError
 from derivations import enableDerivationOutput,disableDerivationOutput,Derivable,flatDerivation
 from clausesets import ClauseSet
 from clauses import firstLit, varSizeLit, eqResVarSizeLit
 from fofspec import FOFSpec
-from heuristics import GivenClauseHeuristics
+from heuristics import GivenClauseHeuristics, EvaluationFunctions,\
+     parseHeuristic
 from saturation import SearchParams,ProofState
+from clausesets import PassiveSets, supportedPassiveSets,\
+     ColumnarHeuristicClauseSet
+from unification import UnificationCache
+from indexing import ResolutionIndexes, SubsumptionIndexes
 from litselection import LiteralSelectors
 
 
@@ -108,12 +161,13 @@ suppressEqAxioms = False
 silent           = False
 indexed          = False
 proofObject      = False
+statsFile        = None
 
 def processOptions(opts):
     """
     Process the options given
     """
-    global silent, indexed, suppressEqAxioms, proofObject
+    global silent, indexed, suppressEqAxioms, proofObject, statsFile
 
     params = SearchParams()
     for opt, optarg in opts:
@@ -135,12 +189,65 @@ def processOptions(opts):
             params.forward_subsumption = True
         elif opt=="-b" or opt == "--backward-subsumption":
             params.backward_subsumption = True
-        elif opt=="-H" or opt == "--given-clause-heuristic":
+        elif opt=="-T" or opt == "--term-sharing":
+            params.term_sharing = True
+        elif opt=="-U" or opt == "--unit-conflicts":
+            params.unit_conflicts = True
+        elif opt=="-I" or opt == "--res-index":
+            try:
+                params.res_index = ResolutionIndexes[optarg]
+            except KeyError:
+                print("Unknown resolution index", optarg)
+                print("Supported:", ResolutionIndexes.keys())
+                sys.exit(1)
+            indexed = True
+        elif opt == "--subsumption-index":
+            try:
+                params.sub_index = SubsumptionIndexes[optarg]
+            except KeyError:
+                print("Unknown subsumption index", optarg)
+                print("Supported:", SubsumptionIndexes.keys())
+                sys.exit(1)
+            indexed = True
+        elif opt == "--passive-set":
             try:
-                params.heuristics = GivenClauseHeuristics[optarg]
+                params.passive_set = PassiveSets[optarg]
             except KeyError:
+                print("Unknown passive set implementation", optarg)
+                print("Supported:", PassiveSets.keys())
+                sys.exit(1)
+            if params.passive_set == ColumnarHeuristicClauseSet and \
+               not ColumnarHeuristicClauseSet.available:
+                print("Passive set implementation", optarg, "requires NumPy")
+                print("Supported:", supportedPassiveSets(params.heuristics))
+                sys.exit(1)
+        elif opt == "--inference-records":
+            params.inference_records = True
+        elif opt == "--stats-json":
+            statsFile = optarg
+        elif opt == "--unif-cache":
+            try:
+                params.unif_cache_size = int(optarg)
+            except ValueError:
+                params.unif_cache_size = -1
+            if params.unif_cache_size < 0:
+                print("Invalid unification cache size", optarg)
+                print("Expected a non-negative integer")
+                sys.exit(1)
+        elif opt == "--unif-cache-policy":
+            if not optarg in UnificationCache.policies:
+                print("Unknown cache eviction policy", optarg)
+                print("Supported:", UnificationCache.policies)
+                sys.exit(1)
+            params.unif_cache_policy = optarg
+        elif opt=="-H" or opt == "--given-clause-heuristic":
+            try:
+                params.heuristics = parseHeuristic(optarg)
+            except (ScannerError, TypeError) as err:
                 print("Unknown clause evaluation function", optarg)
-                print("Supported:", GivenClauseHeuristics.keys())
+                print(err)
+                print("Supported:", GivenClauseHeuristics.keys(),
+                      "or a specification using", EvaluationFunctions.keys())
                 sys.exit(1)
         elif opt=="-n" or opt == "--neg-lit-selection":
             try:
@@ -152,6 +259,12 @@ def processOptions(opts):
         elif opt=="-S" or opt=="--suppress-eq-axioms":
             suppressEqAxioms = True
 
+    supported = supportedPassiveSets(params.heuristics)
+    if not params.passive_set in [PassiveSets[name] for name in supported]:
+        print("Unsupported passive set implementation for this heuristic")
+        print("Supported:", supported)
+        sys.exit(1)
+
     return params
 
 def timeoutHandler(sign, frame):
@@ -186,7 +299,7 @@ if __name__ == '__main__':
 
     try:
         opts, args = getopt.gnu_getopt(sys.argv[1:],
-                                       "hsVpitfbH:n:S",
+                                       "hsVpitfbH:n:STUI:",
                                        ["help",
                                         "silent",
                                         "version",
@@ -194,10 +307,19 @@ if __name__ == '__main__':
                                         "index",
                                         "delete-tautologies",
                                         "forward-subsumption",
-                                        "backward-subsumption"
+                                        "backward-subsumption",
+                                        "term-sharing",
+                                        "unit-conflicts",
+                                        "res-index=",
+                                        "subsumption-index=",
+                                        "unif-cache=",
+                                        "stats-json=",
+                                        "passive-set=",
+                                        "inference-records",
+                                        "unif-cache-policy=",
                                         "given-clause-heuristic=",
-                                        "neg-lit-selection="
-                                        "supress-eq-axioms"])
+                                        "neg-lit-selection=",
+                                        "suppress-eq-axioms"])
     except getopt.GetoptError as err:
         print(sys.argv[0],":", err)
         sys.exit(1)
@@ -245,6 +367,10 @@ if __name__ == '__main__':
             print("# SZS output end Saturation")
             disableDerivationOutput()
     print(state.statisticsStr())
+    if statsFile:
+        fp = open(statsFile, "w")
+        json.dump(state.statisticsDict(), fp, indent=2)
+        fp.close()
 
     # We use the resources interface to get and print the CPU time
     resources = getrusage(RUSAGE_SELF)
@@ -40,10 +40,11 @@ from clauses import parseClause
 from clausesets import ClauseSet
 
 
-def computeAllResolvents(clause, clauseset):
+def computeAllResolvents(clause, clauseset, unif_cache=None):
     """
     Compute all binary resolvents between a given clause and all
-    clauses in clauseset.
+    clauses in clauseset. If unif_cache is given, unification results
+    are memoized in this UnificationCache.
 
     In the "given-clause algorithm", the proof state is represented by
     two sets of clauses, the set of _processed_ clauses, and the set
@@ -64,12 +65,112 @@ def computeAllResolvents(clause, clauseset):
     res = []
     for lit in range(len(clause)):
         if clause.getLiteral(lit).isInferenceLit():
-            partners = \
-                     clauseset.getResolutionLiterals(clause.getLiteral(lit))
-            for (cl2, lit2) in partners:
-                resolvent = resolution(clause, lit, cl2, lit2)
-                if resolvent!=None:
-                    res.append(resolvent)
+            for (cl2, lit2, sigma) in \
+                    clauseset.getResolutionUnifiers(clause, lit, unif_cache):
+                res.append(resolution(clause, lit, cl2, lit2, sigma))
+    return res
+
+
+class InferenceRecord(object):
+    """
+    A compact representation of a binary resolvent that has not been
+    computed yet. It only stores the two parent clauses and the
+    positions of the resolved literals. The resolvent is computed by
+    materialize(), typically only if the record is selected for
+    processing.
+
+    For heuristic evaluation, a record provides the relevant part of
+    the clause interface. The literals of a record are the remaining
+    (uninstantiated) literals of both parents, so that the weight of
+    a record is an estimate of the weight of the resolvent that
+    ignores the unifier and the removal of duplicate literals.
+    """
+    __slots__ = ["clause1", "lit1", "clause2", "lit2", "evaluation"]
+
+    def __init__(self, clause1, lit1, clause2, lit2):
+        """
+        Initialize the record for the resolvent of clause1|lit1 and
+        clause2|lit2.
+        """
+        self.clause1    = clause1
+        self.lit1       = lit1
+        self.clause2    = clause2
+        self.lit2       = lit2
+        self.evaluation = None
+
+    def __repr__(self):
+        """
+        Return a string representation of the record.
+        """
+        return "resolution(%s/%d, %s/%d)"%(self.clause1.name, self.lit1,
+                                           self.clause2.name, self.lit2)
+
+    @property
+    def literals(self):
+        """
+        The literals of both parents, except for the resolved ones.
+        """
+        l1 = self.clause1.getLiteral(self.lit1)
+        l2 = self.clause2.getLiteral(self.lit2)
+        return [l for l in self.clause1.literals if l!=l1]+\
+               [l for l in self.clause2.literals if l!=l2]
+
+    def __len__(self):
+        """
+        Return the number of literals of the record.
+        """
+        return len(self.clause1)+len(self.clause2)-2
+
+    def weight(self, fweight, vweight):
+        """
+        Return the estimated symbol-count weight of the resolvent.
+        """
+        res = 0
+        for l in self.literals:
+            res = res + l.weight(fweight, vweight)
+        return res
+
+    def addEval(self, eval):
+        """
+        Add an evaluation to the record (see Clause.addEval()).
+        """
+        self.evaluation = eval
+
+    def getParents(self):
+        """
+        Return the list of parent clauses.
+        """
+        return [self.clause1, self.clause2]
+
+    def isGoalDerived(self):
+        """
+        Return True if one of the parents is derived from the
+        conjecture (see Derivable.isGoalDerived()).
+        """
+        return self.clause1.isGoalDerived() or self.clause2.isGoalDerived()
+
+    def materialize(self):
+        """
+        Compute and return the resolvent. It inherits the evaluation
+        of the record.
+        """
+        res = resolution(self.clause1, self.lit1, self.clause2, self.lit2)
+        res.addEval(self.evaluation)
+        return res
+
+
+def computeAllResolventRecords(clause, clauseset, unif_cache=None):
+    """
+    As computeAllResolvents(), but return a list of InferenceRecords
+    instead of the resolvents themselves. Only the unifiability of the
+    literals is checked here, the resolvents are computed on demand.
+    """
+    res = []
+    for lit in range(len(clause)):
+        if clause.getLiteral(lit).isInferenceLit():
+            for (cl2, lit2, sigma) in \
+                    clauseset.getResolutionUnifiers(clause, lit, unif_cache):
+                res.append(InferenceRecord(clause, lit, cl2, lit2))
     return res
 
 
@@ -126,6 +227,25 @@ cnf(c3, axiom, c).
         print(res)
 
 
+    def testResolventRecords(self):
+        """
+        Test that inference records represent the same resolvents.
+        """
+        res = computeAllResolvents(self.conj, self.cset)
+        records = computeAllResolventRecords(self.conj, self.cset)
+        self.assertEqual(len(records), len(res))
+        for (clause, record) in zip(res, records):
+            self.assertEqual(len(record), len(clause))
+            self.assertEqual(record.weight(2,1), clause.weight(2,1))
+            self.assertEqual(record.getParents(), clause.getParents())
+            self.assertEqual(record.isGoalDerived(), clause.isGoalDerived())
+            record.addEval([1])
+            resolvent = record.materialize()
+            self.assertEqual(len(resolvent), len(clause))
+            for (l1, l2) in zip(resolvent.literals, clause.literals):
+                self.assertTrue(l1.isEqual(l2))
+            self.assertEqual(resolvent.evaluation, [1])
+
     def testFactoring(self):
         """
         Test full factoring of a clause.
@@ -36,6 +36,10 @@ sigma(c|a)
 
 Again, c is an arbitray disjunction.
 
+Both rules use the flatterm unification kernel (see unification.py
+and flatterms.py) on the (cached) flatterm representation of the
+atoms.
+
 
 Copyright 2010-2019 Stephan Schulz, schulz@eprover.org
 
@@ -66,13 +70,13 @@ Email: schulz@eprover.org
 import unittest
 from lexer import Lexer
 import substitutions
-from unification import mgu
+from unification import flatMgu, flatMguList, UnificationCache
 from literals import Literal
 from derivations import flatDerivation
 import clauses
 
 
-def resolution(clause1, lit1, clause2, lit2):
+def resolution(clause1, lit1, clause2, lit2, sigma=None):
     """
     Implementation of the Resolution rule. lit1 and lit2 are indices
     of literals in clause1 and clause2, respectively, so clause1|lit1
@@ -80,23 +84,90 @@ def resolution(clause1, lit1, clause2, lit2):
 
     Try to resolve clause1|lit1 against clause2|lit2. If this is
     possible, return the resolvent. Otherwise, return None.
+
+    If sigma is given, it must be a unifier of the two literals
+    (e.g. precomputed by resolutionUnifiers()), and the literals must
+    have opposite signs. In this case, no unification is attempted.
+
+    If both clauses are ground, unification reduces to a comparison
+    of the (hashed) atoms, and the literals of the resolvent are
+    simply copied.
     """
     l1 = clause1.getLiteral(lit1)
     l2 = clause2.getLiteral(lit2)
-    if l1.isNegative() == l2.isNegative():
-        return None
-    sigma = mgu(l1.atom, l2.atom)
-    if sigma == None:
-        return None
-    lits1 = [l.instantiate(sigma) for l in clause1.literals if l!=l1]
-    lits2 = [l.instantiate(sigma) for l in clause2.literals if l!=l2]
-    lits1.extend(lits2)
-    res = clauses.Clause(lits1)
+    if clause1.ground and clause2.ground:
+        if sigma == None:
+            if l1.isNegative() == l2.isNegative() or \
+               l1.atomKey() != l2.atomKey():
+                return None
+        lits = [l.copyWithAtom(l.atom) for l in clause1.literals if l!=l1]
+        lits.extend([l.copyWithAtom(l.atom)
+                     for l in clause2.literals if l!=l2])
+        var_count = 0
+    else:
+        # The variables of clause2 are renamed apart from those of
+        # clause1 by shifting them by the number of variables in
+        # clause1.
+        offset = clause1.var_count
+        if sigma == None:
+            if l1.isNegative() == l2.isNegative():
+                return None
+            sigma = flatMgu(l1.flatAtom(), l2.flatAtom(), offset)
+            if sigma == None:
+                return None
+        renaming = {}
+        lits = [l.instantiateNormalized(sigma, 0, renaming)
+                for l in clause1.literals if l!=l1]
+        lits.extend([l.instantiateNormalized(sigma, offset, renaming)
+                     for l in clause2.literals if l!=l2])
+        var_count = len(renaming)
+    res = clauses.Clause(lits, var_count=var_count)
     res.removeDupLits()
     res.setDerivation(flatDerivation("resolution", [clause1, clause2]))
     return res
 
 
+def resolutionUnifiers(clause, lit, partners, unif_cache=None):
+    """
+    Unify clause|lit with all potential resolution partners at
+    once. partners is a list of tuples (clause2, lit2) (as returned by
+    getResolutionLiterals()). Return the list of tuples (clause2,
+    lit2, sigma) for all partners with opposite sign for which sigma
+    unifies the two literals. These can be passed on to resolution().
+    If unif_cache is given, it is a UnificationCache used to look up
+    and store the unification results. If clause is ground, ground
+    partners are decided by comparing the hashed atoms.
+    """
+    l1 = clause.getLiteral(lit)
+    negative = l1.isNegative()
+    partners = [(c, i) for (c, i) in partners
+                if c.literals[i].negative != negative]
+    if clause.ground:
+        key = l1.atomKey()
+        res = []
+        rest = []
+        for (c, i) in partners:
+            if not c.ground:
+                rest.append((c, i))
+            elif c.literals[i].atomKey() == key:
+                res.append((c, i, substitutions.TriangularSubst()))
+        if not rest:
+            return res
+        partners = rest
+    else:
+        res = []
+    if unif_cache != None:
+        mguList = unif_cache.mguList
+    else:
+        mguList = flatMguList
+    unifiers = mguList(l1.flatAtom(),
+                       [c.literals[i].flatAtom() for (c, i) in partners],
+                       clause.var_count)
+    res.extend([(partners[pos][0], partners[pos][1], sigma)
+                for (pos, sigma) in unifiers])
+    return res
+
+
 def factor(clause, lit1, lit2):
     """
     Check if it is possible to form a factor between lit1 and lit2. If
@@ -106,11 +177,21 @@ def factor(clause, lit1, lit2):
     l2 = clause.getLiteral(lit2)
     if l1.isNegative() != l2.isNegative():
         return None
-    sigma = mgu(l1.atom, l2.atom)
-    if sigma == None:
-        return None
-    lits = [l.instantiate(sigma) for l in clause.literals if l!=l2]
-    res = clauses.Clause(lits)
+    if clause.ground:
+        # Ground literals are only unifiable if they are equal.
+        if l1.atomKey() != l2.atomKey():
+            return None
+        lits = [l.copyWithAtom(l.atom) for l in clause.literals if l!=l2]
+        var_count = 0
+    else:
+        sigma = flatMgu(l1.flatAtom(), l2.flatAtom())
+        if sigma == None:
+            return None
+        renaming = {}
+        lits = [l.instantiateNormalized(sigma, 0, renaming)
+                for l in clause.literals if l!=l2]
+        var_count = len(renaming)
+    res = clauses.Clause(lits, var_count=var_count)
     res.removeDupLits()
     res.setDerivation(flatDerivation("factor", [clause]))
     return res
@@ -171,6 +252,43 @@ cnf(taut,axiom,p(X4)|~p(X4)).
         self.assertTrue(res5)
         print(res5)
 
+    def testRenamingApart(self):
+        """
+        Test that the variables of the two premises are kept apart by
+        offsets, in particular when resolving a clause with itself,
+        and that resolvents are normalized.
+        """
+        lex = Lexer("cnf(c8,axiom,p(X)|~p(f(X))).")
+        c8 = clauses.parseClause(lex)
+        res = resolution(c8, 0, c8, 1)
+        self.assertTrue(res)
+        print(res)
+        self.assertEqual(res.var_count, 1)
+        self.assertEqual(repr(res.literals), "[~p(f(f(X0))), p(X0)]")
+
+    def testResolutionUnifiers(self):
+        """
+        Test batched computation of resolution partners.
+        """
+        partners = [(c, i) for c in [self.c1, self.c2, self.c3, self.c4]
+                    for i in range(len(c))]
+        unifiers = resolutionUnifiers(self.c2, 0, partners)
+        expected = [(c, i) for (c, i) in partners
+                    if resolution(self.c2, 0, c, i)]
+        self.assertEqual([(c, i) for (c, i, sigma) in unifiers], expected)
+        for (c, i, sigma) in unifiers:
+            r1 = resolution(self.c2, 0, c, i, sigma)
+            r2 = resolution(self.c2, 0, c, i)
+            self.assertEqual(repr(r1.literals), repr(r2.literals))
+
+        cache = UnificationCache(100)
+        for i in range(2):
+            unifiers2 = resolutionUnifiers(self.c2, 0, partners, cache)
+            self.assertEqual([(c, i) for (c, i, sigma) in unifiers2],
+                             expected)
+        self.assertTrue(cache.misses > 0)
+        self.assertEqual(cache.hits, cache.misses)
+
     def testFactoring(self):
         """
         Test the factoring inference.
@@ -11,6 +11,8 @@ very basic implementation in simplesat in several ways.
 - It supports heuristic clause selection, not just first-in first-out
 - It supports tautology deletion
 - It supports forward and backwards subsumption
+- It optionally detects complementary unit clauses as soon as they
+  are generated
 - It keeps some statistics to enable the user to understand the
   practical impact of different steps of the algorithm better.
 
@@ -46,9 +48,15 @@ Email: schulz@eprover.org
 import unittest
 from idents import Ident
 from lexer import Token,Lexer
-from clausesets import ClauseSet, HeuristicClauseSet, IndexedClauseSet
+from terms import TermBank
+from unification import UnificationCache
+from indexing import DiscTreeResolutionIndex, ResolutionIndexes,\
+     FeatureVectorIndex, SubsumptionIndexes, UnitIndex
+from clausesets import ClauseSet, HeuristicClauseSet, IndexedClauseSet,\
+     PassiveSets, newPassiveSet, numpy
 import heuristics
-from rescontrol import computeAllResolvents, computeAllFactors
+from rescontrol import computeAllResolvents, computeAllFactors,\
+     computeAllResolventRecords, InferenceRecord
 from subsumption import forwardSubsumption, backwardSubsumption
 
 
@@ -62,7 +70,15 @@ class SearchParams(object):
                  delete_tautologies   = False,
                  forward_subsumption  = False,
                  backward_subsumption = False,
-                 literal_selection    = None):
+                 literal_selection    = None,
+                 term_sharing         = False,
+                 unif_cache_size      = 0,
+                 unif_cache_policy    = "lru",
+                 res_index            = DiscTreeResolutionIndex,
+                 sub_index            = FeatureVectorIndex,
+                 unit_conflicts       = False,
+                 passive_set          = newPassiveSet,
+                 inference_records    = False):
         """
         Initialize heuristic parameters.
         """
@@ -94,6 +110,58 @@ class SearchParams(object):
         literals from a set of negative literals (both represented as
         lists, not Python sets) as the inference literal.
         """
+        self.term_sharing = term_sharing
+        """
+        If True, all terms in the proof state are stored in a shared
+        term bank. This saves memory and makes term comparison and
+        weight computation cheaper, at the cost of maintaining the
+        bank.
+        """
+        self.unif_cache_size = unif_cache_size
+        """
+        If positive, the results of unification attempts between
+        resolution partners are memoized in a cache holding at most
+        this many entries. 0 disables the cache.
+        """
+        self.unif_cache_policy = unif_cache_policy
+        """
+        The eviction policy of the unification cache, either "lru" or
+        "fifo" (see UnificationCache).
+        """
+        self.res_index = res_index
+        """
+        The class implementing the resolution index of the processed
+        clauses, if indexing is used (see ResolutionIndexes in
+        indexing.py).
+        """
+        self.sub_index = sub_index
+        """
+        The class implementing the subsumption index of the processed
+        clauses, if indexing is used (see SubsumptionIndexes in
+        indexing.py).
+        """
+        self.unit_conflicts = unit_conflicts
+        """
+        If True, all unit clauses are indexed when they are generated,
+        and each new unit is checked against the indexed units with
+        complementary literals. If the two literals are unifiable, the
+        empty clause is derived right away, without waiting for it to
+        be selected for processing.
+        """
+        self.passive_set = passive_set
+        """
+        The class (or factory function) implementing the set of
+        unprocessed clauses (see PassiveSets in clausesets.py). By
+        default, a BucketClauseSet is used if all evaluation functions
+        allow it.
+        """
+        self.inference_records = inference_records
+        """
+        If True, resolvents are stored in the unprocessed clauses as
+        compact InferenceRecords, and only computed when they are
+        selected. Records with a parent that has been removed by
+        backward subsumption are discarded.
+        """
 
 
 
@@ -116,14 +184,42 @@ class ProofState(object):
         Initialize the proof state with a set of clauses.
         """
         self.params = params
-        self.unprocessed = HeuristicClauseSet(params.heuristics)
+        # The predefined heuristics are shared, so each proof state
+        # uses its own copy.
+        self.heuristics  = params.heuristics.copy()
+        self.unprocessed = params.passive_set(self.heuristics)
+        if params.term_sharing:
+            self.term_bank = TermBank()
+        else:
+            self.term_bank = None
+        if params.unif_cache_size > 0:
+            self.unif_cache = UnificationCache(params.unif_cache_size,
+                                               params.unif_cache_policy)
+        else:
+            self.unif_cache = None
+        if params.unit_conflicts:
+            self.unit_index = UnitIndex()
+        else:
+            self.unit_index = None
+        self.empty_clause = None
+        self.record_parents = {}
+        """
+        Map each parent of an inference record in the unprocessed set
+        to the number of such records.
+        """
+        self.deleted = set()
+        """
+        The clauses among record_parents that have been deleted from
+        the processed clauses.
+        """
 
         if indexed:
-            self.processed   = IndexedClauseSet()
+            self.processed   = IndexedClauseSet(res_index=params.res_index,
+                                                sub_index=params.sub_index)
         else:
             self.processed   = ClauseSet()
-        for c in clauses.clauses:
-            self.unprocessed.addClause(c)
+        self.heuristics.initialize(clauses.clauses)
+        self.addUnprocessedClauses(clauses.clauses)
         self.initial_clause_count = len(self.unprocessed)
         self.proc_clause_count    = 0
         self.factor_count         = 0
@@ -131,17 +227,122 @@ class ProofState(object):
         self.tautologies_deleted  = 0
         self.forward_subsumed     = 0
         self.backward_subsumed    = 0
+        self.records_materialized = 0
+        self.records_dropped      = 0
         self.silent               = silent
 
+    def addUnprocessed(self, clause):
+        """
+        Add a new clause to the unprocessed clauses, sharing its terms
+        first if term sharing is enabled.
+        """
+        self.prepareClause(clause)
+        if self.empty_clause == None:
+            self.unprocessed.addClause(clause)
+
+    def prepareClause(self, clause):
+        """
+        Share the terms of a new clause if term sharing is enabled,
+        and check it for unit conflicts if these are enabled.
+        """
+        if self.term_bank != None:
+            clause.shareTerms(self.term_bank)
+        if self.unit_index != None and self.empty_clause == None:
+            self.checkUnitConflict(clause)
+
+    def addRecord(self, record):
+        """
+        Add an inference record to the unprocessed clauses, counting
+        it for its parents.
+        """
+        for parent in record.getParents():
+            self.record_parents[parent] = \
+                self.record_parents.get(parent, 0)+1
+        self.unprocessed.addClause(record)
+
+    def releaseRecord(self, record):
+        """
+        Uncount an inference record taken from the unprocessed
+        clauses. Parents without any remaining records are forgotten,
+        so that deleted only holds clauses that still matter.
+        """
+        for parent in record.getParents():
+            count = self.record_parents[parent]-1
+            if count:
+                self.record_parents[parent] = count
+            else:
+                del self.record_parents[parent]
+                self.deleted.discard(parent)
+
+    def addUnprocessedClauses(self, clauses):
+        """
+        Add all clauses from the list clauses to the unprocessed
+        clauses in one step. This is used for the initial clause set.
+        """
+        if self.term_bank != None:
+            for clause in clauses:
+                clause.shareTerms(self.term_bank)
+        self.unprocessed.addClauses(clauses)
+        if self.unit_index != None:
+            for clause in clauses:
+                if self.empty_clause != None:
+                    break
+                self.checkUnitConflict(clause)
+
+    def checkUnitConflict(self, clause):
+        """
+        If clause is a unit clause, check if it conflicts with an
+        indexed unit clause, then index it. If the empty clause is
+        found (or clause is the empty clause itself), store it in
+        empty_clause.
+        """
+        if clause.isEmpty():
+            self.empty_clause = clause
+        elif clause.isUnit():
+            self.empty_clause = self.unit_index.findConflict(clause)
+            self.unit_index.insertClause(clause)
+            if self.empty_clause != None:
+                # The partner may still be unprocessed. As for given
+                # clauses, its evaluation is not part of the proof.
+                for parent in self.empty_clause.getParents():
+                    parent.evaluation = None
+
+    def removeUnits(self, clauses):
+        """
+        Remove the unit clauses among clauses (which have been deleted
+        from the proof state) from the unit index, so that the index
+        only grows with the units still in the proof state.
+        """
+        if self.unit_index != None:
+            for clause in clauses:
+                if clause.isUnit():
+                    self.unit_index.removeClause(clause)
+
     def processClause(self):
         """
         Pick a clause from unprocessed and process it. If the empty
         clause is found, return it. Otherwise return None.
         """
         given_clause = self.unprocessed.extractBest()
-        given_clause = given_clause.freshVarCopy()
         if not self.silent:
             print("#")
+        if isinstance(given_clause, InferenceRecord):
+            record = given_clause
+            dropped = any([parent in self.deleted
+                           for parent in record.getParents()])
+            self.releaseRecord(record)
+            if dropped:
+                self.records_dropped += 1
+                return None
+            given_clause = record.materialize()
+            self.records_materialized += 1
+            self.resolvent_count += 1
+            self.prepareClause(given_clause)
+            if self.empty_clause != None:
+                return self.empty_clause
+        # The evaluation is only needed for clause selection. Drop it,
+        # so that it does not show up in the trace or the proof.
+        given_clause.evaluation = None
         if given_clause.isEmpty():
             # We have found an explicit contradiction
             return given_clause
@@ -157,6 +358,7 @@ class ProofState(object):
             # the given clause. We do keep count of how many clauses
             # we have dropped this way.
             self.forward_subsumed += 1
+            self.removeUnits([given_clause])
             return None
 
         if self.params.backward_subsumption:
@@ -169,7 +371,15 @@ class ProofState(object):
             # smaller clauses, which tend to be more general (thus the
             # processed clauses are typically if not universally more
             # general than the new given clause).
-            tmp = backwardSubsumption(given_clause, self.processed)
+            removed = []
+            tmp = backwardSubsumption(given_clause, self.processed, removed)
+            if self.params.inference_records:
+                # Remember the removed clauses that are parents of
+                # inference records, so that these records can be
+                # discarded.
+                self.deleted.update([c for c in removed
+                                     if c in self.record_parents])
+            self.removeUnits(removed)
             self.backward_subsumed = self.backward_subsumed+tmp
 
         if(self.params.literal_selection):
@@ -179,16 +389,35 @@ class ProofState(object):
         new = []
         factors    = computeAllFactors(given_clause)
         new.extend(factors)
-        resolvents = computeAllResolvents(given_clause, self.processed)
+        if self.params.inference_records:
+            records = []
+            resolvents = []
+            for r in computeAllResolventRecords(given_clause,
+                                                self.processed,
+                                                self.unif_cache):
+                # Empty and unit resolvents are computed right away,
+                # since they are small and may end the search early.
+                if len(r) <= 1:
+                    resolvents.append(r.materialize())
+                else:
+                    records.append(r)
+        else:
+            resolvents = computeAllResolvents(given_clause, self.processed,
+                                              self.unif_cache)
+            records = []
         new.extend(resolvents)
         self.proc_clause_count = self.proc_clause_count+1
         self.factor_count = self.factor_count+len(factors)
+        # Records are only counted as resolvents once they are
+        # materialized.
         self.resolvent_count = self.resolvent_count+len(resolvents)
 
         self.processed.addClause(given_clause)
 
         for c in new:
-            self.unprocessed.addClause(c)
+            self.addUnprocessed(c)
+        for r in records:
+            self.addRecord(r)
         return None
 
     def saturate(self):
@@ -198,6 +427,8 @@ class ProofState(object):
         return None.
         """
         while self.unprocessed:
+            if self.empty_clause != None:
+                return self.empty_clause
             res = self.processClause()
             if res != None:
                 return res
@@ -209,7 +440,7 @@ class ProofState(object):
         Return the proof state statistics in string form ready for
         output.
         """
-        return """
+        res = """
 # Initial clauses    : %d
 # Processed clauses  : %d
 # Factors computed   : %d
@@ -224,6 +455,92 @@ class ProofState(object):
       self.tautologies_deleted,
       self.forward_subsumed,
       self.backward_subsumed)
+        if self.term_bank != None:
+            res = res + "\n# Shared terms       : %d"%(len(self.term_bank),)
+        if self.unif_cache != None:
+            res = res + """
+# Unif. cache hits   : %d
+# Unif. cache misses : %d
+# Unif. cache evicted: %d""" \
+    %(self.unif_cache.hits,
+      self.unif_cache.misses,
+      self.unif_cache.evictions)
+        if self.params.inference_records:
+            res = res + """
+# Records computed   : %d
+# Records discarded  : %d""" \
+    %(self.records_materialized,
+      self.records_dropped)
+        res = res + "\n# Clause evaluations : %d (%d deferred)"\
+              %(self.unprocessed.eval_count, self.unprocessed.eval_deferred)
+        for (name, calls, time) in self.evalStatistics():
+            res = res + "\n# %-19s: %d calls, %.3f s"\
+                  %("Eval. "+name, calls, time)
+        stats = self.processed.stats
+        for (label, counter, success) in \
+                [("Res.", stats.resolution, "unifiers"),
+                 ("Fwd. subs.", stats.subsuming, "successes"),
+                 ("Bwd. subs.", stats.subsumed, "successes")]:
+            if counter.queries:
+                res = res + """
+# %-19s: %d queries, %d candidates, %d %s (%.1f%%)
+# %-19s: %.3f s retrieval, %.3f s checking""" \
+    %(label+" index", counter.queries, counter.candidates,
+      counter.successes, success, 100*counter.successRate(),
+      label+" time", counter.retrieval_time, counter.check_time)
+        if isinstance(self.processed, IndexedClauseSet):
+            # The memory estimate walks the whole index, so it is only
+            # computed if there is one.
+            objects, size = self.processed.memoryUsage()
+            res = res + "\n# Index size         : %d objects, %d bytes"\
+                  %(objects, size)
+        return res
+
+    def evalStatistics(self):
+        """
+        Return a list of triples (name, calls, time) with the number
+        of calls of each evaluation function of the heuristic in this
+        proof search, and the time spent in them.
+        """
+        return [(f.name, f.eval_calls, f.eval_time)
+                for f in self.heuristics.eval_funs]
+
+    def statisticsDict(self):
+        """
+        Return the proof state statistics (including the retrieval
+        statistics of the processed clauses) as a dictionary, for
+        machine-readable output.
+        """
+        objects, size = self.processed.memoryUsage()
+        res = {"initial_clauses"     : self.initial_clause_count,
+               "processed_clauses"   : self.proc_clause_count,
+               "factors"             : self.factor_count,
+               "resolvents"          : self.resolvent_count,
+               "tautologies_deleted" : self.tautologies_deleted,
+               "forward_subsumed"    : self.forward_subsumed,
+               "backward_subsumed"   : self.backward_subsumed,
+               "evaluations"         : self.unprocessed.eval_count,
+               "eval_functions"      : [{"name" : name,
+                                         "calls": calls,
+                                         "time" : time}
+                                        for (name, calls, time)
+                                        in self.evalStatistics()],
+               "deferred_evaluations": self.unprocessed.eval_deferred,
+               "indexed"             : isinstance(self.processed,
+                                                  IndexedClauseSet),
+               "retrieval"           : self.processed.stats.asDict(),
+               "index_objects"       : objects,
+               "index_bytes"         : size}
+        if self.term_bank != None:
+            res["shared_terms"] = len(self.term_bank)
+        if self.params.inference_records:
+            res["records_computed"]  = self.records_materialized
+            res["records_discarded"] = self.records_dropped
+        if self.unif_cache != None:
+            res["unif_cache"] = {"hits"      : self.unif_cache.hits,
+                                 "misses"    : self.unif_cache.misses,
+                                 "evictions" : self.unif_cache.evictions}
+        return res
 
 
 class TestProver(unittest.TestCase):
@@ -334,7 +651,7 @@ cnf(taut, axiom, p(X)|~p(X)).
 cnf(not_p, axiom, ~p(a)).
 """
 
-    def evalSatResult(self, spec, provable):
+    def evalSatResult(self, spec, provable, indexed=False):
         """
         Evaluate the result of a saturation compared to the expected
         result.
@@ -344,7 +661,7 @@ cnf(not_p, axiom, ~p(a)).
         problem = ClauseSet()
         problem.parse(lex)
 
-        prover = ProofState(self.params, problem)
+        prover = ProofState(self.params, problem, indexed=indexed)
         res = prover.saturate()
 
         if provable:
@@ -370,6 +687,182 @@ cnf(not_p, axiom, ~p(a)).
         self.evalSatResult(self.spec2, True)
         self.evalSatResult(self.spec3, False)
 
+    def testIndexedSaturation(self):
+        """
+        Test that saturation works with all resolution and subsumption
+        indices.
+        """
+        self.params.forward_subsumption  = True
+        self.params.backward_subsumption = True
+        for index in ResolutionIndexes.values():
+            self.params.res_index = index
+            self.evalSatResult(self.spec1, True, True)
+            self.evalSatResult(self.spec2, True, True)
+            self.evalSatResult(self.spec3, False, True)
+        for index in SubsumptionIndexes.values():
+            self.params.sub_index = index
+            self.evalSatResult(self.spec1, True, True)
+            self.evalSatResult(self.spec2, True, True)
+            self.evalSatResult(self.spec3, False, True)
+
+    def testTermSharing(self):
+        """
+        Test that saturation works with shared terms.
+        """
+        self.params.term_sharing = True
+        self.evalSatResult(self.spec1, True)
+        self.evalSatResult(self.spec2, True)
+        self.evalSatResult(self.spec3, False)
+
+    def testUnifCache(self):
+        """
+        Test that saturation works with a (small) unification cache.
+        """
+        for policy in ["lru", "fifo"]:
+            self.params.unif_cache_size   = 10
+            self.params.unif_cache_policy = policy
+            self.evalSatResult(self.spec1, True)
+            self.evalSatResult(self.spec2, True)
+            self.evalSatResult(self.spec3, False)
+
+
+    def testUnitConflicts(self):
+        """
+        Test that saturation works with early detection of
+        conflicting units, and that this can shorten the search.
+        """
+        self.params.unit_conflicts = True
+        self.evalSatResult(self.spec1, True)
+        self.evalSatResult(self.spec2, True)
+        self.evalSatResult(self.spec3, False)
+
+        lex = Lexer("""
+cnf(c1,axiom,p(X)|q(X)).
+cnf(c2,axiom,~p(a)).
+cnf(c3,axiom,r(b)|s(b)).
+cnf(c4,axiom,~r(Y)|s(Y)).
+cnf(c5,axiom,~s(Z)|t(Z)).
+cnf(c6,axiom,~q(a)).
+""")
+        problem = ClauseSet()
+        problem.parse(lex)
+        prover = ProofState(self.params, problem)
+        res = prover.saturate()
+        self.assertTrue(res.isEmpty())
+        # The resolvent q(a) of c1 and c2 conflicts with ~q(a) as soon
+        # as it is generated.
+        self.assertTrue(prover.proc_clause_count < len(problem))
+        # Heuristic evaluations are not part of the proof.
+        for c in res.orderedDerivation():
+            self.assertTrue(not "/*" in repr(c))
+        for c in prover.processed.clauses:
+            self.assertEqual(c.evaluation, None)
+
+        # Units deleted by subsumption are removed from the unit index.
+        self.params.forward_subsumption  = True
+        self.params.backward_subsumption = True
+        lex = Lexer("""
+cnf(c1,axiom,p(a)).
+cnf(c2,axiom,p(X)).
+cnf(c3,axiom,p(b)).
+""")
+        problem = ClauseSet()
+        problem.parse(lex)
+        prover = ProofState(self.params, problem)
+        self.assertEqual(prover.saturate(), None)
+        units = prover.unit_index.pos_idx.getUnifiable("X")
+        self.assertEqual(len(units), 1)
+        self.assertTrue(units[0] in prover.processed.clauses)
+
+    @unittest.skipUnless(numpy, "NumPy is not available")
+    def testColumnarPassiveSet(self):
+        """
+        Test that saturation works with the columnar passive set.
+        """
+        self.params.passive_set = PassiveSets["columnar"]
+        self.evalSatResult(self.spec1, True)
+        self.evalSatResult(self.spec2, True)
+        self.evalSatResult(self.spec3, False)
+
+    def testLazyPassiveSet(self):
+        """
+        Test that deferring evaluations does not change the proof
+        search, but saves evaluations.
+        """
+        counts = []
+        for name in ["heap", "lazy"]:
+            self.params.passive_set = PassiveSets[name]
+            # Use a fresh evaluation scheme, so that both searches
+            # start in the same state.
+            self.params.heuristics = heuristics.EvalStructure(
+                [(heuristics.SymbolCountEvaluation(2,1),5),
+                 (heuristics.FIFOEvaluation(),1)])
+            lex = Lexer(self.spec2)
+            problem = ClauseSet()
+            problem.parse(lex)
+            prover = ProofState(self.params, problem)
+            self.assertNotEqual(prover.saturate(), None)
+            stats = prover.statisticsDict()
+            counts.append((prover.proc_clause_count,
+                           prover.resolvent_count,
+                           stats["evaluations"]+stats["deferred_evaluations"]))
+            evaluations = stats["evaluations"]
+        self.assertEqual(counts[0], counts[1])
+        self.assertTrue(evaluations < counts[0][2])
+
+    def testInferenceRecords(self):
+        """
+        Test that saturation works with inference records, also
+        together with subsumption and unit conflicts, and that only
+        deleted parents of pending records are remembered.
+        """
+        self.params.inference_records    = True
+        self.params.forward_subsumption  = True
+        self.params.backward_subsumption = True
+        for unit_conflicts in [False, True]:
+            self.params.unit_conflicts = unit_conflicts
+            self.evalSatResult(self.spec1, True)
+            self.evalSatResult(self.spec2, True)
+            self.evalSatResult(self.spec3, False)
+
+            lex = Lexer(self.spec2)
+            problem = ClauseSet()
+            problem.parse(lex)
+            prover = ProofState(self.params, problem)
+            self.assertNotEqual(prover.saturate(), None)
+            self.assertTrue(prover.deleted <= set(prover.record_parents))
+            # Pending and discarded records are not counted as
+            # resolvents.
+            pending = [c for c in prover.unprocessed.clauses
+                       if isinstance(c, InferenceRecord)]
+            stats = prover.processed.stats.resolution
+            self.assertEqual(stats.successes,
+                             prover.resolvent_count+len(pending)+
+                             prover.records_dropped)
+
+    def testStatistics(self):
+        """
+        Test that the retrieval statistics are collected for plain and
+        indexed processed clause sets.
+        """
+        self.params.forward_subsumption  = True
+        self.params.backward_subsumption = True
+        for indexed in [False, True]:
+            lex = Lexer(self.spec1)
+            problem = ClauseSet()
+            problem.parse(lex)
+            prover = ProofState(self.params, problem, indexed=indexed)
+            prover.saturate()
+            stats = prover.statisticsDict()
+            self.assertEqual(stats["indexed"], indexed)
+            self.assertEqual("Index size" in prover.statisticsStr(),
+                             indexed)
+            res = stats["retrieval"]["resolution"]
+            self.assertEqual(res["successes"], prover.resolvent_count)
+            self.assertTrue(res["candidates"] >= res["successes"])
+            fwd = stats["retrieval"]["subsuming"]
+            self.assertEqual(fwd["successes"], prover.forward_subsumed)
+            self.assertTrue(stats["index_bytes"] > 0)
 
     def testParamSet(self):
         """
@@ -380,6 +873,9 @@ cnf(not_p, axiom, ~p(a)).
         self.assertEqual(pm.delete_tautologies,   False)
         self.assertEqual(pm.forward_subsumption,  False)
         self.assertEqual(pm.backward_subsumption, False)
+        self.assertEqual(pm.term_sharing,         False)
+        self.assertEqual(pm.unif_cache_size,      0)
+        self.assertEqual(pm.unit_conflicts,       False)
 
 if __name__ == '__main__':
     unittest.main()
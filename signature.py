@@ -24,6 +24,20 @@ A signature is a triple (F,P,ar), with the following properties:
   number (the "arity") with each function symbol and predicate
   symbols.
 
+In addition to describing a language, a signature can act as a symbol
+table. Each pair of symbol and arity interned into the table receives
+a small, dense integer id (in order of first occurance), and all
+occurances of the symbol share a single canonical string object. A
+name used with several arities yields several symbols (with different
+ids), and is recorded as overloaded. The parser interns all function
+and predicate symbols into the global symbol table globalSig, which
+can be reset with resetSymbolTable() before reading a new problem.
+Terms still store the symbol names, not the ids. Since the names are
+shared, comparing two equal symbols reduces to an identity check, and
+hashing them (e.g. as index keys) reuses the cached hash of a single
+string. The ids allow other modules to build arrays indexed by
+symbols.
+
 
 Copyright 2012-2019 Stephan Schulz, schulz@eprover.org
 
@@ -52,6 +66,7 @@ Email: schulz@eprover.org
 """
 
 import unittest
+import sys
 
 class Signature(object):
     """
@@ -64,6 +79,10 @@ class Signature(object):
         """
         self.funs  = {}
         self.preds = {}
+        self.symbol_ids = {}
+        self.symbols    = []
+        self.arities    = []
+        self.overloaded = set()
 
     def __repr__(self):
         """
@@ -118,6 +137,85 @@ class Signature(object):
             return self.funs[symbol]
         return self.preds[symbol]
 
+    def internSymbol(self, symbol, arity):
+        """
+        Intern the symbol with the given arity into the symbol table
+        and return the canonical string object representing it. If the
+        pair is new, it receives the next free id. If the symbol is
+        already known with a different arity, it is recorded as
+        overloaded.
+        """
+        try:
+            id = self.symbol_ids[(symbol, arity)]
+        except KeyError:
+            id = len(self.symbols)
+            symbol = sys.intern(symbol)
+            if symbol in self.symbols:
+                self.overloaded.add(symbol)
+            self.symbol_ids[(symbol, arity)] = id
+            self.symbols.append(symbol)
+            self.arities.append(arity)
+            return symbol
+        return self.symbols[id]
+
+    def isOverloaded(self, symbol):
+        """
+        Return True if symbol has been interned with different
+        arities.
+        """
+        return symbol in self.overloaded
+
+    def getSymbolId(self, symbol, arity):
+        """
+        Return the integer id of an interned symbol with the given
+        arity.
+        """
+        return self.symbol_ids[(symbol, arity)]
+
+    def getSymbolName(self, id):
+        """
+        Return the (canonical) name of the symbol with the given id.
+        """
+        return self.symbols[id]
+
+    def getSymbolArity(self, id):
+        """
+        Return the arity of the symbol with the given id.
+        """
+        return self.arities[id]
+
+    def symbolCount(self):
+        """
+        Return the number of interned symbols. All symbol ids are
+        smaller than this number.
+        """
+        return len(self.symbols)
+
+
+globalSig = Signature()
+"""
+The global symbol table. All symbols read by the parser are interned
+here.
+"""
+
+
+def internSymbol(symbol, arity):
+    """
+    Convenience function: Intern symbol into the global symbol table
+    and return its canonical representation.
+    """
+    return globalSig.internSymbol(symbol, arity)
+
+
+def resetSymbolTable():
+    """
+    Start a new, empty global symbol table, so that the table does not
+    grow across problems. Terms created before remain valid, since
+    they only contain the (interned) names, but old ids may be reused.
+    """
+    global globalSig
+    globalSig = Signature()
+
 
 
 class TestSignature(unittest.TestCase):
@@ -148,6 +246,38 @@ class TestSignature(unittest.TestCase):
         self.assertEqual(sig.getArity("a"),0)
         self.assertEqual(sig.getArity("weird"),4)
 
+    def testSymbolTable(self):
+        """
+        Test interning of symbols.
+        """
+        sig = Signature()
+        f1 = sig.internSymbol("".join(["f", "oo"]), 2)
+        f2 = sig.internSymbol("".join(["fo", "o"]), 2)
+        a  = sig.internSymbol("a", 0)
+        self.assertTrue(f1 is f2)
+        self.assertEqual(sig.symbolCount(), 2)
+        self.assertEqual(sig.getSymbolId(f1, 2), 0)
+        self.assertEqual(sig.getSymbolId("a", 0), 1)
+        self.assertEqual(sig.getSymbolName(0), "foo")
+        self.assertTrue(sig.getSymbolName(1) is a)
+        self.assertEqual(sig.getSymbolArity(0), 2)
+        self.assertEqual(sig.getSymbolArity(1), 0)
+        self.assertFalse(sig.isOverloaded("foo"))
+
+        f3 = sig.internSymbol("foo", 1)
+        self.assertTrue(f3 is f1)
+        self.assertTrue(sig.isOverloaded("foo"))
+        self.assertEqual(sig.getSymbolId("foo", 1), 2)
+        self.assertEqual(sig.getSymbolArity(2), 1)
+
+        g = internSymbol("".join(["g", "lobal"]), 3)
+        self.assertTrue(internSymbol("global", 3) is g)
+        self.assertEqual(globalSig.getSymbolName(
+            globalSig.getSymbolId(g, 3)), g)
+        resetSymbolTable()
+        self.assertEqual(globalSig.symbolCount(), 0)
+        self.assertTrue(internSymbol("global", 3) is g)
+
 
 if __name__ == '__main__':
     unittest.main()
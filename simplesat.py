@@ -69,7 +69,6 @@ class SimpleProofState(object):
         clause is found, return it. Otherwise return None.
         """
         given_clause = self.unprocessed.extractFirst()
-        given_clause = given_clause.freshVarCopy()
         print("#", given_clause)
         if given_clause.isEmpty():
             # We have found an explicit contradiction
@@ -79,7 +79,8 @@ class Substitution(object):
         Return a print representation of the substitution.
         """
         return "{"+\
-               ",".join([i+"<-"+terms.term2String(self.subst[i])
+               ",".join([terms.term2String(i)+"<-"+
+                         terms.term2String(self.subst[i])
                          for i in self.subst])\
                          +"}"
 
@@ -116,15 +117,25 @@ class Substitution(object):
 
     def apply(self, term):
         """
-        Apply the substitution to a term. Return the result.
+        Apply the substitution to a term. Return the result. Subterms
+        that are not changed by the substitution are not copied, i.e.
+        the result shares them with the original term.
         """
         if terms.termIsVar(term):
             return self.value(term)
-        else:
-            res  = [term[0]]
-            args = [self.apply(x) for x in terms.termArgs(term)]
-            res.extend(args)
+        if type(term) is terms.BankTerm and \
+           (term.ground or term.vars.isdisjoint(self.subst)):
+            return term
+        res  = [term[0]]
+        changed = False
+        for i in range(1, len(term)):
+            arg = self.apply(term[i])
+            if arg is not term[i]:
+                changed = True
+            res.append(arg)
+        if changed:
             return res
+        return term
 
     def modifyBinding(self, binding):
         """
@@ -229,6 +240,289 @@ class BTSubst(Substitution):
              "You cannot compose backtrackable substitutions."
 
 
+class ArrayBTSubst(object):
+   """
+   A backtrackable substitution for integer variables (as used in
+   normalized clauses), optimized for repeated use in matching. It
+   offers the interface of BTSubst needed for matching (value(),
+   apply(), isBound(), addBinding(), and backtracking), but does not
+   derive from it, since it has no dictionary of bindings and
+   supports neither modifyBinding() nor composeBinding():
+   self.values is a list indexed by variables, holding the bound term
+   (or None for unbound variables).
+   self.trail is the list of bound variables in order of binding.
+   self.origins is a list parallel to self.values. For bindings made
+   by flatMatch() it holds the flatterm and position the bound term
+   was taken from, so that later comparisons can use the flat
+   representation. Entries are only trusted if the term at that
+   position is still identical to the binding, so they need not be
+   cleared on backtracking.
+   The state of the substitution is just the length of the trail, and
+   reset() undoes all bindings in time proportional to their
+   number. Hence a single object can be reused for many matching
+   attempts (e.g. a complete forward-subsumption sweep) without
+   allocating new substitutions.
+   """
+   def __init__(self, size = 0):
+      """
+      Initialize an empty substitution with room for variables 0,
+      ..., size-1.
+      """
+      self.values  = [None]*size
+      self.origins = [None]*size
+      self.trail   = []
+
+   def __repr__(self):
+      """
+      Return a print representation of the substitution.
+      """
+      return "{"+\
+             ",".join([terms.term2String(v)+"<-"+
+                       terms.term2String(self.values[v])
+                       for v in self.trail])\
+                       +"}"
+
+   def __call__(self, term):
+      """
+      Pretty synonym for apply() allowing us to use substitutions as
+      functions.
+      """
+      return self.apply(term)
+
+   def reserve(self, size):
+      """
+      Make sure that there is room for variables 0, ..., size-1.
+      """
+      if len(self.values) < size:
+         self.origins.extend([None]*(size-len(self.values)))
+         self.values.extend([None]*(size-len(self.values)))
+
+   def copy(self):
+      """
+      Return a copy of the substitution.
+      """
+      res = ArrayBTSubst()
+      res.values  = list(self.values)
+      res.origins = list(self.origins)
+      res.trail   = list(self.trail)
+      return res
+
+   def value(self, var):
+      """
+      Return the value of a variable (i.e. the term it is bound to,
+      or the variable itself if it is not bound).
+      """
+      if var < len(self.values):
+         res = self.values[var]
+         if res is not None:
+            return res
+      return var
+
+   def apply(self, term):
+      """
+      Apply the substitution to a term. Return the result. Unchanged
+      subterms are shared as in Substitution.apply().
+      """
+      if terms.termIsVar(term):
+         return self.value(term)
+      if type(term) is terms.BankTerm and term.ground:
+         return term
+      res  = [term[0]]
+      changed = False
+      for i in range(1, len(term)):
+         arg = self.apply(term[i])
+         if arg is not term[i]:
+            changed = True
+         res.append(arg)
+      if changed:
+         return res
+      return term
+
+   def isBound(self, var):
+      """
+      Return True if var is bound in self, false otherwise.
+      """
+      return self.values[var] is not None
+
+   def getState(self):
+      """
+      Return a state to which this substitution can be backtracked
+      later.
+      """
+      return len(self.trail)
+
+   def backtrack(self):
+      """
+      Backtrack a single binding (if there is one). Return success or
+      failure.
+      """
+      if self.trail:
+         self.values[self.trail.pop()] = None
+         return True
+      else:
+         return False
+
+   def backtrackToState(self, bt_state):
+      """
+      Backtrack to the given state. Return number of binding
+      retracted.
+      """
+      trail  = self.trail
+      values = self.values
+      res = len(trail)-bt_state
+      while len(trail) > bt_state:
+         values[trail.pop()] = None
+      return res
+
+   def reset(self):
+      """
+      Remove all bindings.
+      """
+      self.backtrackToState(0)
+
+   def addBinding(self, binding):
+      """
+      Add a single binding to the substitution.
+      """
+      var, term = binding
+      self.values[var] = term
+      self.trail.append(var)
+
+
+class TriangularSubst(Substitution):
+    """
+    A substitution in triangular form: Variables may be bound to terms
+    that contain other bound variables. Bindings are never applied to
+    each other. Instead, variables are dereferenced lazily whenever
+    the substitution is applied to a term. This makes adding a binding
+    an O(1) operation, and the work of fully instantiating terms is
+    only done for the terms the substitution is actually applied to.
+
+    Triangular substitutions also support renaming apart by
+    offsets. Clauses use variables numbered 0, 1, ..., n-1 (see
+    clauses.py). To make the variables of two clauses disjoint, the
+    variables of the second clause are shifted by an offset (the
+    number of variables of the first clause). This shift is never
+    applied to the clause. Instead, every term is paired with the
+    offset of the clause it comes from, and the shift is applied to
+    variables only when they are looked up. Bindings therefore map
+    (shifted) variables to pairs (term, offset). Terms with string
+    variables always use offset 0.
+
+    The bindings must be acyclic (which is guaranteed by the
+    occurs-check in unification).
+    """
+    def __init__(self, init = []):
+        """
+        Initialize. The optional argument is a list of variable/term
+        pairs representing the initial (triangular) binding.
+        """
+        Substitution.__init__(self)
+        for var, term in init:
+            self.addBinding((var, term))
+
+    def __repr__(self):
+        """
+        Return a print representation of the solved form of the
+        substitution.
+        """
+        return repr(self.solved())
+
+    def copy(self):
+        """
+        Return a (flat) copy of the substitution.
+        """
+        res = TriangularSubst()
+        res.subst = dict(self.subst)
+        return res
+
+    def deref(self, term, offset=0):
+        """
+        Follow the chain of bindings starting at term (with variables
+        shifted by offset) until reaching a compound term or an
+        unbound variable. Return the pair (term, offset) reached. For
+        an unbound variable, the returned variable is already shifted,
+        and the offset is 0. Only integer variables can be shifted.
+        """
+        while terms.termIsVar(term):
+            if offset:
+                assert type(term) is int, \
+                    "Variable %s cannot be shifted by an offset" % (term,)
+                term = term+offset
+            try:
+                term, offset = self.subst[term]
+            except KeyError:
+                return term, 0
+        return term, offset
+
+    def value(self, var):
+        """
+        Return the value of a variable (i.e. the fully instantiated
+        term it is bound to, or the variable itself if it is not
+        bound).
+        """
+        return self.apply(var)
+
+    def apply(self, term, offset=0, renaming=None):
+        """
+        Apply the substitution to a term, whose variables are shifted
+        by offset. Return the result. If renaming is given, it is a
+        dictionary used to rename all variables in the result to
+        integers 0, 1, ... in order of first occurance (see
+        Clause.__init__()). Shared renamings can be used to normalize
+        a sequence of terms. Subterms that are not changed (in
+        particular ground subterms) are not copied, but shared
+        between the original term and the result.
+        """
+        term, offset = self.deref(term, offset)
+        if terms.termIsVar(term):
+            if renaming == None:
+                return term
+            try:
+                return renaming[term]
+            except KeyError:
+                res = len(renaming)
+                renaming[term] = res
+                return res
+        if type(term) is terms.BankTerm and term.ground:
+            return term
+        res  = [term[0]]
+        changed = False
+        for i in range(1, len(term)):
+            arg = self.apply(term[i], offset, renaming)
+            if arg is not term[i]:
+                changed = True
+            res.append(arg)
+        if changed:
+            return res
+        return term
+
+    def addBinding(self, binding, offset=0):
+        """
+        Add a single binding to the substitution. The variable must
+        not be bound already. The variables of the term are shifted
+        by offset.
+        """
+        var, term = binding
+        assert not var in self.subst
+        self.subst[var] = (term, offset)
+
+    def composeBinding(self, binding):
+        """
+        Composition with a new binding is just adding it, since
+        bindings are dereferenced lazily. The variable must be unbound
+        in self.
+        """
+        self.addBinding(binding)
+
+    def solved(self):
+        """
+        Return an equivalent, fully expanded (conventional)
+        substitution.
+        """
+        return Substitution([(var, self.apply(var)) for var in self.subst])
+
+
 def freshVar():
     """
     Return a fresh variable. Note that this is not guaranteed to be
@@ -296,6 +590,26 @@ class TestSubst(unittest.TestCase):
         self.assertTrue(terms.termEqual(self.sigma2(self.t1),  self.t5))
 
 
+    def testSharing(self):
+        """
+        Test that unchanged subterms are shared between a term and
+        its instance.
+        """
+        t = terms.string2Term("f(X, g(a, h(b)), g(Y))")
+        sigma = Substitution([("X", self.t2)])
+        s = sigma(t)
+        self.assertEqual(terms.term2String(s), "f(a,g(a,h(b)),g(Y))")
+        self.assertTrue(s[2] is t[2])
+        self.assertTrue(s[3] is t[3])
+        self.assertTrue(Substitution([("Z", self.t2)])(t) is t)
+
+        tau = TriangularSubst([("Y", self.t3)])
+        s = tau(t)
+        self.assertTrue(s[1] is t[1])
+        self.assertTrue(s[2] is t[2])
+        self.assertTrue(tau(t[2]) is t[2])
+        self.assertTrue(tau.apply(t[2], 0, {}) is t[2])
+
     def testFreshVarSubst(self):
         """
         Test that
@@ -310,6 +624,81 @@ class TestSubst(unittest.TestCase):
         shared = set(vars).intersection(set(vars2))
         self.assertTrue(not shared)
 
+    def testTriangular(self):
+        """
+        Test triangular substitutions.
+        """
+        sigma = TriangularSubst([("X", terms.string2Term("g(Y)"))])
+        sigma.addBinding(("Y", terms.string2Term("f(Z)")))
+        sigma.composeBinding(("Z", self.t2))
+        self.assertEqual(terms.term2String(sigma(self.t1)),
+                         "f(g(f(a)),g(f(a)))")
+        self.assertEqual(terms.term2String(sigma("X")), "g(f(a))")
+        self.assertEqual(terms.term2String(sigma("U")), "U")
+        t, offset = sigma.deref("Y")
+        self.assertTrue(terms.termEqual(t, terms.string2Term("f(Z)")))
+        self.assertEqual(offset, 0)
+        tau = sigma.solved()
+        self.assertTrue(not isinstance(tau, TriangularSubst))
+        self.assertTrue(terms.termEqual(tau(self.t1), sigma(self.t1)))
+        self.assertEqual(repr(tau), repr(sigma))
+        rho = sigma.copy()
+        rho.addBinding(("U", self.t3))
+        self.assertTrue(not sigma.isBound("U"))
+        self.assertTrue(rho.isBound("U"))
+
+    def testOffsets(self):
+        """
+        Test triangular substitutions with variable offsets and
+        renaming.
+        """
+        t1 = terms.string2Term("f(a,g(b))")
+        t1[1] = 0
+        t1[2][1] = 1
+        # t1 = f(X0, g(X1))
+        sigma = TriangularSubst()
+        # Bind X0 (offset 0) to g(X1) with X1 from a clause at offset
+        # 2, i.e. to g(X3)
+        sigma.addBinding((0, ["g", 1]), 2)
+        sigma.addBinding((3, self.t2))
+        self.assertEqual(terms.term2String(sigma(t1)), "f(g(a),g(X1))")
+        self.assertEqual(terms.term2String(sigma.apply(t1, 2)),
+                         "f(X2,g(a))")
+        renaming = {}
+        t = sigma.apply(t1, 2, renaming)
+        self.assertEqual(terms.term2String(t), "f(X0,g(a))")
+        t = sigma.apply(t1, 0, renaming)
+        self.assertEqual(terms.term2String(t), "f(g(a),g(X1))")
+        self.assertEqual(len(renaming), 2)
+        self.assertRaises(AssertionError, sigma.deref, "X", 2)
+
+    def testArrayBacktrack(self):
+        """
+        Test backtracking and reuse of array substitutions.
+        """
+        sigma = ArrayBTSubst(2)
+        sigma.reserve(3)
+        t = ["f", 0, ["g", 2]]
+        state = sigma.getState()
+        sigma.addBinding((0, self.t2))
+        self.assertTrue(sigma.isBound(0))
+        self.assertTrue(not sigma.isBound(2))
+        sigma.addBinding((2, self.t3))
+        self.assertEqual(terms.term2String(sigma(t)), "f(a,g(b))")
+        self.assertEqual(sigma.backtrackToState(state), 2)
+        self.assertTrue(not sigma.isBound(0))
+        self.assertTrue(sigma(t) is t)
+        sigma.addBinding((2, self.t2))
+        self.assertEqual(terms.term2String(sigma(t)), "f(X0,g(a))")
+        sigma.reset()
+        self.assertEqual(sigma.getState(), 0)
+        self.assertTrue(not sigma.backtrack())
+        bank = terms.TermBank()
+        s = bank.insert(t)
+        sigma.addBinding((0, self.t3))
+        self.assertEqual(terms.term2String(sigma(s)), "f(b,g(X2))")
+        self.assertEqual(terms.term2String(sigma(["h", 7])), "h(X7)")
+
     def testBacktrack(self):
         """
         Test backtrackable substitutions.
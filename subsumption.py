@@ -46,8 +46,9 @@ Email: schulz@eprover.org
 """
 
 import unittest
+from time import perf_counter
 from lexer import Lexer
-from substitutions import BTSubst
+from substitutions import BTSubst, ArrayBTSubst
 from matching import match
 from literals import Literal
 from clauses import Clause, parseClause
@@ -69,40 +70,83 @@ def subsumeLitLists(subsumer, subsumed, subst):
         subst.backtrackToState(btstate)
     return False
 
-def subsumes(subsumer, subsumed):
+def groundSubsumes(subsumer, subsumed):
     """
-    Return True if subsumer subsumes subsumed, False otherwise.
+    Return True if the ground clause subsumer subsumes subsumed. A
+    ground literal only matches an identical literal, so this is just
+    multiset inclusion of the literals, which we check on their
+    (hashed) keys.
+    """
+    available = subsumed.literalKeyCounts()
+    if len(subsumer) == 1:
+        return subsumer.literals[0].key() in available
+    for key, count in subsumer.literalKeyCounts().items():
+        if available.get(key, 0) < count:
+            return False
+    return True
+
+
+def subsumes(subsumer, subsumed, subst=None):
+    """
+    Return True if subsumer subsumes subsumed, False otherwise. If
+    subst is given, it is an empty ArrayBTSubst that is used for the
+    matching attempts (and is empty again on return). This allows
+    callers to reuse a single substitution for many subsumption
+    tests.
     """
     if len(subsumer) > len(subsumed):
         return False
-    subst = BTSubst()
+    if subsumer.ground:
+        return groundSubsumes(subsumer, subsumed)
+    if subst == None:
+        subst = ArrayBTSubst(subsumer.var_count)
+    else:
+        subst.reserve(subsumer.var_count)
     subsumer_list = subsumer.literals
     subsumed_list = subsumed.literals
-    return subsumeLitLists(subsumer_list, subsumed_list, subst)
+    res = subsumeLitLists(subsumer_list, subsumed_list, subst)
+    subst.reset()
+    return res
 
 def forwardSubsumption(set, clause):
     """
     Return True if any clause from set subsumes clause, False otherwise.
     """
+    start = perf_counter()
     candidates = set.getSubsumingCandidates(clause)
+    retrieved = perf_counter()
+    subst = ArrayBTSubst()
+    res = False
     for c in candidates:
-        if subsumes(c, clause):
-            return True
-    return False
+        if subsumes(c, clause, subst):
+            res = True
+            break
+    set.stats.subsuming.record(len(candidates), int(res),
+                               retrieved-start, perf_counter()-retrieved)
+    return res
 
 
-def backwardSubsumption(clause, set):
+def backwardSubsumption(clause, set, removed=None):
     """
-    Remove all clauses that are subsumed by clause from set.
+    Remove all clauses that are subsumed by clause from set. Return
+    the number of removed clauses. If removed is a list, the removed
+    clauses are appended to it.
     """
+    start = perf_counter()
     candidates = set.getSubsumedCandidates(clause)
+    retrieved = perf_counter()
     subsumed_set = []
+    subst = ArrayBTSubst(clause.var_count)
     for c in candidates:
-        if subsumes(clause, c):
+        if subsumes(clause, c, subst):
             subsumed_set.append(c)
     res = len(subsumed_set)
+    set.stats.subsumed.record(len(candidates), res,
+                              retrieved-start, perf_counter()-retrieved)
     for c in subsumed_set:
         set.extractClause(c)
+    if removed != None:
+        removed.extend(subsumed_set)
     return res
 
 
@@ -182,6 +226,37 @@ cnf(axiom, c7, Y=Y).
         res = subsumes(self.c6, self.c7)
         self.assertTrue(res)
 
+    def testSharedSubst(self):
+        """
+        Test that one substitution can be reused for many subsumption
+        tests.
+        """
+        cls = [self.c1, self.c2, self.c3, self.c4, self.c5, self.c6, self.c7]
+        subst = ArrayBTSubst()
+        for c in cls:
+            for d in cls:
+                self.assertEqual(subsumes(c, d, subst), subsumes(c, d))
+                self.assertEqual(subst.getState(), 0)
+
+    def testGroundSubsumption(self):
+        """
+        Test subsumption by ground clauses.
+        """
+        lex = Lexer("""
+cnf(g1,axiom,p(a)|p(a)|q(b)).
+cnf(g2,axiom,q(b)|p(a)).
+cnf(g3,axiom,p(a)|q(b)|p(a)|p(X)).
+""")
+        g1 = parseClause(lex)
+        g2 = parseClause(lex)
+        g3 = parseClause(lex)
+        self.assertTrue(g1.ground)
+        self.assertTrue(subsumes(g2, g1))
+        self.assertTrue(not subsumes(g1, g2))
+        self.assertTrue(subsumes(g1, g3))
+        self.assertTrue(subsumes(g2, g3))
+        self.assertTrue(not subsumes(g3, g1))
+
     def testSetSubsumption(self):
         """
         Test set subsumption.
@@ -189,8 +264,12 @@ cnf(axiom, c7, Y=Y).
         self.assertTrue(not forwardSubsumption(self.cset, self.c1))
         self.assertTrue(forwardSubsumption(self.cset, self.c2))
 
-        tmp = backwardSubsumption(self.c1, self.cset)
+        removed = []
+        tmp = backwardSubsumption(self.c1, self.cset, removed)
         self.assertEqual(tmp, 6)
+        self.assertEqual(len(removed), 6)
+        for c in removed:
+            self.assertTrue(not c in self.cset.clauses)
 
 
 if __name__ == '__main__':
@@ -39,6 +39,13 @@ subterms. See below for exmples:
 Note in particular that constant terms are lists with one elements,
 not plain strings.
 
+Optionally, terms can be stored in a term bank (see class TermBank
+below). A term bank is a perfectly shared store of terms - each
+distinct compound term exists exactly once, as an object of the list
+subclass BankTerm. Shared terms can be compared by identity, and they
+cache a number of properties (groundness, variables, and symbol
+counts) that otherwise would have to be recomputed recursively.
+
 Copyright 2010-2019 Stephan Schulz, schulz@eprover.org
 
 This program is free software; you can redistribute it and/or modify
@@ -66,8 +73,10 @@ Email: schulz@eprover.org
 """
 
 import unittest
+import sys
+import weakref
 from lexer import Token,Lexer
-from signature import Signature
+from signature import Signature, internSymbol
 
 
 def termIsVar(t):
@@ -75,7 +84,7 @@ def termIsVar(t):
     Check if the term is a variable. This assumes that t is a
     well-formed term.
     """
-    return type(t)!=type([])
+    return not isinstance(t, list)
 
 
 def termIsCompound(t):
@@ -104,9 +113,12 @@ def termArgs(t):
 
 def term2String(t):
     """
-    Convert a term t into a string.
+    Convert a term t into a string. Integer variables (as used in
+    normalized clauses) are printed as X0, X1, ...
     """
     if termIsVar(t):
+        if isinstance(t, int):
+            return "X%d"%(t,)
         return t
     else:
         # We need to handle the case of constants separatly
@@ -131,10 +143,13 @@ def parseTermList(lexer):
 
 def parseTerm(lexer):
     """
-    Read a complete term from the lexer provided.
+    Read a complete term from the lexer provided. All function
+    symbols are interned into the global symbol table, so that equal
+    symbols are represented by the same string object. Variable names
+    are only interned as strings.
     """
     if lexer.TestTok(Token.IdentUpper):
-        res = lexer.Next().literal
+        res = sys.intern(lexer.Next().literal)
     else:
         res = []
         lexer.CheckTok([Token.IdentLower,Token.DefFunctor,Token.SQString])
@@ -144,6 +159,7 @@ def parseTerm(lexer):
             lexer.AcceptTok(Token.OpenPar)
             res.extend(parseTermList(lexer))
             lexer.AcceptTok(Token.ClosePar)
+        res[0] = internSymbol(res[0], len(res)-1)
     return res
 
 
@@ -174,6 +190,13 @@ def termEqual(t1, t2):
     """
     Compare two terms for syntactic equality.
     """
+    if t1 is t2:
+        return True
+    if type(t1) is BankTerm and type(t2) is BankTerm and \
+       t1.bank is t2.bank:
+        # Shared terms from the same bank are equal if and only if
+        # they are identical.
+        return False
     if termIsVar(t1):
         return t1 == t2
     elif termIsVar(t2):
@@ -186,7 +209,9 @@ def termEqual(t1, t2):
 
 def termCopy(t):
     """
-    Return a (deep) copy of t. This is the lazy man's way...
+    Return a (deep) copy of t. This is the lazy man's way... Note
+    that shared terms from a term bank are never modified, and hence
+    are not copied.
     """
     if type(t) == type([]):
         # t is a list, so we copy the elements of the list
@@ -194,10 +219,53 @@ def termCopy(t):
     return t
 
 
+def termKey(t):
+    """
+    Return a hashable representation of t (nested tuples), so that two
+    terms are structurally equal if and only if their keys are equal.
+    """
+    if termIsVar(t):
+        return t
+    return tuple([termKey(s) for s in t])
+
+
+def termNormalizeVars(t, renaming):
+    """
+    Return a copy of t in which every variable is replaced by an
+    integer variable. renaming is a dictionary mapping old to new
+    variables, and is extended with the next free integer (i.e. its
+    size) for every new variable encountered. Sharing a renaming
+    between terms normalizes a sequence of terms in order of first
+    occurance of the variables. Subterms that do not change (in
+    particular ground subterms) are not copied, but shared with t.
+    """
+    if termIsVar(t):
+        try:
+            return renaming[t]
+        except KeyError:
+            res = len(renaming)
+            renaming[t] = res
+            return res
+    if type(t) is BankTerm and t.ground:
+        return t
+    res = [termFunc(t)]
+    changed = False
+    for i in range(1, len(t)):
+        arg = termNormalizeVars(t[i], renaming)
+        if arg is not t[i]:
+            changed = True
+        res.append(arg)
+    if changed:
+        return res
+    return t
+
+
 def termIsGround(t):
     """
     termIsGround(t): Return True if term has no variables, False otherwise
     """
+    if type(t) is BankTerm:
+        return t.ground
     if termIsVar(t):
         return False
     else:
@@ -214,7 +282,9 @@ def termCollectVars(t, res=None):
     """
     if res == None:
         res = set()
-    if termIsVar(t):
+    if type(t) is BankTerm:
+        res.update(t.vars)
+    elif termIsVar(t):
         res.add(t)
     else:
         for s in termArgs(t):
@@ -263,6 +333,8 @@ def termWeight(t, fweight, vweight):
       termWeight(X, 2, 1)      = 1
       termWeight(g(a), 3, 1)   = 6
     """
+    if type(t) is BankTerm:
+        return t.fcount*fweight + t.vcount*vweight
     if termIsVar(t):
         return vweight
     else:
@@ -292,6 +364,89 @@ def subterm(t, pos):
     return subterm(t[index],pos)
 
 
+class BankTerm(list):
+    """
+    A compound term stored in a term bank. A BankTerm is a normal term
+    list (so that all term functions work on it unchanged), but it
+    must never be modified, since it may be shared by arbitrary many
+    superterms and literals. In addition to the term itself, each
+    node caches:
+    - the bank it belongs to,
+    - if the term is ground,
+    - the set of variables occuring in it,
+    - the number of function symbol and variable occurances (which
+      is all we need to compute symbol-counting weights).
+    Since shared terms are unique in their bank, we hash them by
+    identity.
+    """
+    __slots__ = ["bank", "ground", "vars", "fcount", "vcount",
+                 "__weakref__"]
+    __hash__ = object.__hash__
+
+
+class TermBank(object):
+    """
+    A term bank is a store of perfectly shared terms. Each distinct
+    compound term is represented by exactly one BankTerm object, whose
+    arguments are again shared terms (or variables). Terms are looked
+    up by their top symbol and the identities of their (already
+    shared) arguments, so insertion only needs to hash each node
+    once.
+
+    The bank only holds weak references to the shared terms, so terms
+    no longer used anywhere in the proof state are reclaimed
+    automatically.
+    """
+    def __init__(self):
+        """
+        Initialize an empty term bank.
+        """
+        self.terms = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        """
+        Return the number of shared terms currently in the bank.
+        """
+        return len(self.terms)
+
+    def insert(self, t):
+        """
+        Return the shared representation of t, creating shared terms
+        for t and its subterms where necessary. Variables are
+        returned unchanged.
+        """
+        if termIsVar(t):
+            return t
+        if type(t) is BankTerm and t.bank is self:
+            return t
+        key = [termFunc(t)]
+        key.extend([self.insert(s) for s in termArgs(t)])
+        key = tuple(key)
+        try:
+            return self.terms[key]
+        except KeyError:
+            pass
+        res = BankTerm(key)
+        res.bank   = self
+        res.ground = True
+        res.fcount = 1
+        res.vcount = 0
+        vars = set()
+        for s in key[1:]:
+            if type(s) is BankTerm:
+                res.ground = res.ground and s.ground
+                res.fcount = res.fcount + s.fcount
+                res.vcount = res.vcount + s.vcount
+                vars.update(s.vars)
+            else:
+                res.ground = False
+                res.vcount = res.vcount + 1
+                vars.add(s)
+        res.vars = frozenset(vars)
+        self.terms[key] = res
+        return res
+
+
 class TestTerms(unittest.TestCase):
     """
     Test basic term functions.
@@ -447,6 +602,37 @@ class TestTerms(unittest.TestCase):
         self.assertEqual(sig.getArity("a"), 0)
         self.assertEqual(sig.getArity("b"), 0)
 
+    def testInterning(self):
+        """
+        Test that parsed symbols are shared.
+        """
+        self.assertTrue(termFunc(self.t3) is termFunc(self.t6))
+        self.assertTrue(termFunc(termArgs(self.t6)[0]) is
+                        termFunc(termArgs(self.t6)[1]))
+        self.assertTrue(termArgs(self.t4)[0] is termArgs(self.t5)[0])
+
+    def testNormalizeVars(self):
+        """
+        Test variable normalization and printing of integer
+        variables.
+        """
+        renaming = {}
+        t = termNormalizeVars(self.t5, renaming)
+        self.assertEqual(term2String(t), "g(X0,f(X1))")
+        self.assertEqual(renaming, {"X":0, "Y":1})
+        t = termNormalizeVars(string2Term("f(Z,Y)"), renaming)
+        self.assertEqual(term2String(t), "f(X2,X1)")
+        self.assertEqual(term2String(termNormalizeVars(t, {})), "f(X0,X1)")
+
+    def testTermKey(self):
+        """
+        Test that term keys agree with structural equality.
+        """
+        self.assertEqual(termKey(self.t4), termKey(self.t5))
+        self.assertNotEqual(termKey(self.t3), termKey(self.t6))
+        self.assertEqual(termKey(TermBank().insert(self.t6)),
+                         termKey(self.t6))
+        self.assertEqual(len(set([termKey(self.t4), termKey(self.t5)])), 1)
 
     def testWeight(self):
         """
@@ -469,5 +655,38 @@ class TestTerms(unittest.TestCase):
         self.assertTrue(subterm(self.t5,[2,0]) == 'f')
         self.assertTrue(subterm(self.t5,[5,0]) == None)
 
+    def testTermBank(self):
+        """
+        Test that shared terms are unique, and that their cached
+        properties agree with the recursive term functions.
+        """
+        bank = TermBank()
+        s1 = bank.insert(self.t1)
+        self.assertEqual(s1, self.t1)
+        s3 = bank.insert(self.t3)
+        s4 = bank.insert(self.t4)
+        s5 = bank.insert(self.t5)
+        s6 = bank.insert(self.t6)
+        self.assertTrue(s4 is s5)
+        self.assertTrue(s3 is not s6)
+        self.assertTrue(bank.insert(s4) is s4)
+        self.assertTrue(s3[1] is bank.insert(self.t2))
+        self.assertTrue(s6[1] is s6[2])
+        self.assertEqual(s4, self.t4)
+        self.assertEqual(term2String(s4), term2String(self.t4))
+        # g(X,f(Y)), g(a,b), g(b,b), f(Y), a, b
+        self.assertEqual(len(bank), 6)
+
+        self.assertTrue(termEqual(s4, s5))
+        self.assertTrue(termEqual(s4, self.t5))
+        self.assertTrue(not termEqual(s3, s6))
+        self.assertTrue(termCopy(s4) is s4)
+
+        for t, s in [(self.t3, s3), (self.t4, s4), (self.t6, s6)]:
+            self.assertEqual(termIsGround(s), termIsGround(t))
+            self.assertEqual(termCollectVars(s), termCollectVars(t))
+            self.assertEqual(termWeight(s,2,1), termWeight(t,2,1))
+            self.assertEqual(termWeight(s,1,3), termWeight(t,1,3))
+
 if __name__ == '__main__':
     unittest.main()
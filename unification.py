@@ -102,6 +102,41 @@ Occurs-Fail 2:
 FAIL
 
 
+=== Lazy (triangular) unification ===
+
+Implemented literally, the Bind rules are expensive: Every new
+binding is applied to all open equations and composed with all
+existing bindings. mguTermList() below does exactly that, and is kept
+as a reference implementation.
+
+The unifier actually used by mgu() does not apply bindings
+eagerly. Bindings are collected in triangular form (a variable may be
+bound to a term containing other bound variables), and whenever a
+variable is encountered in an equation, it is dereferenced by
+following its chain of bindings. The open equations are kept on a
+stack, so that taking an equation is O(1). The occurs-check has to
+look through bound variables, too. The result is a TriangularSubst
+(see substitutions.py), which builds instantiated terms only when it
+is applied, i.e. when an inference actually creates a new clause.
+
+Finally, flatMgu() unifies two flatterms (see flatterms.py). As long
+as no bound variable is encountered, both terms are traversed in
+parallel by simple index arithmetic, skipping over subterms bound to
+fresh variables in a single step. Only for variables that already are
+bound do we fall back to the lazy unifier on the (nested) terms. Since
+most attempted unifications fail on a symbol clash, this makes the
+common case cheap. flatMguList() unifies one flatterm with a whole
+list of candidates (e.g. all potential resolution partners of a
+literal), preparing the query term only once.
+
+Since clauses are variable-normalized, the same pair of atoms is often
+unified again and again (e.g. a processed clause literal with
+structurally identical literals of different given clauses). A
+UnificationCache memoizes the results of such unification attempts
+(unifier or failure). Its size is bounded, and the oldest or least
+recently used entries are evicted when it is full.
+
+
 
 Copyright 2010-2019 Stephan Schulz, schulz@eprover.org
 
@@ -129,8 +164,10 @@ Germany
 Email: schulz@eprover.org
 """
 
+from collections import OrderedDict
 from terms import *
 from substitutions import *
+from flatterms import FlatTerm
 
 
 def occursCheck(x, t):
@@ -207,15 +244,206 @@ def mguTermList(l1, l2, subst):
     return subst
 
 
+def occursCheckTriangular(x, t, subst, offset=0):
+   """
+   Perform an occurs-check of the unbound variable x in t (with
+   variables shifted by offset) modulo the bindings in the triangular
+   substitution subst.
+   """
+   stack = [(t, offset)]
+   while stack:
+      s, o = stack.pop()
+      s, o = subst.deref(s, o)
+      if termIsVar(s):
+         if s == x:
+            return True
+      else:
+         stack.extend([(a, o) for a in termArgs(s)])
+   return False
+
+
+def mguTriangularTermList(l1, l2, subst, offset1=0, offset2=0):
+    """
+    Unify all terms in l1 with the corresponding terms in l2, adding
+    the necessary bindings to the triangular substitution subst. See
+    mguTermList() for the meaning of the two lists. The variables of
+    terms in l1 are shifted by offset1, those of terms in l2 by
+    offset2 (see TriangularSubst). Return subst on success, None on
+    failure (in which case subst may contain some spurious bindings).
+    """
+    assert len(l1)==len(l2)
+    stack1 = [(t, offset1) for t in l1]
+    stack2 = [(t, offset2) for t in l2]
+    while stack1:
+       t1, o1 = stack1.pop()
+       t2, o2 = stack2.pop()
+       t1, o1 = subst.deref(t1, o1)
+       t2, o2 = subst.deref(t2, o2)
+       if t1 is t2 and o1 == o2:
+          # Identical terms (in particular identical shared terms)
+          # need no further work.
+          continue
+       if termIsVar(t1):
+          if t1==t2:
+             continue
+          if occursCheckTriangular(t1, t2, subst, o2):
+             return None
+          subst.addBinding((t1, t2), o2)
+       elif termIsVar(t2):
+          if occursCheckTriangular(t2, t1, subst, o1):
+             return None
+          subst.addBinding((t2, t1), o1)
+       else:
+          if termFunc(t1) != termFunc(t2):
+             return None
+          stack1.extend([(t, o1) for t in termArgs(t1)])
+          stack2.extend([(t, o2) for t in termArgs(t2)])
+    return subst
+
+
 def mgu(t1, t2):
     """
-    Try to unify t1 and t2, return substitution on success, or None on failure.
+    Try to unify t1 and t2, return substitution on success, or None on
+    failure. The substitution is a TriangularSubst, i.e. it is only
+    expanded when applied.
     """
-    res =  mguTermList([t1], [t2], Substitution())
+    res =  mguTriangularTermList([t1], [t2], TriangularSubst())
     return res
 
 
 
+def flatMgu(ft1, ft2, offset=0):
+    """
+    Try to unify the flatterms ft1 and ft2, where the variables of ft2
+    are shifted by offset (see TriangularSubst). Return a
+    TriangularSubst on success, None on failure.
+    """
+    res = flatMguList(ft1, [ft2], offset)
+    if res:
+        return res[0][1]
+    return None
+
+
+def flatMguList(ft, candidates, offset=0):
+    """
+    Try to unify the flatterm ft with each of the flatterms in the
+    list candidates, where the variables of all candidates are
+    shifted by offset. The arrays of ft are unpacked only once for
+    the whole list. Return a list of pairs (index, unifier), one for
+    each candidate (identified by its position in candidates) that
+    is unifiable with ft.
+    """
+    syms1 = ft.symbols
+    ars1  = ft.arities
+    ends1 = ft.ends
+    subterms1 = ft.subterms
+    end = len(syms1)
+    res = []
+    for pos, ft2 in enumerate(candidates):
+        syms2 = ft2.symbols
+        ars2  = ft2.arities
+        ends2 = ft2.ends
+        subst = None
+        i = 0
+        j = 0
+        while i < end:
+            ar1 = ars1[i]
+            ar2 = ars2[j]
+            if ar1 < 0 or ar2 < 0:
+                # At least one side is a variable, so we unify the two
+                # subterms with the standard algorithm (which will
+                # just add a binding if the variable is unbound) and
+                # skip both. The substitution is only created when it
+                # is needed.
+                if subst == None:
+                    subst = TriangularSubst()
+                if mguTriangularTermList([subterms1[i]], [ft2.subterms[j]],
+                                         subst, 0, offset) == None:
+                    break
+                i = ends1[i]
+                j = ends2[j]
+            elif ar1 != ar2 or syms1[i] != syms2[j]:
+                break
+            else:
+                i = i+1
+                j = j+1
+        else:
+            if subst == None:
+                subst = TriangularSubst()
+            res.append((pos, subst))
+    return res
+
+
+class UnificationCache(object):
+    """
+    A size-bounded cache mapping triples (query atom, candidate atom,
+    offset) to the result of unifying the two atoms (a unifier, or
+    None for failure). Atoms are represented by the keys of their
+    flatterms (see FlatTerm.key()), which are cached with the
+    flatterms (and hence with the literals). Supported eviction policies are "lru" (evict
+    the least recently used entry) and "fifo" (evict the oldest
+    entry).
+    """
+    policies = ["lru", "fifo"]
+
+    def __init__(self, capacity=10000, policy="lru"):
+        """
+        Initialize an empty cache.
+        """
+        assert policy in UnificationCache.policies
+        assert capacity > 0
+        self.capacity  = capacity
+        self.lru       = policy == "lru"
+        self.cache     = OrderedDict()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """
+        Return the number of cached results.
+        """
+        return len(self.cache)
+
+    def mguList(self, ft, candidates, offset=0):
+        """
+        Cached version of flatMguList(). Results not found in the
+        cache are computed in one batch and entered into the cache.
+        """
+        cache = self.cache
+        qkey  = ft.key()
+        res   = []
+        misses = []
+        keys   = []
+        for pos, ft2 in enumerate(candidates):
+            key = (qkey, ft2.key(), offset)
+            try:
+                sigma = cache[key]
+            except KeyError:
+                misses.append(pos)
+                keys.append(key)
+                continue
+            self.hits += 1
+            if self.lru:
+                cache.move_to_end(key)
+            if sigma != None:
+                res.append((pos, sigma))
+        if misses:
+            self.misses += len(misses)
+            results = [None]*len(misses)
+            for i, sigma in flatMguList(ft, [candidates[pos] for pos in misses],
+                                        offset):
+                results[i] = sigma
+                res.append((misses[i], sigma))
+            for key, sigma in zip(keys, results):
+                cache[key] = sigma
+            while len(cache) > self.capacity:
+                cache.popitem(last=False)
+                self.evictions += 1
+            res.sort(key=lambda x:x[0])
+        return res
+
+
 class TestUnification(unittest.TestCase):
     """
     Test basic substitution functions.
@@ -272,6 +500,109 @@ class TestUnification(unittest.TestCase):
           self.assertTrue(not sigma)
        print()
 
+    def testEagerMGU(self):
+        """
+        Test that the reference implementation and the lazy unifier
+        agree.
+        """
+        pairs = [(self.s1, self.t1), (self.s2, self.t2),
+                 (self.s3, self.t3), (self.s4, self.t4),
+                 (self.s5, self.t5), (self.s6, self.t6),
+                 (self.s7, self.t7), (self.s8, self.t8),
+                 (self.s9, self.t9), (self.s10, self.t10),
+                 (self.s11, self.t11)]
+        for s,t in pairs:
+            sigma = mguTermList([s], [t], Substitution())
+            tau   = mgu(s,t)
+            self.assertEqual(sigma == None, tau == None)
+            if sigma:
+                self.assertTrue(termEqual(sigma(s), sigma(t)))
+                self.assertEqual(len(termCollectVars(sigma(s))),
+                                 len(termCollectVars(tau(s))))
+
+    def testFlatMGU(self):
+        """
+        Test that unification on flatterms agrees with the standard
+        algorithm.
+        """
+        pairs = [(self.s1, self.t1), (self.s2, self.t2),
+                 (self.s3, self.t3), (self.s4, self.t4),
+                 (self.s5, self.t5), (self.s6, self.t6),
+                 (self.s7, self.t7), (self.s8, self.t8),
+                 (self.s9, self.t9), (self.s10, self.t10),
+                 (self.s11, self.t11)]
+        for s,t in pairs:
+            sigma = mgu(s,t)
+            tau   = flatMgu(FlatTerm(s), FlatTerm(t))
+            self.assertEqual(sigma == None, tau == None)
+            tau   = flatMgu(FlatTerm(t), FlatTerm(s))
+            self.assertEqual(sigma == None, tau == None)
+            if tau:
+                self.assertTrue(termEqual(tau(s), tau(t)))
+
+    def testFlatMGUList(self):
+        """
+        Test that batched unification agrees with single
+        unifications.
+        """
+        query = FlatTerm(self.s7)
+        cands = [FlatTerm(t) for t in [self.t7, self.s7, self.t1, self.s3,
+                                       self.t2, self.s9,
+                                       terms.string2Term("Y")]]
+        res = flatMguList(query, cands)
+        expected = [i for i in range(len(cands))
+                    if flatMgu(query, cands[i]) != None]
+        self.assertEqual([i for i, sigma in res], expected)
+        self.assertEqual(expected, [1, 6])
+        for i, sigma in res:
+            self.assertTrue(termEqual(sigma(query.getTerm()),
+                                      sigma(cands[i].getTerm())))
+        self.assertEqual(flatMguList(query, []), [])
+
+    def testUnificationCache(self):
+        """
+        Test that cached unification agrees with batched unification,
+        and that the cache stays bounded.
+        """
+        query = FlatTerm(self.s7)
+        cands = [FlatTerm(t) for t in [self.t7, self.s7, self.t1, self.s3,
+                                       terms.string2Term("Y")]]
+        expected = [i for i, sigma in flatMguList(query, cands)]
+        for policy in UnificationCache.policies:
+            cache = UnificationCache(3, policy)
+            res = cache.mguList(query, cands)
+            self.assertEqual([i for i, sigma in res], expected)
+            self.assertEqual(cache.misses, 5)
+            self.assertEqual(len(cache), 3)
+            self.assertEqual(cache.evictions, 2)
+            # A structurally identical query hits the cache.
+            res = cache.mguList(FlatTerm(termCopy(self.s7)), cands[2:])
+            self.assertEqual([i+2 for i, sigma in res], expected[1:])
+            self.assertEqual(cache.hits, 3)
+            for i, sigma in res:
+                self.assertTrue(termEqual(sigma(self.s7),
+                                          sigma(cands[i+2].getTerm())))
+
+    def testOffsetMGU(self):
+        """
+        Test unification of terms renamed apart by an offset.
+        """
+        s = ["p", 0, ["a"]]
+        t = ["p", ["b"], 0]
+        self.assertEqual(mguTriangularTermList([s], [t], TriangularSubst()),
+                         None)
+        self.assertEqual(flatMgu(FlatTerm(s), FlatTerm(t)), None)
+        sigma = flatMgu(FlatTerm(s), FlatTerm(t), 1)
+        self.assertTrue(sigma)
+        self.assertTrue(termEqual(sigma.apply(s), sigma.apply(t, 1)))
+        self.assertEqual(term2String(sigma.apply(s)), "p(b,a)")
+        # X0 and X0+1 must not be confused in the occurs-check.
+        s = ["f", 0]
+        t = ["f", ["g", 0]]
+        sigma = mguTriangularTermList([s], [t], TriangularSubst(), 0, 1)
+        self.assertTrue(sigma)
+        self.assertEqual(term2String(sigma.apply(s)), "f(g(X1))")
+
     def testMGU(self):
         """
         Test basic stuff.